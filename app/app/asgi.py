@@ -0,0 +1,127 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Django 2.1 has no native ASGI handler, so the WSGI application is adapted
+by core.wsgi_adapter. Request bodies are received on the event loop, which
+means slow clients and large image uploads don't hold a thread while they
+send. Each request then runs on a pool of ASGI_THREADS threads, each with
+its own database connection.
+
+The staff event stream is served on the event loop instead, so idle
+subscribers don't hold a thread each.
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections
+
+from core import events
+from core.wsgi_adapter import PooledWsgiToAsgi
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ASGI_THREADS', 16)),
+    thread_name_prefix='asgi',
+)
+
+
+EVENTS_PATH = '/api/staff/events/'
+
+
+def authenticate(header):
+    """Return the user of a 'Token <key>' authorization header, or None"""
+    # DRF reads settings on import, which are only set up further down
+    from rest_framework.exceptions import AuthenticationFailed
+    from core.authentication import ExpiringTokenAuthentication
+
+    keyword, _, key = header.decode('latin-1').partition(' ')
+    if keyword != 'Token' or not key:
+        return None
+    try:
+        user, _ = ExpiringTokenAuthentication().authenticate_credentials(
+            key
+        )
+    except AuthenticationFailed:
+        return None
+    finally:
+        close_old_connections()
+    return user
+
+
+async def serve_events(scope, receive, send):
+    """Stream the authenticated user's staff events until disconnect"""
+    headers = dict(scope['headers'])
+    user = await sync_to_async(
+        authenticate, thread_sensitive=False, executor=executor
+    )(headers.get(b'authorization', b''))
+    if user is None:
+        await send({
+            'type': 'http.response.start',
+            'status': 401,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'www-authenticate', b'Token'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': json.dumps({
+                'detail': 'Invalid or missing token.'
+            }).encode(),
+        })
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+    async def pump():
+        async for chunk in events.astream(user.pk):
+            await send({
+                'type': 'http.response.body',
+                'body': chunk,
+                'more_body': True,
+            })
+
+    task = asyncio.ensure_future(pump())
+    try:
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+    finally:
+        # Wait for the stream to unsubscribe before returning
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+class StaffAsgi(PooledWsgiToAsgi):
+    """Serve the event stream natively and everything else through WSGI"""
+
+    def __init__(self, wsgi_application):
+        super().__init__(wsgi_application, executor)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET' and \
+                scope['path'] == EVENTS_PATH:
+            await serve_events(scope, receive, send)
+        else:
+            await super().__call__(scope, receive, send)
+
+
+application = StaffAsgi(get_wsgi_application())
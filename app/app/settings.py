@@ -10,7 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
+import datetime
 import os
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -47,6 +50,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.HealthCheckMiddleware',
+    'core.middleware.ConcurrencyLimitMiddleware',
+    'core.middleware.MemoryMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -82,7 +91,8 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # django.db.backends.postgresql, listing partitioned tables too
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
@@ -93,6 +103,71 @@ DATABASES = {
     }
 }
 
+# Read replicas share the primary's credentials, one per DB_REPLICA_HOSTS
+# entry. Safe requests read from them, see core.routers.ReplicaRouter.
+
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dict(
+        DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(alias)
+
+# Staff data can be spread over shards, one per DB_SHARD_HOSTS entry plus
+# default. Users are placed by core.sharding; shards need disjoint id
+# sequences so a user's rows can be moved with move_user_shard.
+
+DATABASE_SHARDS = ['default']
+for index, host in enumerate(filter(None, os.environ.get('DB_SHARD_HOSTS', '').split(','))):
+    alias = f'shard_{index}'
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host.strip())
+    DATABASE_SHARDS.append(alias)
+
+# The test run always gets a second shard database next to default, so the
+# sharding tests run without DB_SHARD_HOSTS. DATABASE_SHARDS is left alone,
+# the tests that shard enable it themselves.
+TESTING = sys.argv[1:2] == ['test']
+if TESTING and 'shard_0' not in DATABASES:
+    DATABASES['shard_0'] = dict(
+        DATABASES['default'],
+        TEST={'NAME': f'test_{DATABASES["default"]["NAME"]}_shard_0'}
+    )
+
+DATABASE_ROUTERS = [
+    'core.sharding.ShardRouter',
+    'core.routers.ReplicaRouter',
+]
+
+# Caches shared by every worker. The replica sticky window, the cached
+# employee counts and CacheBucketStore throttle buckets are kept here, so
+# with more than one worker CACHE_LOCATION must point at memcached, as
+# "host:port[,host:port]". Without it each process caches on its own, and
+# CACHE_SHARED tells the code relying on a shared cache to do without.
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION')
+CACHE_SHARED = bool(CACHE_LOCATION)
+if CACHE_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': CACHE_LOCATION.split(','),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# 'round_robin' or 'least_loaded'
+DATABASE_REPLICA_STRATEGY = os.environ.get('DB_REPLICA_STRATEGY', 'round_robin')
+DATABASE_REPLICA_STICKY_SECONDS = float(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+
+# Hash partitions for the employee and employee relation tables on
+# PostgreSQL 11+, 0 keeps them as plain tables. See core.partitioning.
+STAFF_PARTITIONS = int(os.environ.get('STAFF_PARTITIONS', 0))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -138,3 +213,119 @@ STATIC_ROOT = '/vol/web/static'
 
 
 AUTH_USER_MODEL = 'core.User'
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.TokenBucketThrottle',
+        'core.throttling.ScopedTokenBucketThrottle',
+    ),
+    # Token bucket sizes, refilled evenly over the period
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.environ.get('THROTTLE_USER_RATE', '600/min'),
+        'anon': os.environ.get('THROTTLE_ANON_RATE', '120/min'),
+        'token': os.environ.get('THROTTLE_TOKEN_RATE', '30/min'),
+        'upload': os.environ.get('THROTTLE_UPLOAD_RATE', '60/min'),
+        'bulk': os.environ.get('THROTTLE_BULK_RATE', '60/min'),
+    },
+}
+
+# API tokens expire AUTH_TOKEN_TTL after their last refresh. Using a token
+# pushes its expiry back, at most once per AUTH_TOKEN_REFRESH_INTERVAL.
+AUTH_TOKEN_TTL = datetime.timedelta(
+    seconds=int(os.environ.get('AUTH_TOKEN_TTL', 14 * 24 * 60 * 60))
+)
+AUTH_TOKEN_REFRESH_INTERVAL = datetime.timedelta(hours=1)
+
+# core.throttling.LocalBucketStore keeps buckets per process,
+# core.throttling.CacheBucketStore shares them through THROTTLE_CACHE
+THROTTLE_STORE = os.environ.get('THROTTLE_STORE', 'core.throttling.LocalBucketStore')
+THROTTLE_CACHE = 'default'
+
+# Requests beyond this many in flight per process get a 503, 0 disables
+MAX_IN_FLIGHT_REQUESTS = int(os.environ.get('MAX_IN_FLIGHT_REQUESTS', 64))
+SHED_RETRY_AFTER = 1
+
+
+# Responses smaller than this many bytes are not compressed
+COMPRESSION_MIN_SIZE = 512
+
+
+# Paginators switch from COUNT(*) to the planner's estimate above this
+ESTIMATED_COUNT_THRESHOLD = int(os.environ.get('ESTIMATED_COUNT_THRESHOLD', 10000))
+# Lifetime of per-user counts kept up to date on create/delete
+COUNT_CACHE_TIMEOUT = 60 * 60
+
+
+# Sync tokens don't advance past changes younger than this, so changes
+# committed late by longer transactions are still picked up
+SYNC_SETTLE_SECONDS = 2
+
+
+# /api/batch/ takes up to BATCH_MAX_REQUESTS sub-requests, parallel reads
+# share a pool of BATCH_WORKERS threads per process
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+
+
+# core.events.LocalBackplane only reaches subscribers in the same process,
+# core.events.PostgresBackplane fans out through LISTEN/NOTIFY
+EVENTS_BACKPLANE = os.environ.get('EVENTS_BACKPLANE', 'core.events.LocalBackplane')
+EVENTS_CHANNEL = 'staff_events'
+# Events buffered per connection before it is told to resync
+EVENTS_BUFFER_SIZE = 100
+EVENTS_HEARTBEAT_SECONDS = 15
+
+
+# Users' tags and departments are kept in process memory, for at most
+# LABEL_CACHE_SIZE user and kind pairs and LABEL_CACHE_TTL seconds, see
+# core.label_cache. Workers drop them on the events of EVENTS_BACKPLANE and
+# on the versions kept in the shared cache, without either nothing is kept.
+LABEL_CACHE_SIZE = int(os.environ.get('LABEL_CACHE_SIZE', 10000))
+LABEL_CACHE_TTL = 300
+
+# Matches the tag and department autocomplete endpoints return by default
+# and at most, when asked for more with ?limit=
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+# Profiles of requests flagged by staff or picked at PROFILE_SAMPLE_RATE
+# (0 to 1) are kept in PROFILE_DIR, the newest PROFILE_KEEP of them.
+# Stacks are sampled every PROFILE_INTERVAL seconds.
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/vol/web/profiles')
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 100))
+PROFILE_INTERVAL = 0.005
+
+
+# Queries slower than SLOW_QUERY_MS are aggregated by fingerprint in the
+# SlowQuery table, see core.slow_queries. 0 disables the timing.
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+SLOW_QUERY_ASYNC = True
+# Fingerprints exported on /metrics, the slowest by total time. Set
+# METRICS_TOKEN to require "Authorization: Bearer <token>" there.
+METRICS_TOP_QUERIES = 20
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
+# MEMORY_PROFILING=1 traces allocations per route with tracemalloc, each
+# worker dumping a report to MEMORY_REPORT_DIR for manage.py memreport.
+# Workers stop after a request leaves them above MEMORY_MAX_RSS_MB, for
+# the server to start a fresh one. Both off by default.
+MEMORY_PROFILING = os.environ.get('MEMORY_PROFILING') == '1'
+MEMORY_TRACE_FRAMES = 10
+MEMORY_REPORT_DIR = os.path.join(tempfile.gettempdir(), 'memreport')
+MEMORY_REPORT_INTERVAL = 60
+MEMORY_MAX_RSS_MB = int(os.environ.get('MEMORY_MAX_RSS_MB', 0))
+
+
+# Health checks
+# /healthz and /readyz are answered by core.middleware.HealthCheckMiddleware
+
+HEALTH_CHECK_LIVE_PATH = '/healthz'
+HEALTH_CHECK_READY_PATH = '/readyz'
+HEALTH_CHECK_CACHE_TTL = float(os.environ.get('HEALTH_CHECK_CACHE_TTL', 5))
@@ -18,8 +18,16 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core import views as core_views
+
 urlpatterns = [
+    path('admin/profiles/', core_views.profile_list, name='profile-list'),
+    path('admin/profiles/<profile_id>/', core_views.profile_detail,
+         name='profile-detail'),
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
     path('api/staff/', include('staff.urls')),
+    path('api/batch/', core_views.BatchView.as_view(), name='batch'),
+    path('api/memory/', core_views.MemoryReportView.as_view(), name='memory'),
+    path('metrics', core_views.metrics, name='metrics'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
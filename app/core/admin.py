@@ -1,8 +1,12 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db import connections
 from django.utils.translation import gettext as _
 
-from core import models
+from core import changes, events, models, purge, summary
+from core.pagination import EstimatedCountPaginator
 
 
 class UserAdmin(BaseUserAdmin):
@@ -22,9 +26,146 @@ class UserAdmin(BaseUserAdmin):
             'fields': ('email', 'password1', 'password2')
         }),
     )
+    actions = ['deactivate']
+
+    def has_delete_permission(self, request, obj=None):
+        # A cascading delete of a large tenant loads every row it removes,
+        # users are deactivated here and removed by purge_users instead
+        return False
+
+    def deactivate(self, request, queryset):
+        """Deactivate the selected users and queue them for purging"""
+        users = list(queryset.filter(deleted_at__isnull=True))
+        for user in users:
+            purge.deactivate(user)
+        self.message_user(request, _('Deactivated %d users') % len(users))
+    deactivate.short_description = _('Deactivate and purge selected users')
+
+
+class LabelAdmin(admin.ModelAdmin):
+    ordering = ['id']
+    list_display = ['name', 'user']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    search_fields = ['^name']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class DepartmentAdmin(LabelAdmin):
+    raw_id_fields = ['user', 'parent']
+
+
+class EmployeeActionForm(ActionForm):
+    tag = forms.IntegerField(label=_('Tag ID'), required=False)
+
+
+def _selected_sql(queryset):
+    """Return SQL selecting the primary keys of queryset"""
+    return queryset.order_by().values('pk').query.sql_with_params()
+
+
+def _record_changes(queryset):
+    """Log and announce a change for every selected employee"""
+    owners = {}
+    for pk, user_id in queryset.order_by().values_list('pk', 'user_id'):
+        owners.setdefault(user_id, []).append(pk)
+    for user_id, employee_ids in owners.items():
+        changes.record('employee', user_id, employee_ids, using=queryset.db)
+        events.publish(
+            user_id, 'employee', 'updated', employee_ids, queryset.db
+        )
+
+
+class EmployeeAdmin(admin.ModelAdmin):
+    ordering = ['id']
+    list_display = ['title', 'user', 'experience', 'salary']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    autocomplete_fields = ['department', 'tags']
+    search_fields = ['^title']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = EmployeeActionForm
+    actions = ['add_tag', 'remove_tag']
+
+    def selected_tag(self, request, queryset):
+        """Return the tag entered for an action, None after reporting why
+
+        The tag must belong to the user owning every selected employee.
+        """
+        tag_id = request.POST.get('tag', '')
+        if not tag_id.isdigit():
+            self.message_user(request, _('Enter a tag ID'), messages.ERROR)
+            return None
+
+        tag = models.Tag.objects.using(queryset.db).filter(pk=tag_id).first()
+        if tag is None or queryset.exclude(user_id=tag.user_id).exists():
+            self.message_user(request, _(
+                'Tag %s does not belong to the user of every selected '
+                'employee'
+            ) % tag_id, messages.ERROR)
+            return None
+        return tag
+
+    def add_tag(self, request, queryset):
+        """Add the tag to every selected employee in one query"""
+        tag = self.selected_tag(request, queryset)
+        if tag is None:
+            return
+
+        connection = connections[queryset.db]
+        quote = connection.ops.quote_name
+        through = quote(models.Employee.tags.through._meta.db_table)
+        employee = quote(models.Employee._meta.db_table)
+        selected, params = _selected_sql(queryset)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {through} (employee_id, tag_id) '
+                f'SELECT e.id, %s FROM {employee} e '
+                f'WHERE e.id IN ({selected}) '
+                f'AND NOT EXISTS (SELECT 1 FROM {through} r '
+                f'WHERE r.employee_id = e.id AND r.tag_id = %s)',
+                [tag.pk, *params, tag.pk]
+            )
+            added = cursor.rowcount
+        summary.refresh(f'employee_id IN ({selected})', params, queryset.db)
+        _record_changes(queryset)
+
+        self.message_user(request, _('Tagged %d employees') % added)
+    add_tag.short_description = _('Add tag to selected employees')
+
+    def remove_tag(self, request, queryset):
+        """Remove the tag from every selected employee in one query"""
+        tag = self.selected_tag(request, queryset)
+        if tag is None:
+            return
+
+        removed = models.Employee.tags.through.objects.filter(
+            tag_id=tag.pk, employee__in=queryset.order_by().values('pk')
+        )._raw_delete(queryset.db)
+        selected, params = _selected_sql(queryset)
+        summary.refresh(f'employee_id IN ({selected})', params, queryset.db)
+        _record_changes(queryset)
+
+        self.message_user(request, _('Untagged %d employees') % removed)
+    remove_tag.short_description = _('Remove tag from selected employees')
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    ordering = ['-total_ms']
+    list_display = ['sql', 'call_site', 'calls', 'total_ms', 'max_ms',
+                    'last_seen']
+    readonly_fields = ['fingerprint', 'sql', 'database', 'call_site',
+                       'calls', 'total_ms', 'max_ms', 'plan', 'first_seen',
+                       'last_seen']
+
+    def has_add_permission(self, request):
+        return False
 
 
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Department)
-admin.site.register(models.Employee)
+admin.site.register(models.Tag, LabelAdmin)
+admin.site.register(models.Department, DepartmentAdmin)
+admin.site.register(models.Employee, EmployeeAdmin)
+admin.site.register(models.SlowQuery, SlowQueryAdmin)
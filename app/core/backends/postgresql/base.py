@@ -0,0 +1,8 @@
+from django.db.backends.postgresql import base
+
+from core.backends.postgresql.introspection import DatabaseIntrospection
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend aware of the hash partitioned staff tables"""
+    introspection_class = DatabaseIntrospection
@@ -0,0 +1,26 @@
+from django.db.backends.base.introspection import TableInfo
+from django.db.backends.postgresql import introspection
+
+
+class DatabaseIntrospection(introspection.DatabaseIntrospection):
+
+    def get_table_list(self, cursor):
+        """Return the tables and views, partitioned tables included
+
+        Django only lists plain tables, so flush left the partitioned staff
+        tables out of its TRUNCATE and failed on their foreign keys. Their
+        partitions are left out, they are reached through the parent.
+        """
+        if self.connection.pg_version < 100000:
+            return super().get_table_list(cursor)
+        cursor.execute("""
+            SELECT c.relname, c.relkind
+            FROM pg_catalog.pg_class c
+            LEFT JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relkind IN ('r', 'v', 'p')
+                AND NOT c.relispartition
+                AND n.nspname NOT IN ('pg_catalog', 'pg_toast')
+                AND pg_catalog.pg_table_is_visible(c.oid)""")
+        return [TableInfo(row[0], {'r': 't', 'v': 'v', 'p': 't'}[row[1]])
+                for row in cursor.fetchall()
+                if row[0] not in self.ignored_tables]
@@ -0,0 +1,54 @@
+import datetime
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from core.models import Change
+
+
+def record(kind, user_id, object_ids, deleted=False, using='default'):
+    """Log a change to the objects, replacing their previous change"""
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+    changes = Change.objects.using(using)
+    changes.filter(kind=kind, object_id__in=object_ids).delete()
+    changes.bulk_create([
+        Change(
+            user_id=user_id, kind=kind, object_id=object_id, deleted=deleted
+        )
+        for object_id in object_ids
+    ])
+
+
+def settled_horizon():
+    """Return the time before which logged changes are surely committed
+
+    A change logged inside a longer transaction can become visible after
+    one with a higher id, so tokens never advance past recent changes.
+    """
+    return timezone.now() - datetime.timedelta(
+        seconds=settings.SYNC_SETTLE_SECONDS
+    )
+
+
+def latest_token(user_id):
+    """Return the id of the user's latest settled change, 0 if none"""
+    return Change.objects.filter(
+        user_id=user_id, created__lte=settled_horizon()
+    ).aggregate(latest=Max('id'))['latest'] or 0
+
+
+def changes_since(user_id, since):
+    """Return (changes after since, token to resume from)"""
+    changes = list(
+        Change.objects.filter(user_id=user_id, id__gt=since).order_by('id')
+    )
+    horizon = settled_horizon()
+    token = since
+    for change in changes:
+        if change.created > horizon:
+            break
+        token = change.id
+    return changes, token
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when replicas are used without a cache shared by workers"""
+    if settings.DATABASE_REPLICAS and not settings.CACHE_SHARED:
+        return [Warning(
+            'Read replicas are configured but the default cache is not '
+            'shared between processes.',
+            hint='Set CACHE_LOCATION, otherwise clients whose next request '
+                 'reaches another worker may not read their own writes.',
+            id='core.W001',
+        )]
+    return []
@@ -0,0 +1,116 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class GzipStream:
+    """Incremental gzip compressor"""
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliStream:
+    """Incremental brotli compressor"""
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=5)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdStream:
+    """Incremental zstandard compressor"""
+
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+def available_codecs():
+    """Return the installed codecs, most preferred first"""
+    codecs = []
+    if brotli is not None:
+        codecs.append(('br', BrotliStream))
+    if zstandard is not None:
+        codecs.append(('zstd', ZstdStream))
+    codecs.append(('gzip', GzipStream))
+    return codecs
+
+
+def parse_accept_encoding(header):
+    """Return {coding: q} for an Accept-Encoding header"""
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def negotiate(header):
+    """Return (coding, stream class) for the best codec the client accepts"""
+    accepted = parse_accept_encoding(header)
+    best = None
+    for coding, stream in available_codecs():
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > 0 and (best is None or q > best[0]):
+            best = (q, coding, stream)
+    return best[1:] if best else (None, None)
+
+
+def compress(stream_class, content):
+    """Compress content in one go"""
+    stream = stream_class()
+    return stream.compress(content) + stream.finish()
+
+
+def compress_sequence(stream_class, sequence):
+    """Compress an iterable of chunks, flushing after each one"""
+    stream = stream_class()
+    for chunk in sequence:
+        data = stream.compress(chunk) + stream.flush()
+        if data:
+            yield data
+    yield stream.finish()
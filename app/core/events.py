@@ -0,0 +1,245 @@
+import asyncio
+import functools
+import json
+import select
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+
+# Ids per notification, keeping NOTIFY payloads well under 8000 bytes
+CHUNK_SIZE = 500
+
+
+class Subscription:
+    """Bounded buffer of events for one connection
+
+    When the buffer overflows the oldest events are dropped and the
+    subscriber is told to resync instead.
+    """
+
+    def __init__(self, user_id, size, wakeup):
+        self.user_id = user_id
+        self.pending = deque(maxlen=size)
+        self.overflowed = False
+        self.wakeup = wakeup
+        self._lock = threading.Lock()
+
+    def put(self, event):
+        with self._lock:
+            if len(self.pending) == self.pending.maxlen:
+                self.overflowed = True
+            self.pending.append(event)
+        self.wakeup()
+
+    def drain(self):
+        """Return (pending events, whether any were dropped)"""
+        with self._lock:
+            events = list(self.pending)
+            self.pending.clear()
+            overflowed, self.overflowed = self.overflowed, False
+        return events, overflowed
+
+
+class Broker:
+    """In-process fan-out of events to the subscribers of each user
+
+    Listeners are called with every event of every user, before the
+    subscribers get it.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """Call listener(user_id, event) for every delivered event"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def subscribe(self, user_id, wakeup):
+        subscription = Subscription(
+            user_id, settings.EVENTS_BUFFER_SIZE, wakeup
+        )
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers[subscription.user_id]
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def deliver(self, user_id, event):
+        with self._lock:
+            listeners = list(self._listeners)
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for listener in listeners:
+            listener(user_id, event)
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+
+broker = Broker()
+
+
+class LocalBackplane:
+    """Deliver events to subscribers of this process only"""
+
+    def start(self):
+        pass
+
+    def publish(self, user_id, event):
+        broker.deliver(user_id, event)
+
+
+class PostgresBackplane:
+    """Share events between processes with LISTEN/NOTIFY
+
+    Events are sent with pg_notify on the default database and a listener
+    thread, started with the first subscriber, delivers every notification
+    to the local broker.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(
+            target=self._listen, name='events-listener', daemon=True
+        ).start()
+
+    def publish(self, user_id, event):
+        payload = json.dumps({'user': user_id, 'event': event})
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, %s)',
+                [settings.EVENTS_CHANNEL, payload]
+            )
+
+    def _listen(self):
+        connection = connections['default']
+        while True:
+            try:
+                connection.ensure_connection()
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'LISTEN ' + connection.ops.quote_name(
+                            settings.EVENTS_CHANNEL
+                        )
+                    )
+                raw = connection.connection
+                while True:
+                    select.select([raw], [], [], 60)
+                    raw.poll()
+                    while raw.notifies:
+                        message = json.loads(raw.notifies.pop(0).payload)
+                        broker.deliver(message['user'], message['event'])
+            except Exception:
+                connection.close()
+                time.sleep(1)
+
+
+@functools.lru_cache(maxsize=None)
+def get_backplane(path):
+    """Return the backplane instance for the dotted path"""
+    return import_string(path)()
+
+
+def backplane():
+    return get_backplane(settings.EVENTS_BACKPLANE)
+
+
+def publish(user_id, kind, action, object_ids, using='default'):
+    """Announce created, updated or deleted objects once committed"""
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+
+    def send():
+        for start in range(0, len(object_ids), CHUNK_SIZE):
+            backplane().publish(user_id, {
+                'kind': kind,
+                'action': action,
+                'ids': object_ids[start:start + CHUNK_SIZE],
+            })
+    transaction.on_commit(send, using=using)
+
+
+def subscribe(user_id, wakeup):
+    """Return a subscription to the user's events calling wakeup on each"""
+    backplane().start()
+    return broker.subscribe(user_id, wakeup)
+
+
+def format_event(name, data):
+    """Return a server-sent event"""
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+def format_events(events, overflowed):
+    """Return the server-sent events for drained events"""
+    if overflowed:
+        return format_event('resync', {})
+    if not events:
+        return b': heartbeat\n\n'
+    return b''.join(format_event('change', event) for event in events)
+
+
+PREAMBLE = b'retry: 5000\n\n'
+
+
+def stream(user_id):
+    """Yield server-sent events for the user until closed
+
+    Idle connections get a comment every EVENTS_HEARTBEAT_SECONDS, which
+    keeps proxies from timing them out and detects disconnects.
+    """
+    wake = threading.Event()
+    subscription = subscribe(user_id, wake.set)
+    try:
+        yield PREAMBLE
+        while True:
+            wake.wait(settings.EVENTS_HEARTBEAT_SECONDS)
+            wake.clear()
+            yield format_events(*subscription.drain())
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def astream(user_id):
+    """Yield server-sent events for the user without holding a thread"""
+    loop = asyncio.get_event_loop()
+    wake = asyncio.Event()
+    subscription = subscribe(
+        user_id, functools.partial(loop.call_soon_threadsafe, wake.set)
+    )
+    try:
+        yield PREAMBLE
+        while True:
+            try:
+                await asyncio.wait_for(
+                    wake.wait(), settings.EVENTS_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+            yield format_events(*subscription.drain())
+    finally:
+        broker.unsubscribe(subscription)
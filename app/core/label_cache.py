@@ -0,0 +1,248 @@
+import bisect
+import heapq
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from django.db import connections, transaction
+from django.db.models import Count
+
+from core import events, sharding
+
+
+# Columns kept per label, enough to build instances for the serializers
+COLUMNS = {
+    'tag': ('id', 'name', 'user_id'),
+    'department': ('id', 'name', 'user_id', 'parent_id', 'path'),
+}
+
+# Sorts after any character a name continues a prefix with
+LAST_CHARACTER = chr(0x10ffff)
+
+
+def version_key(kind, user_id):
+    """Return the shared cache key versioning the user's labels of kind
+
+    kind is 'tag', 'department' or 'usage' for the employee counts of the
+    prefix indexes.
+    """
+    return f'label-cache:{kind}:{user_id}'
+
+
+def version_keys(key):
+    """Return the version keys of the changes an entry key depends on"""
+    name, user_id = key
+    kind, _, index = name.partition('_')
+    keys = [version_key(kind, user_id)]
+    if index:
+        keys.append(version_key('usage', user_id))
+    return keys
+
+
+class PrefixIndex:
+    """A user's labels sorted by case folded name, with their usage
+
+    Labels starting with a prefix are found by bisecting the names.
+    """
+
+    def __init__(self, rows, usage):
+        labels = sorted(
+            (row['name'].casefold(), row['id'], row['name'])
+            for row in rows.values()
+        )
+        self.keys = [key for key, _, _ in labels]
+        self.labels = [
+            {'id': pk, 'name': name, 'usage': usage.get(pk, 0)}
+            for _, pk, name in labels
+        ]
+
+    def search(self, prefix, limit):
+        """Return up to limit labels starting with prefix, most used first"""
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_right(self.keys, prefix + LAST_CHARACTER, start)
+        # Ties keep name order, nlargest is stable
+        return heapq.nlargest(
+            limit, self.labels[start:end], key=lambda label: label['usage']
+        )
+
+
+class LabelCache:
+    """Per-user tags and departments held in process memory
+
+    Entries are evicted least recently used beyond LABEL_CACHE_SIZE and
+    expire after LABEL_CACHE_TTL seconds. Every tag or department event
+    drops the user's entry for that kind. The prefix indexes count how
+    many employees use each label, employee events drop them as well.
+
+    Other workers see the events through a shared backplane. With a shared
+    cache each event also replaces a version token there, and entries
+    loaded under an older token are reloaded, whatever the backplane. With
+    neither nothing is kept, every read goes to the database.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Bumped by every invalidation, loads racing one aren't stored
+        self.generation = 0
+        self.listening = False
+        events.broker.add_listener(self.on_event)
+
+    def rows(self, model, user_id):
+        """Return {id: row} of the user's labels, ordered by name desc"""
+        kind = model._meta.model_name
+
+        def load(using):
+            return OrderedDict(
+                (row['id'], row) for row in
+                model.objects.using(using).filter(user_id=user_id)
+                .order_by('-name').values(*COLUMNS[kind])
+            )
+        return self.load((kind, user_id), user_id, load)
+
+    def index(self, model, user_id):
+        """Return the PrefixIndex of the user's labels"""
+        kind = model._meta.model_name
+        through = model.employee_set.through
+
+        def load(using):
+            usage = dict(
+                through.objects.using(using)
+                .filter(**{f'{kind}__user_id': user_id})
+                .values_list(f'{kind}_id')
+                .annotate(Count('employee_id'))
+                .order_by()
+            )
+            return PrefixIndex(self.rows(model, user_id), usage)
+        return self.load((f'{kind}_index', user_id), user_id, load)
+
+    def load(self, key, user_id, loader):
+        """Return the cached value of key, else load it from the shard"""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self.lock:
+            generation = self.generation
+
+        self.listen()
+        # Read before loading, so a change during the load isn't missed
+        versions = self.versions(key)
+        using = sharding.shard_for_user(user_id)
+        value = loader(using)
+        # Rows read inside a transaction may be uncommitted or rolled back
+        if connections[using].in_atomic_block or not self.enabled():
+            return value
+
+        expires = time.monotonic() + settings.LABEL_CACHE_TTL
+        with self.lock:
+            if generation == self.generation:
+                self.entries[key] = (expires, versions, value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > settings.LABEL_CACHE_SIZE:
+                    self.entries.popitem(last=False)
+        return value
+
+    def peek(self, model, user_id):
+        """Return the cached rows of rows(), None if not cached"""
+        return self.get((model._meta.model_name, user_id))
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+        if settings.CACHE_SHARED:
+            keys = version_keys(key)
+            current = shared_cache.get_many(keys)
+            # A version evicted from the shared cache counts as changed
+            if [current.get(name) for name in keys] != entry[1]:
+                return None
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        return entry[2]
+
+    def enabled(self):
+        """Return whether other workers' changes can reach this cache"""
+        return settings.CACHE_SHARED or \
+            not isinstance(events.backplane(), events.LocalBackplane)
+
+    def versions(self, key):
+        """Return the shared version tokens of key, None without a cache"""
+        if not settings.CACHE_SHARED:
+            return None
+        return [
+            shared_cache.get_or_set(name, uuid.uuid4().hex, None)
+            for name in version_keys(key)
+        ]
+
+    def bump(self, kind, user_id):
+        """Replace the shared version of the user's labels of kind"""
+        if settings.CACHE_SHARED:
+            shared_cache.set(
+                version_key(kind, user_id), uuid.uuid4().hex, None
+            )
+
+    def instances(self, model, user_id, ids=None):
+        """Return unsaved model instances of the user's labels
+
+        With ids only those labels are returned, in the order of ids. An
+        id the cached rows lack reloads them, ids the user still has no
+        label for are left out.
+        """
+        rows = self.rows(model, user_id)
+        if ids is not None:
+            ids = list(ids)
+            if not set(ids) <= set(rows):
+                self.invalidate(model._meta.model_name, user_id)
+                rows = self.rows(model, user_id)
+            rows = OrderedDict(
+                (pk, rows[pk]) for pk in ids if pk in rows
+            )
+        return [model(**row) for row in rows.values()]
+
+    def invalidate(self, kind, user_id):
+        with self.lock:
+            self.generation += 1
+            self.entries.pop((kind, user_id), None)
+            self.entries.pop((f'{kind}_index', user_id), None)
+
+    def invalidate_usage(self, user_id):
+        with self.lock:
+            self.generation += 1
+            for kind in COLUMNS:
+                self.entries.pop((f'{kind}_index', user_id), None)
+
+    def changed(self, kind, user_id, using='default'):
+        """Drop the user's labels of kind now and again once committed"""
+        self.invalidate(kind, user_id)
+        transaction.on_commit(
+            lambda: self.invalidate(kind, user_id), using=using
+        )
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def on_event(self, user_id, event):
+        if event['kind'] in COLUMNS:
+            self.bump(event['kind'], user_id)
+            self.invalidate(event['kind'], user_id)
+        elif event['kind'] == 'employee':
+            self.bump('usage', user_id)
+            self.invalidate_usage(user_id)
+
+    def listen(self):
+        """Start receiving the events of other workers"""
+        if not self.listening:
+            self.listening = True
+            events.backplane().start()
+
+
+cache = LabelCache()
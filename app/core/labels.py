@@ -0,0 +1,118 @@
+from django.db import connections
+from django.db.models import Q
+
+from core import changes, events, label_cache
+
+
+def resolve(model, user_id, ids, names, using='default'):
+    """Return the pks of the user's tags/departments by id or name
+
+    Existing labels are found in one query and missing names are created
+    in one INSERT ... ON CONFLICT DO NOTHING against the unique (user, name)
+    constraint, so concurrent writers can't create duplicates. The label
+    cache isn't consulted: it may hold labels another worker has deleted.
+    Raises model.DoesNotExist if an id isn't one of the user's labels.
+    """
+    ids, names = set(ids), set(names)
+    if not ids and not names:
+        return []
+
+    found = dict(
+        model.objects.using(using).filter(user_id=user_id).filter(
+            Q(pk__in=ids) | Q(name__in=names)
+        ).values_list('name', 'pk')
+    )
+    unknown = ids - set(found.values())
+    if unknown:
+        raise model.DoesNotExist(
+            f'Invalid pk "{min(unknown)}" - object does not exist.'
+        )
+
+    missing = names - set(found)
+    if missing:
+        found.update(_insert(model, user_id, sorted(missing), using))
+    return list(found.values())
+
+
+def _insert(model, user_id, names, using):
+    """Create the labels that don't exist yet, returning {name: pk}
+
+    Columns other than user and name get their model defaults.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    returning = connection.vendor == 'postgresql'
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    placeholders = f'({", ".join(["%s"] * len(fields))})'
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} '
+        f'({", ".join(quote(field.column) for field in fields)}) '
+        f'VALUES {", ".join([placeholders] * len(names))} '
+        f'ON CONFLICT ({quote("user_id")}, {quote("name")}) DO NOTHING'
+    )
+    if returning:
+        sql += ' RETURNING id, name'
+    params = []
+    for name in names:
+        for field in fields:
+            if field.attname == 'user_id':
+                params.append(user_id)
+            elif field.name == 'name':
+                params.append(name)
+            else:
+                params.append(field.get_db_prep_save(
+                    field.get_default(), connection
+                ))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        created = {name: pk for pk, name in cursor.fetchall()} \
+            if returning else {}
+
+    # Names inserted concurrently by another writer, or every name where
+    # the database can't return the inserted rows
+    if len(created) < len(names):
+        created.update(
+            model.objects.using(using).filter(
+                user_id=user_id,
+                name__in=[name for name in names if name not in created]
+            ).values_list('name', 'pk')
+        )
+
+    kind = model._meta.model_name
+    label_cache.cache.changed(kind, user_id, using)
+    changes.record(kind, user_id, created.values(), using=using)
+    events.publish(user_id, kind, 'created', created.values(), using)
+    return created
+
+
+def set_labels(instance, field_name, pks):
+    """Change an employee's tags or departments to pks, return if changed
+
+    The delta is taken from the relation's prefetched rows when present,
+    then applied with at most one DELETE and one INSERT on the through
+    table. Unlike .set() no m2m_changed signals are sent, callers refresh
+    the summary themselves.
+    """
+    manager = getattr(instance, field_name)
+    current = {label.pk for label in manager.all()}
+    added, removed = set(pks) - current, current - set(pks)
+    if not added and not removed:
+        return False
+
+    using = instance._state.db
+    through = manager.through
+    source = f'{manager.source_field_name}_id'
+    target = f'{manager.target_field_name}_id'
+    if removed:
+        through.objects.filter(
+            **{source: instance.pk, f'{target}__in': removed}
+        )._raw_delete(using)
+    if added:
+        through.objects.using(using).bulk_create([
+            through(**{source: instance.pk, target: pk}) for pk in added
+        ])
+    getattr(instance, '_prefetched_objects_cache', {}).pop(field_name, None)
+    return True
@@ -0,0 +1,99 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+from core.wsgi_adapter import PooledWsgiToAsgi
+
+
+async def request(application, scope):
+    """Send one bodyless request through application, return its status"""
+    status = None
+
+    async def receive():
+        return {'type': 'http.request'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+class Command(BaseCommand):
+    """Django command to compare a sync worker with the ASGI thread pool
+
+    The same requests go through the Django application on one thread, as
+    a sync WSGI worker serves them, and on a pool of --threads, as app.asgi
+    does. --latency adds a blocking wait to every request, standing in for
+    the database and file I/O the pool overlaps.
+    """
+    help = 'Time concurrent requests on one thread and on the ASGI pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/staff/employee/')
+        parser.add_argument(
+            '--token', help='API token sent as Authorization: Token'
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument(
+            '--latency', type=float, default=20,
+            help='Blocking I/O added to each request, in milliseconds'
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        django = get_wsgi_application()
+        latency = options['latency'] / 1000
+
+        def application(environ, start_response):
+            time.sleep(latency)
+            return django(environ, start_response)
+
+        path, _, query = options['path'].partition('?')
+        headers = [(b'host', b'localhost')]
+        if options['token']:
+            headers.append(
+                (b'authorization', f'Token {options["token"]}'.encode())
+            )
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'method': 'GET',
+            'path': path, 'query_string': query.encode(), 'headers': headers,
+        }
+
+        self.stdout.write(
+            f'{options["requests"]} x GET {options["path"]}, '
+            f'{options["concurrency"]} concurrent, '
+            f'{options["latency"]:g} ms I/O each'
+        )
+        for label, threads in (('sync worker', 1),
+                               ('asgi pool', options['threads'])):
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                elapsed, statuses = asyncio.get_event_loop() \
+                    .run_until_complete(self.run(
+                        PooledWsgiToAsgi(application, executor), scope,
+                        options['requests'], options['concurrency']
+                    ))
+            self.stdout.write(
+                f'{label:<12} {threads:>3} threads {elapsed * 1000:>9.0f} ms '
+                f'{options["requests"] / elapsed:>8.1f} req/s  '
+                f'statuses {sorted(set(statuses))}'
+            )
+
+    async def run(self, application, scope, count, concurrency):
+        """Send count requests, at most concurrency at once"""
+        slots = asyncio.Semaphore(concurrency)
+
+        async def limited():
+            async with slots:
+                return await request(application, scope)
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(limited() for _ in range(count)))
+        return time.perf_counter() - start, statuses
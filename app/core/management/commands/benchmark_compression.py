@@ -0,0 +1,83 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+
+from core import compression
+from core.models import Employee
+from core.renderers import MessagePackRenderer
+from staff.serializers import EmployeeSerializer
+
+
+def best_time(function, repeat):
+    """Return the result of function and its fastest run, in milliseconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+class Command(BaseCommand):
+    """Django command to measure response formats and compression codecs
+
+    Renders a page of a tenant's employee list as JSON and MessagePack,
+    then compresses each body with every installed codec, reporting bytes
+    on the wire and the CPU time of rendering and compressing.
+    """
+    help = 'Compare employee list sizes and CPU cost per format and codec'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help='Tenant to measure (email), default the largest'
+        )
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        users = get_user_model().objects.all()
+        if options['user']:
+            user = users.filter(email=options['user']).first()
+        else:
+            user = users.annotate(employees=Count('employee')) \
+                .order_by('-employees').first()
+        if user is None:
+            raise CommandError('No user to benchmark')
+
+        employees = Employee.objects.filter(user=user).order_by('-id') \
+            .prefetch_related('tags', 'department')[:options['limit']]
+        data = EmployeeSerializer(employees, many=True).data
+        self.stdout.write(f'{len(data)} employees of {user.email}')
+        self.stdout.write(
+            f'{"format":<8} {"coding":<9} {"bytes":>9} {"ratio":>7} '
+            f'{"render ms":>10} {"compress ms":>12}'
+        )
+
+        repeat = options['repeat']
+        baseline = None
+        for name, renderer in (('json', JSONRenderer()),
+                               ('msgpack', MessagePackRenderer())):
+            body, render_ms = best_time(
+                lambda: renderer.render(data), repeat
+            )
+            baseline = baseline or len(body)
+            self.report(name, 'identity', len(body), baseline, render_ms, 0)
+            for coding, stream in compression.available_codecs():
+                compressed, compress_ms = best_time(
+                    lambda: compression.compress(stream, body), repeat
+                )
+                self.report(
+                    name, coding, len(compressed), baseline, render_ms,
+                    compress_ms
+                )
+
+    def report(self, name, coding, size, baseline, render_ms, compress_ms):
+        self.stdout.write(
+            f'{name:<8} {coding:<9} {size:>9} {size / baseline:>7.1%} '
+            f'{render_ms:>10.2f} {compress_ms:>12.2f}'
+        )
@@ -0,0 +1,107 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count
+
+from core.models import Employee
+
+
+def scanned_relations(plan):
+    """Return the tables and partitions a query plan reads"""
+    relations = []
+    if 'Relation Name' in plan:
+        relations.append(plan['Relation Name'])
+    for child in plan.get('Plans', ()):
+        relations.extend(scanned_relations(child))
+    return relations
+
+
+class Command(BaseCommand):
+    """Django command to measure the staff queries of one tenant
+
+    Run it before and after partition_staff_tables to compare: with
+    partitions each query should read a single partition per table.
+    """
+    help = 'Explain the employee API queries and time a tenant delete'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help='Tenant to measure (email), default the largest'
+        )
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        using = options['database']
+        if connections[using].vendor != 'postgresql':
+            raise CommandError('The benchmark needs PostgreSQL')
+
+        users = get_user_model().objects.using(using)
+        if options['user']:
+            user = users.filter(email=options['user']).first()
+        else:
+            user = users.annotate(employees=Count('employee')) \
+                .order_by('-employees').first()
+        if user is None:
+            raise CommandError('No user to benchmark')
+
+        employees = Employee.objects.using(using).filter(user=user)
+        page = list(
+            employees.order_by('-id').values_list('id', flat=True)[:100]
+        )
+        queries = (
+            ('employee list', employees.order_by('-id')),
+            ('employee detail', employees.filter(pk__in=page[:1])),
+            ('tags prefetch', Employee.tags.through.objects.using(using)
+             .filter(employee_id__in=page)),
+            ('departments prefetch', Employee.department.through.objects
+             .using(using).filter(employee_id__in=page)),
+        )
+        for label, queryset in queries:
+            self.explain(using, label, queryset)
+
+        self.time_delete(using, user)
+
+    def explain(self, using, label, queryset):
+        """Print the relations read and the execution time of queryset"""
+        sql, params = queryset.query.sql_with_params()
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', params)
+            result = cursor.fetchone()[0]
+        if isinstance(result, str):
+            result = json.loads(result)
+        relations = scanned_relations(result[0]['Plan'])
+        self.stdout.write(
+            f'{label:<22} {result[0]["Execution Time"]:>9.2f} ms  '
+            f'reads {", ".join(sorted(set(relations)))}'
+        )
+
+    def time_delete(self, using, user):
+        """Time deleting the tenant's employee rows, then roll back"""
+        connection = connections[using]
+        quote = connection.ops.quote_name
+        employee = quote(Employee._meta.db_table)
+        with transaction.atomic(using=using):
+            start = time.perf_counter()
+            with connection.cursor() as cursor:
+                for field in (Employee.tags, Employee.department):
+                    cursor.execute(
+                        f'DELETE FROM {quote(field.through._meta.db_table)} '
+                        f'WHERE employee_id IN '
+                        f'(SELECT id FROM {employee} WHERE user_id = %s)',
+                        [user.pk]
+                    )
+                cursor.execute(
+                    f'DELETE FROM {employee} WHERE user_id = %s', [user.pk]
+                )
+                deleted = cursor.rowcount
+            elapsed = (time.perf_counter() - start) * 1000
+            transaction.set_rollback(True, using=using)
+
+        self.stdout.write(
+            f'{"tenant delete":<22} {elapsed:>9.2f} ms  '
+            f'{deleted} employees, rolled back'
+        )
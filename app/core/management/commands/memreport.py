@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import memory
+
+
+def megabytes(size):
+    return f'{size / 1024 / 1024:.1f} MB'
+
+
+class Command(BaseCommand):
+    """Django command to show the memory reports of the workers"""
+    help = 'Show RSS, gc counters and allocations per route of each worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        reports = memory.load_reports()
+        if not reports:
+            self.stdout.write(
+                'No reports yet, run the workers with MEMORY_PROFILING=1'
+            )
+            return
+
+        for report in reports:
+            age = time.time() - report['written']
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'Worker {report["pid"]}: {megabytes(report["rss"])} RSS, '
+                f'reported {age:.0f}s ago'
+            ))
+            self.stdout.write(
+                f'  gc counts {report["gc"]["counts"]}, '
+                f'{report["gc"]["uncollectable"]} uncollectable'
+            )
+            if report['debug']:
+                self.stdout.write(self.style.WARNING(
+                    '  DEBUG is on, every query is kept in memory'
+                ))
+            if not report['tracing']:
+                continue
+
+            self.stdout.write(
+                f'  traced {megabytes(report["traced"])}, '
+                f'peak {megabytes(report["traced_peak"])}'
+            )
+            routes = list(report['routes'].items())[:options['top']]
+            for route, stats in routes:
+                self.stdout.write(
+                    f'  {route:<40} {stats["requests"]:>6} requests  '
+                    f'peak {megabytes(stats["peak_max"])}  '
+                    f'left {megabytes(stats["growth_total"])}'
+                )
+            for stat in report['growth'][:options['top']]:
+                self.stdout.write(
+                    f'  +{megabytes(stat["size_diff"])} '
+                    f'({stat["count_diff"]:+} blocks) {stat["line"]}'
+                )
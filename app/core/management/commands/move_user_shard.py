@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+
+
+class Command(BaseCommand):
+    """Django command to move a user's staff data to another shard"""
+    help = 'Move the tags, departments and employees of a user to a shard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+        parser.add_argument('shard')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        target = options['shard']
+        if target not in settings.DATABASE_SHARDS:
+            raise CommandError(f'Unknown shard {target}')
+
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user {options["email"]}')
+
+        if sharding.shard_for_user(user.pk) == target:
+            self.stdout.write(f'User already on {target}')
+            return
+
+        source = sharding.move_user(
+            user, target,
+            batch_size=options['batch_size'],
+            log=self.stdout.write
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Moved {user.email} from {source} to {target}')
+        )
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from core import partitioning
+
+
+class Command(BaseCommand):
+    """Django command to hash partition the staff tables"""
+    help = 'Convert the employee tables to hash partitioned tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--partitions', type=int, default=settings.STAFF_PARTITIONS
+        )
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        if options['partitions'] < 1:
+            raise CommandError('Pass --partitions or set STAFF_PARTITIONS')
+
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL')
+        try:
+            with transaction.atomic(using=options['database']):
+                converted = partitioning.partition(
+                    connection, options['partitions']
+                )
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        for table in converted:
+            self.stdout.write(f'Partitioned {table}')
+        self.stdout.write(self.style.SUCCESS('Staff tables partitioned'))
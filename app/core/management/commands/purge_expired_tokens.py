@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import AuthToken
+
+
+class Command(BaseCommand):
+    """Django command to delete expired auth tokens"""
+    help = 'Delete expired auth tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        now = timezone.now()
+        expired = AuthToken.objects.filter(expires__lte=now)
+        total = 0
+        while True:
+            keys = list(
+                expired.values_list('key', flat=True)[:options['batch_size']]
+            )
+            if not keys:
+                break
+            AuthToken.objects.filter(key__in=keys)._raw_delete('default')
+            total += len(keys)
+        self.stdout.write(
+            self.style.SUCCESS(f'{total} expired tokens deleted')
+        )
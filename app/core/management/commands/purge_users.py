@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import purge, sharding
+
+
+class Command(BaseCommand):
+    """Django command to purge deactivated users and their staff data"""
+    help = 'Delete deactivated users in chunks, resuming unfinished purges'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--watch', action='store_true',
+            help='Keep running, looking for new users every --interval'
+        )
+        parser.add_argument('--interval', type=float, default=60)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        while True:
+            for user in purge.pending_users():
+                if sharding.is_locked(user.pk):
+                    self.stdout.write(f'{user.email}: being moved, skipped')
+                    continue
+                self.purge(user, options['chunk_size'])
+            if not options['watch']:
+                break
+            time.sleep(options['interval'])
+
+    def purge(self, user, chunk_size):
+        email = user.email
+
+        def progress(label, count):
+            self.stdout.write(f'{email}: {count} {label} deleted')
+
+        purge.purge_user(user, chunk_size=chunk_size, progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'{email}: purged'))
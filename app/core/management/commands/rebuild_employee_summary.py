@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import summary
+
+
+class Command(BaseCommand):
+    """Django command to repair the employee summary table"""
+    help = 'Recreate missing employee summaries and recompute all of them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild this user (email)')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        user_id = None
+        if options['user']:
+            try:
+                user_id = get_user_model().objects.get(
+                    email=options['user']
+                ).pk
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user {options["user"]}')
+
+        summary.rebuild(user_id=user_id, using=options['database'])
+        self.stdout.write(self.style.SUCCESS('Employee summaries rebuilt'))
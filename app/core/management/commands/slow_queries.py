@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from core.models import SlowQuery
+
+
+ORDERINGS = {
+    'total': '-total_ms',
+    'max': '-max_ms',
+    'calls': '-calls',
+    'mean': F('total_ms') / F('calls'),
+}
+
+
+class Command(BaseCommand):
+    """Django command to show the slowest query fingerprints"""
+    help = 'List the top slow query fingerprints with their plans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument(
+            '--order', choices=sorted(ORDERINGS), default='total'
+        )
+        parser.add_argument(
+            '--plans', action='store_true', help='Print the captured plans'
+        )
+        parser.add_argument(
+            '--reset', action='store_true', help='Clear the statistics'
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(f'{deleted} fingerprints cleared')
+            return
+
+        ordering = ORDERINGS[options['order']]
+        if not isinstance(ordering, str):
+            ordering = ordering.desc()
+        queries = SlowQuery.objects.order_by(ordering)[:options['top']]
+        for query in queries:
+            self.stdout.write(
+                f'{query.fingerprint[:8]}  {query.calls:>6} calls  '
+                f'{query.total_ms:>10.1f} ms total  '
+                f'{query.mean_ms:>8.1f} ms mean  '
+                f'{query.max_ms:>8.1f} ms max  {query.call_site}'
+            )
+            self.stdout.write(f'    {query.sql}')
+            if options['plans'] and query.plan:
+                for line in query.plan.splitlines():
+                    self.stdout.write(f'    | {line}')
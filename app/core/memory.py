@@ -0,0 +1,156 @@
+import gc
+import json
+import os
+import resource
+import signal
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connections
+
+
+def rss_bytes():
+    """Return the resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # No procfs, fall back to the peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+def gc_stats():
+    """Return the collector's counters per generation"""
+    return {
+        'counts': list(gc.get_count()),
+        'thresholds': list(gc.get_threshold()),
+        'generations': gc.get_stats(),
+        'uncollectable': len(gc.garbage),
+    }
+
+
+class Tracker:
+    """Allocation statistics per route and snapshot diffs of this process
+
+    Routes get their request count, the peak allocated while a request ran
+    and the memory they left allocated. With concurrent requests in one
+    process the figures include what the other requests allocated.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.baseline = None
+        self.dumped = time.monotonic()
+
+    def record(self, route, peak, growth):
+        with self.lock:
+            stats = self.routes.setdefault(route, {
+                'requests': 0, 'peak_max': 0, 'peak_total': 0,
+                'growth_total': 0,
+            })
+            stats['requests'] += 1
+            stats['peak_max'] = max(stats['peak_max'], peak)
+            stats['peak_total'] += peak
+            stats['growth_total'] += growth
+
+    def diff(self, top):
+        """Return the lines that grew most since the previous diff"""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ))
+        baseline, self.baseline = self.baseline, snapshot
+        if baseline is None:
+            return []
+        return [
+            {'line': str(stat.traceback), 'size_diff': stat.size_diff,
+             'count_diff': stat.count_diff, 'size': stat.size}
+            for stat in snapshot.compare_to(baseline, 'lineno')[:top]
+            if stat.size_diff > 0
+        ]
+
+    def report(self, top=10):
+        """Return the memory report of this process"""
+        report = {
+            'pid': os.getpid(),
+            'written': time.time(),
+            'rss': rss_bytes(),
+            'debug': settings.DEBUG,
+            'debug_queries': sum(
+                len(connection.queries_log)
+                for connection in connections.all()
+            ),
+            'gc': gc_stats(),
+            'tracing': tracemalloc.is_tracing(),
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            with self.lock:
+                routes = sorted(
+                    self.routes.items(),
+                    key=lambda item: item[1]['peak_max'], reverse=True
+                )
+            report.update(
+                traced=current,
+                traced_peak=peak,
+                routes=dict(routes[:top]),
+                growth=self.diff(top),
+            )
+        return report
+
+    def path(self, pid=None):
+        return os.path.join(
+            settings.MEMORY_REPORT_DIR, f'{pid or os.getpid()}.json'
+        )
+
+    def dump(self):
+        """Write this process's report for manage.py memreport"""
+        self.dumped = time.monotonic()
+        os.makedirs(settings.MEMORY_REPORT_DIR, exist_ok=True)
+        path = self.path()
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(self.report(), f)
+        os.replace(f'{path}.tmp', path)
+
+    def dump_due(self):
+        return time.monotonic() - self.dumped >= \
+            settings.MEMORY_REPORT_INTERVAL
+
+
+tracker = Tracker()
+
+
+def load_reports():
+    """Return the reports dumped by the worker processes, newest first"""
+    try:
+        names = os.listdir(settings.MEMORY_REPORT_DIR)
+    except FileNotFoundError:
+        return []
+    reports = []
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(settings.MEMORY_REPORT_DIR, name)) as f:
+                reports.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # Removed or being replaced meanwhile
+    return sorted(reports, key=lambda report: report['written'], reverse=True)
+
+
+def recycle(sender=None, **kwargs):
+    """Stop this worker once the response went out, to be replaced
+
+    SIGTERM makes gunicorn and uvicorn workers finish in-flight requests
+    and exit, their manager then starts a fresh one.
+    """
+    request_finished.disconnect(recycle)
+    try:
+        os.remove(tracker.path())
+    except FileNotFoundError:
+        pass
+    os.kill(os.getpid(), signal.SIGTERM)
@@ -0,0 +1,316 @@
+import hashlib
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_finished
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import AuthenticationFailed
+
+from core import compression, memory, profiling, routers
+from core.authentication import ExpiringTokenAuthentication
+
+
+def check_database():
+    """Return True if the default database answers a trivial query"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception:
+        return False
+    return True
+
+
+def check_migrations():
+    """Return True if there are no unapplied migrations"""
+    try:
+        executor = MigrationExecutor(connection)
+        targets = executor.loader.graph.leaf_nodes()
+        return not executor.migration_plan(targets)
+    except Exception:
+        return False
+
+
+def check_media_storage():
+    """Return True if a file can be written to MEDIA_ROOT"""
+    try:
+        with tempfile.NamedTemporaryFile(dir=settings.MEDIA_ROOT):
+            pass
+    except OSError:
+        return False
+    return True
+
+
+READINESS_CHECKS = (
+    ('database', check_database),
+    ('migrations', check_migrations),
+    ('media_storage', check_media_storage),
+)
+
+
+class HealthCheckMiddleware:
+    """Answer load balancer probes before the rest of the middleware stack
+
+    /healthz only confirms the process is serving requests and never touches
+    the database. /readyz runs the readiness checks and caches the result
+    for HEALTH_CHECK_CACHE_TTL seconds so frequent probes stay cheap.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._ready_result = None
+        self._ready_expires = 0
+
+    def __call__(self, request):
+        path = request.path_info.rstrip('/')
+        if path == settings.HEALTH_CHECK_LIVE_PATH:
+            return HttpResponse('ok', content_type='text/plain')
+        if path == settings.HEALTH_CHECK_READY_PATH:
+            return self.readiness()
+
+        return self.get_response(request)
+
+    def readiness(self):
+        """Return the cached readiness response, refreshing it if stale"""
+        now = time.monotonic()
+        if self._ready_result is None or now >= self._ready_expires:
+            self._ready_result = {
+                name: check() for name, check in READINESS_CHECKS
+            }
+            self._ready_expires = now + settings.HEALTH_CHECK_CACHE_TTL
+
+        status = 200 if all(self._ready_result.values()) else 503
+        return JsonResponse(self._ready_result, status=status)
+
+
+class ReplicaRoutingMiddleware:
+    """Route the reads of safe requests to a database replica
+
+    Unsafe requests read from the primary. After a successful write the
+    client is kept on the primary for DATABASE_REPLICA_STICKY_SECONDS so it
+    reads its own writes while the replicas catch up. The window is kept in
+    the default cache, which must be shared for it to hold across workers.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sticky_key = self.sticky_key(request)
+        use_replica = (
+            request.method in self.SAFE_METHODS and
+            not (sticky_key and cache.get(sticky_key))
+        )
+        routers.pin_reads(routers.choose_replica() if use_replica else None)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.release_reads()
+
+        if (sticky_key and request.method not in self.SAFE_METHODS and
+                response.status_code < 400):
+            cache.set(
+                sticky_key, True, settings.DATABASE_REPLICA_STICKY_SECONDS
+            )
+
+        return response
+
+    def sticky_key(self, request):
+        """Return the cache key identifying the client, if any"""
+        credentials = (
+            request.META.get('HTTP_AUTHORIZATION') or
+            request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        )
+        if not credentials:
+            return None
+        digest = hashlib.sha1(credentials.encode()).hexdigest()
+        return f'replica-sticky:{digest}'
+
+
+class ConcurrencyLimitMiddleware:
+    """Shed load once MAX_IN_FLIGHT_REQUESTS are running in this process
+
+    Rejected requests get 503 with Retry-After straight away instead of
+    queueing behind requests the worker cannot finish in time.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limit = settings.MAX_IN_FLIGHT_REQUESTS
+        self._slots = threading.BoundedSemaphore(self.limit or 1)
+
+    def __call__(self, request):
+        if not self.limit:
+            return self.get_response(request)
+
+        if not self._slots.acquire(blocking=False):
+            response = JsonResponse(
+                {'detail': 'Server is busy, retry shortly.'}, status=503
+            )
+            response['Retry-After'] = str(settings.SHED_RETRY_AFTER)
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            self._slots.release()
+
+
+class CompressionMiddleware:
+    """Compress responses with the best encoding the client accepts
+
+    Brotli and zstandard are offered when their packages are installed,
+    gzip always. Bodies under COMPRESSION_MIN_SIZE bytes are sent as is,
+    streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and \
+                len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding, stream = compression.negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if coding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compression.compress_sequence(
+                stream, response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            compressed = compression.compress(stream, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile requests flagged by staff and a share of all requests
+
+    Staff send X-Profile: 1 or ?profile=1, PROFILE_SAMPLE_RATE picks
+    requests at random. Profiles are stored by core.profiling and shown on
+    /admin/profiles/. Unprofiled requests only pay for the checks.
+    """
+    HEADER = 'HTTP_X_PROFILE'
+    PARAM = 'profile'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reason = self.reason(request)
+        if reason is None:
+            return self.get_response(request)
+
+        with profiling.Profile(reason) as profile:
+            response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        response['X-Profile-Id'] = profiling.save(profile.as_dict(
+            method=request.method,
+            path=request.get_full_path(),
+            status=response.status_code,
+            user=user.get_username() if user is not None else '',
+        ))
+        return response
+
+    def reason(self, request):
+        """Return why request is profiled, None if it isn't"""
+        if (request.META.get(self.HEADER) == '1' or
+                request.GET.get(self.PARAM) == '1') and is_staff(request):
+            return 'requested'
+        rate = settings.PROFILE_SAMPLE_RATE
+        if rate and random.random() < rate:
+            return 'sampled'
+        return None
+
+
+class MemoryMiddleware:
+    """Track allocations per route and recycle workers grown too large
+
+    With MEMORY_PROFILING tracemalloc runs and every route's peak and
+    leftover allocations are counted, the report being dumped for
+    manage.py memreport every MEMORY_REPORT_INTERVAL seconds. Workers
+    whose RSS passes MEMORY_MAX_RSS_MB stop after the response. Left out
+    of the stack entirely when neither is set.
+    """
+
+    def __init__(self, get_response):
+        if not settings.MEMORY_PROFILING and not settings.MEMORY_MAX_RSS_MB:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.max_rss = settings.MEMORY_MAX_RSS_MB * 1024 * 1024
+        self.recycling = False
+        if settings.MEMORY_PROFILING and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.MEMORY_TRACE_FRAMES)
+
+    def __call__(self, request):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            before = tracemalloc.get_traced_memory()[0]
+            # Python < 3.9 can't reset the peak, the leftover is used then
+            reset_peak = getattr(tracemalloc, 'reset_peak', None)
+            if reset_peak is not None:
+                reset_peak()
+
+        response = self.get_response(request)
+
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if reset_peak is None:
+                peak = current
+            memory.tracker.record(
+                self.route(request), max(peak - before, 0), current - before
+            )
+            if memory.tracker.dump_due():
+                memory.tracker.dump()
+
+        if self.max_rss and not self.recycling and \
+                memory.rss_bytes() > self.max_rss:
+            self.recycling = True
+            request_finished.connect(memory.recycle)
+        return response
+
+    def route(self, request):
+        """Return the method and URL name, or path if unresolved"""
+        match = getattr(request, 'resolver_match', None)
+        name = match.view_name if match is not None else request.path_info
+        return f'{request.method} {name}'
+
+
+def is_staff(request):
+    """Return True if the session or token user of request is staff"""
+    if request.user.is_staff:
+        return True
+    try:
+        result = ExpiringTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return result is not None and result[0].is_staff
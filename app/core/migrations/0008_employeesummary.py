@@ -0,0 +1,67 @@
+# Generated by Django 2.1.15 on 2026-10-19 12:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# The SQL of core.summary.rebuild as of this migration, so later changes to
+# the app code don't change what replaying it does
+LABELS_SQL = {
+    'postgresql': (
+        "COALESCE((SELECT json_agg(json_build_array(l.id, l.name))::text "
+        "FROM core_employee_{field} r JOIN core_{label} l ON l.id = r.{label}_id "
+        "WHERE r.employee_id = core_employeesummary.employee_id), '[]')"
+    ),
+    'sqlite': (
+        "(SELECT json_group_array(json_array(l.id, l.name)) "
+        "FROM core_employee_{field} r JOIN core_{label} l ON l.id = r.{label}_id "
+        "WHERE r.employee_id = core_employeesummary.employee_id)"
+    ),
+}
+
+
+def rebuild_summaries(connection):
+    """Create the missing summary rows and recompute all of them"""
+    labels = LABELS_SQL[connection.vendor]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO core_employeesummary "
+            "(employee_id, user_id, title, tags, department) "
+            "SELECT e.id, e.user_id, e.title, '[]', '[]' FROM core_employee e "
+            "LEFT JOIN core_employeesummary s ON s.employee_id = e.id "
+            "WHERE s.employee_id IS NULL"
+        )
+        cursor.execute(
+            "UPDATE core_employeesummary SET "
+            "title = (SELECT e.title FROM core_employee e "
+            "WHERE e.id = core_employeesummary.employee_id), "
+            f"tags = {labels.format(field='tags', label='tag')}, "
+            f"department = "
+            f"{labels.format(field='department', label='department')}"
+        )
+
+
+def build_summaries(apps, schema_editor):
+    rebuild_summaries(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_shardassignment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeSummary',
+            fields=[
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='core.Employee')),
+                ('title', models.CharField(max_length=255)),
+                ('tags', models.TextField(default='[]')),
+                ('department', models.TextField(default='[]')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
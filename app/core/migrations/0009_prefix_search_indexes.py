@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+# Admin prefix search runs UPPER(column) LIKE 'TERM%', which PostgreSQL
+# can only serve from an expression index using text_pattern_ops.
+INDEXES = (
+    ('core_employee_title_prefix', 'core_employee', 'title'),
+    ('core_tag_name_prefix', 'core_tag', 'name'),
+    ('core_department_name_prefix', 'core_department', 'name'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} '
+            f'ON {table} (UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_employeesummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 2.1.15 on 2026-10-19 12:38
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+# The SQL of core.summary.rebuild as of this migration, so later changes to
+# the app code don't change what replaying it does
+LABELS_SQL = {
+    'postgresql': (
+        "COALESCE((SELECT json_agg(json_build_array(l.id, l.name))::text "
+        "FROM core_employee_{field} r JOIN core_{label} l ON l.id = r.{label}_id "
+        "WHERE r.employee_id = core_employeesummary.employee_id), '[]')"
+    ),
+    'sqlite': (
+        "(SELECT json_group_array(json_array(l.id, l.name)) "
+        "FROM core_employee_{field} r JOIN core_{label} l ON l.id = r.{label}_id "
+        "WHERE r.employee_id = core_employeesummary.employee_id)"
+    ),
+}
+
+
+def rebuild_summaries(connection):
+    """Create the missing summary rows and recompute all of them"""
+    labels = LABELS_SQL[connection.vendor]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO core_employeesummary "
+            "(employee_id, user_id, title, tags, department) "
+            "SELECT e.id, e.user_id, e.title, '[]', '[]' FROM core_employee e "
+            "LEFT JOIN core_employeesummary s ON s.employee_id = e.id "
+            "WHERE s.employee_id IS NULL"
+        )
+        cursor.execute(
+            "UPDATE core_employeesummary SET "
+            "title = (SELECT e.title FROM core_employee e "
+            "WHERE e.id = core_employeesummary.employee_id), "
+            f"tags = {labels.format(field='tags', label='tag')}, "
+            f"department = "
+            f"{labels.format(field='department', label='department')}"
+        )
+
+
+def merge_duplicates(apps, schema_editor):
+    """Fold labels sharing a user and name into the oldest of them"""
+    db = schema_editor.connection.alias
+    Employee = apps.get_model('core', 'Employee')
+    merged = False
+    for model_name, field_name in (('Tag', 'tags'),
+                                   ('Department', 'department')):
+        Label = apps.get_model('core', model_name)
+        through = Employee._meta.get_field(field_name).remote_field.through
+        column = f'{model_name.lower()}_id'
+        duplicates = Label.objects.using(db).values('user_id', 'name') \
+            .annotate(keep=Min('id'), total=Count('id')) \
+            .filter(total__gt=1)
+        for duplicate in duplicates:
+            others = Label.objects.using(db).filter(
+                user_id=duplicate['user_id'], name=duplicate['name']
+            ).exclude(id=duplicate['keep'])
+            linked = through.objects.using(db).filter(
+                **{column: duplicate['keep']}
+            ).values('employee_id')
+            employee_ids = set(
+                through.objects.using(db).filter(
+                    **{f'{column}__in': others.values('id')}
+                ).exclude(employee_id__in=linked)
+                .values_list('employee_id', flat=True)
+            )
+            through.objects.using(db).bulk_create([
+                through(employee_id=employee_id,
+                        **{column: duplicate['keep']})
+                for employee_id in employee_ids
+            ])
+            others.delete()
+            merged = True
+
+    if merged:
+        rebuild_summaries(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_change'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.1.15 on 2026-10-19 12:38
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_merge_duplicate_labels'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='department',
+            unique_together={('user', 'name')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='tag',
+            unique_together={('user', 'name')},
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.1.15 on 2026-10-19 12:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_label_unique_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='core.Department'),
+        ),
+        migrations.AddField(
+            model_name='department',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.15 on 2026-10-19 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_slowquery'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='department',
+            name='path',
+            field=models.TextField(blank=True, db_index=True, default='', editable=False),
+        ),
+    ]
@@ -1,10 +1,15 @@
+import binascii
 import uuid
 import os
 
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Max, Q, Value
+from django.db.models.functions import Concat, Length, Substr
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 from django.conf import settings
+from django.utils import timezone
 
 
 def employee_image_file_path(instance, filename):
@@ -42,13 +47,56 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Set when the user deletes their account, purge_users then removes it
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
 
-class Tag(models.Model):
+class VersionConflict(Exception):
+    """A versioned row changed or went away since it was read"""
+
+
+class VersionedModel(models.Model):
+    """Model whose rows carry a version, bumped by every save
+
+    Saving a loaded row is one UPDATE conditional on the version read, so
+    a write that happened in between raises VersionConflict rather than
+    being overwritten. No row locks are taken.
+    """
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields,
+                   forced_update):
+        # New rows with a preset pk and copies to another database keep the
+        # plain update-or-insert behaviour
+        if self._state.adding or self._state.db != using:
+            return super()._do_update(base_qs, using, pk_val, values,
+                                      update_fields, forced_update)
+
+        field = self._meta.get_field('version')
+        version = self.version + 1
+        values = [value for value in values if value[0] is not field]
+        values.append((field, None, version))
+        updated = super()._do_update(
+            base_qs.filter(version=self.version), using, pk_val, values,
+            update_fields, forced_update
+        )
+        if not updated:
+            raise VersionConflict(
+                f'{self._meta.object_name} {pk_val} is no longer at version '
+                f'{self.version}'
+            )
+        self.version = version
+        return True
+
+
+class Tag(VersionedModel):
     """Tag to be used for staff"""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
@@ -56,23 +104,112 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        unique_together = ('user', 'name')
+
     def __str__(self):
         return self.name
 
 
-class Department(models.Model):
-    """ Department to be used """
+class Department(VersionedModel):
+    """ Department to be used
+
+    Departments nest under an optional parent. path holds the ids of the
+    ancestors, root first, as "1/4/", so a subtree is one prefix match.
+    Paths are kept under PATH_MAX_LENGTH characters, a hundred levels or
+    more, so they stay well within what a btree index entry can hold.
+    """
+    PATH_MAX_LENGTH = 1000
+
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    parent = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='children'
+    )
+    path = models.TextField(
+        blank=True, default='', db_index=True, editable=False
+    )
+
+    class Meta:
+        unique_together = ('user', 'name')
 
     def __str__(self):
         return self.name
 
+    @property
+    def subtree_path(self):
+        """Return the path prefix of every department below this one"""
+        return f'{self.path}{self.pk}/'
+
+    def subtree(self):
+        """Return this department and every department below it"""
+        return Department.objects.filter(user_id=self.user_id).filter(
+            Q(pk=self.pk) | Q(path__startswith=self.subtree_path)
+        )
+
+    def headcount(self):
+        """Count the employees in this department or any below it"""
+        return Employee.department.through.objects.filter(
+            department__in=self.subtree()
+        ).values('employee_id').distinct().count()
+
+    def parent_error(self, parent):
+        """Return why parent can't hold this department, None if it can"""
+        if parent is None:
+            return None
+        if parent.user_id != self.user_id:
+            return 'The parent must belong to the same user.'
+        if self.pk is None:
+            deepest = 0
+        else:
+            if parent.pk == self.pk or \
+                    parent.path.startswith(self.subtree_path):
+                return 'A department cannot be moved below itself.'
+            # How much longer than this one's the paths below it are
+            longest = Department.objects.using(self._state.db or 'default') \
+                .filter(user_id=self.user_id,
+                        path__startswith=self.subtree_path) \
+                .aggregate(longest=Max(Length('path')))['longest']
+            deepest = longest - len(self.path) if longest else 0
+        if len(parent.subtree_path) + deepest > self.PATH_MAX_LENGTH:
+            return 'The department tree would be nested too deeply.'
+        return None
 
-class Employee(models.Model):
+    def clean(self):
+        super().clean()
+        error = self.parent_error(self.parent if self.parent_id else None)
+        if error is not None:
+            raise ValidationError({'parent': error})
+
+    def save(self, *args, **kwargs):
+        """Save, moving the departments below along with a new parent"""
+        old_prefix = self.subtree_path
+        path = self.parent.subtree_path if self.parent_id else ''
+        moved = self.pk is not None and path != self.path
+        if moved or self.pk is None:
+            error = self.parent_error(self.parent if self.parent_id else None)
+            if error is not None:
+                raise ValidationError({'parent': error})
+
+        self.path = path
+        super().save(*args, **kwargs)
+
+        if moved:
+            Department.objects.using(self._state.db).filter(
+                user_id=self.user_id, path__startswith=old_prefix
+            ).update(path=Concat(
+                Value(self.subtree_path), Substr('path', len(old_prefix) + 1)
+            ))
+
+
+class Employee(VersionedModel):
     """ Employee object """
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -90,3 +227,114 @@ class Employee(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class ShardAssignment(models.Model):
+    """Directory entry placing a user's staff data on a database shard"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    shard = models.CharField(max_length=64)
+    locked = models.BooleanField(default=False)
+
+    def __str__(self):
+        return self.shard
+
+
+class EmployeeSummary(models.Model):
+    """Denormalized employee row with its tag and department names
+
+    tags and department hold JSON lists of [id, name] pairs, kept in sync
+    by core.summary so lists can be served without the M2M joins.
+    """
+    employee = models.OneToOneField(
+        'Employee',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='summary'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    title = models.CharField(max_length=255)
+    tags = models.TextField(default='[]')
+    department = models.TextField(default='[]')
+
+    def __str__(self):
+        return self.title
+
+
+class Change(models.Model):
+    """Latest change to one of a user's tags, departments or employees
+
+    Ids only grow, so they double as sync tokens. Each object keeps just
+    its most recent change, deleted objects keep a tombstone.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=20)
+    object_id = models.IntegerField()
+    deleted = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+            models.Index(fields=['kind', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
+
+
+class AuthToken(models.Model):
+    """Expiring API token, users hold one per device"""
+    key = models.CharField(max_length=40, primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='auth_tokens',
+        on_delete=models.CASCADE
+    )
+    device = models.CharField(max_length=255, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    expires = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = binascii.hexlify(os.urandom(20)).decode()
+        if not self.expires:
+            self.expires = timezone.now() + settings.AUTH_TOKEN_TTL
+        super().save(*args, **kwargs)
+
+
+class SlowQuery(models.Model):
+    """Statistics of the queries over SLOW_QUERY_MS sharing a fingerprint
+
+    sql is the query with its values replaced, plan the estimated plan
+    captured the first time it was seen. See core.slow_queries.
+    """
+    fingerprint = models.CharField(max_length=32, primary_key=True)
+    sql = models.TextField()
+    database = models.CharField(max_length=64)
+    call_site = models.CharField(max_length=255, blank=True)
+    calls = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    plan = models.TextField(blank=True)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.sql
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.calls if self.calls else 0
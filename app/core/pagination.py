@@ -0,0 +1,117 @@
+import functools
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+
+def planner_estimate(queryset):
+    """Return PostgreSQL's row estimate for queryset, None elsewhere"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def cached_count(key, queryset):
+    """Return the count cached under key, counting queryset on a miss
+
+    Counts are only cached in a cache shared by all workers, since the
+    adjustments reach the cache of the worker making the change only.
+    Returns None without one.
+    """
+    if not settings.CACHE_SHARED:
+        return None
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.add(key, count, settings.COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def adjust_cached_count(key, delta):
+    """Apply delta to a cached count, if one is cached"""
+    if not settings.CACHE_SHARED:
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator using an estimate instead of COUNT(*) for large sets
+
+    A maintained cached count, when the caller has one, is trusted first
+    if above ESTIMATED_COUNT_THRESHOLD. Otherwise rows are counted up to
+    the threshold, which answers small sets exactly in one query, and only
+    sets past it are reported with the planner's estimate.
+    """
+
+    def __init__(self, *args, cached_count=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cached_count = cached_count
+        self.approximate = False
+
+    @cached_property
+    def count(self):
+        threshold = settings.ESTIMATED_COUNT_THRESHOLD
+        if self.cached_count is not None and self.cached_count > threshold:
+            self.approximate = True
+            return self.cached_count
+
+        count = self.object_list[:threshold + 1].count()
+        if count <= threshold:
+            return count
+        estimate = planner_estimate(self.object_list)
+        if estimate is None:
+            return self.object_list.count()
+        self.approximate = True
+        # The planner can underestimate, never report fewer rows than seen
+        return max(estimate, count)
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """Opt-in page number pagination with estimated counts
+
+    Only requests passing ?page= are paginated. Views can provide
+    get_cached_count() returning a maintained count for the unfiltered
+    list, or None when filters apply.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.page_query_param not in request.query_params:
+            return None
+
+        get_cached_count = getattr(view, 'get_cached_count', None)
+        self.django_paginator_class = functools.partial(
+            EstimatedCountPaginator,
+            cached_count=get_cached_count() if get_cached_count else None
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_approximate', self.page.paginator.approximate),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
@@ -0,0 +1,128 @@
+from core.models import Employee
+
+
+def partitioned_tables():
+    """Return (table, partition key) for the tables split by tenant
+
+    Django's many-to-many through tables have no user column, so they are
+    split by employee, which is what every query against them filters on.
+    """
+    return [
+        (Employee._meta.db_table, 'user_id'),
+        (Employee.tags.through._meta.db_table, 'employee_id'),
+        (Employee.department.through._meta.db_table, 'employee_id'),
+    ]
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        'SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [table]
+    )
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def partition(connection, count):
+    """Hash partition the staff tables into count partitions, if not yet
+
+    Only applies to PostgreSQL 11 or later. Returns the converted tables.
+    """
+    if not count or connection.vendor != 'postgresql':
+        return []
+    if connection.pg_version < 110000:
+        raise RuntimeError('Hash partitioning needs PostgreSQL 11 or later')
+
+    converted = []
+    with connection.cursor() as cursor:
+        for table, key in partitioned_tables():
+            if not is_partitioned(cursor, table):
+                _partition_table(cursor, connection.ops.quote_name,
+                                 table, key, count)
+                converted.append(table)
+    return converted
+
+
+def _partition_table(cursor, quote, table, key, count):
+    """Swap table for a copy hash partitioned on key
+
+    Primary keys gain the partition key, as PostgreSQL requires. Foreign
+    keys pointing at the table are dropped since no unique index on id
+    alone can exist any more. A trigger deletes the rows that referenced a
+    deleted row instead, so raw deletes still leave no orphans behind.
+    """
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid), "
+        "(SELECT relkind FROM pg_class WHERE oid = confrelid) "
+        "FROM pg_constraint WHERE conrelid = %s::regclass "
+        "AND contype IN ('p', 'u', 'f')",
+        [table]
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes "
+        "WHERE schemaname = current_schema() AND tablename = %s "
+        "AND indexname NOT IN "
+        "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+        [table, table]
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence = cursor.fetchone()[0]
+    cursor.execute(
+        "SELECT conrelid::regclass::text, attname FROM pg_constraint "
+        "JOIN pg_attribute ON attrelid = conrelid AND attnum = conkey[1] "
+        "WHERE confrelid = %s::regclass AND contype = 'f' "
+        "ORDER BY 1",
+        [table]
+    )
+    referencing = cursor.fetchall()
+
+    old = f'{table}_unpartitioned'
+    cursor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(old)}')
+    cursor.execute(
+        f'CREATE TABLE {quote(table)} (LIKE {quote(old)} '
+        f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        f'PARTITION BY HASH ({quote(key)})'
+    )
+    for remainder in range(count):
+        cursor.execute(
+            f'CREATE TABLE {quote(f"{table}_p{remainder}")} '
+            f'PARTITION OF {quote(table)} '
+            f'FOR VALUES WITH (MODULUS {count}, REMAINDER {remainder})'
+        )
+    cursor.execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(old)}')
+    if sequence:
+        cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {quote(table)}.id')
+    cursor.execute(f'DROP TABLE {quote(old)} CASCADE')
+
+    for name, kind, definition, referenced_kind in constraints:
+        if kind == 'p':
+            definition = f'PRIMARY KEY (id, {quote(key)})'
+        elif kind == 'f' and referenced_kind == 'p':
+            continue
+        cursor.execute(
+            f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} '
+            f'{definition}'
+        )
+    for definition in indexes:
+        cursor.execute(definition)
+    if referencing:
+        _cascade_deletes(cursor, quote, table, referencing)
+    cursor.execute(f'ANALYZE {quote(table)}')
+
+
+def _cascade_deletes(cursor, quote, table, referencing):
+    """Delete the (table, column) rows referencing deleted rows of table"""
+    function = quote(f'{table}_cascade')
+    deletes = ''.join(
+        f'DELETE FROM {quote(other)} WHERE {quote(column)} = OLD.id; '
+        for other, column in referencing
+    )
+    cursor.execute(
+        f'CREATE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql '
+        f'AS $$ BEGIN {deletes}RETURN OLD; END $$'
+    )
+    cursor.execute(
+        f'CREATE TRIGGER {function} AFTER DELETE ON {quote(table)} '
+        f'FOR EACH ROW EXECUTE FUNCTION {function}()'
+    )
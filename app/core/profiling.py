@@ -0,0 +1,181 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+PROFILE_ID = re.compile(r'^\d+-[0-9a-f]{8}$')
+
+
+def fold(frame):
+    """Return the stack of frame as 'outer;...;inner' function names"""
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f'{module}.{frame.f_code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    """Count the stacks of one thread, sampled every interval seconds"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[fold(frame)] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class Profile:
+    """Statistical profile and SQL timeline of the current thread
+
+    Used as a context manager around the code to profile. Queries on every
+    database connection of the thread are timed.
+    """
+
+    def __init__(self, reason):
+        self.reason = reason
+        self.queries = []
+        self.started = None
+        self.duration = None
+
+    def __enter__(self):
+        self.sampler = Sampler(
+            threading.get_ident(), settings.PROFILE_INTERVAL
+        )
+        self._wrappers = ExitStack()
+        for connection in connections.all():
+            self._wrappers.enter_context(connection.execute_wrapper(
+                self.time_query(connection.alias)
+            ))
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self._start
+        self._wrappers.close()
+
+    def time_query(self, alias):
+        """Return an execute wrapper appending queries to the timeline"""
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.queries.append({
+                    'alias': alias,
+                    'start_ms': (start - self._start) * 1000,
+                    'duration_ms': (time.perf_counter() - start) * 1000,
+                    'sql': sql,
+                })
+        return wrapper
+
+    def as_dict(self, **request):
+        return {
+            'reason': self.reason,
+            'started': self.started,
+            'duration_ms': self.duration * 1000,
+            'interval_ms': settings.PROFILE_INTERVAL * 1000,
+            'samples': dict(self.sampler.samples),
+            'queries': self.queries,
+            **request,
+        }
+
+
+def save(record):
+    """Store a profile, dropping the oldest beyond PROFILE_KEEP
+
+    Returns the id of the stored profile.
+    """
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    profile_id = f'{time.time_ns()}-{uuid.uuid4().hex[:8]}'
+    path = os.path.join(settings.PROFILE_DIR, f'{profile_id}.json')
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(record, f)
+    os.replace(f'{path}.tmp', path)
+
+    for stale in profile_ids()[settings.PROFILE_KEEP:]:
+        try:
+            os.remove(os.path.join(settings.PROFILE_DIR, f'{stale}.json'))
+        except FileNotFoundError:
+            pass  # Pruned by another process meanwhile
+    return profile_id
+
+
+def profile_ids():
+    """Return the ids of the stored profiles, newest first"""
+    try:
+        names = os.listdir(settings.PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    ids = [name[:-5] for name in names if name.endswith('.json')]
+    return sorted(
+        (profile_id for profile_id in ids if PROFILE_ID.match(profile_id)),
+        reverse=True
+    )
+
+
+def load(profile_id):
+    """Return a stored profile, None if unknown or already pruned"""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, f'{profile_id}.json')
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def flame_graph(samples, min_width=0.001):
+    """Lay out folded stacks as flame graph boxes
+
+    Returns (depth, left, width, name, count) tuples with left and width
+    as fractions of all samples. Boxes narrower than min_width are left
+    out.
+    """
+    root = {}
+    for stack, count in samples.items():
+        node = root
+        for name in stack.split(';'):
+            child = node.setdefault(name, [0, {}])
+            child[0] += count
+            node = child[1]
+
+    total = sum(samples.values())
+    boxes = []
+
+    def place(children, depth, left):
+        for name, (count, grandchildren) in sorted(children.items()):
+            width = count / total
+            if width >= min_width:
+                boxes.append((depth, left, width, name, count))
+                place(grandchildren, depth + 1, left)
+            left += width
+
+    if total:
+        place(root, 0, 0)
+    return boxes
@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from core import sharding
+from core.models import AuthToken, Change, Department, Employee, \
+    EmployeeSummary, Tag
+from core.signals import employee_count_key
+
+
+def deactivate(user):
+    """Disable the user's login now and queue their data for purging"""
+    user.is_active = False
+    user.deleted_at = timezone.now()
+    user.save(update_fields=['is_active', 'deleted_at'])
+    AuthToken.objects.filter(user=user).delete()
+
+
+def pending_users():
+    """Return the deactivated users waiting to be purged, oldest first"""
+    return get_user_model().objects.filter(
+        deleted_at__isnull=False
+    ).order_by('deleted_at')
+
+
+def _delete_chunk(queryset, related, chunk_size, using):
+    """Delete up to chunk_size rows of queryset and rows referencing them
+
+    related lists (model, column) pairs to clear first. Rows are removed
+    with plain DELETE statements, nothing is loaded or collected.
+    """
+    ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+    if ids:
+        with transaction.atomic(using=using):
+            for model, column in related:
+                model.objects.filter(
+                    **{f'{column}__in': ids}
+                )._raw_delete(using)
+            queryset.filter(pk__in=ids)._raw_delete(using)
+    return len(ids)
+
+
+def _delete_employees(user_id, chunk_size, using):
+    """Delete a chunk of the user's employees and their image files
+
+    Files go first, so a purge stopped halfway never leaves rows pointing
+    at deleted images behind.
+    """
+    employees = Employee.objects.using(using).filter(
+        user_id=user_id
+    ).order_by('pk')
+    storage = Employee._meta.get_field('image').storage
+    for image in employees.values_list('image', flat=True)[:chunk_size]:
+        if image:
+            storage.delete(image)
+
+    return _delete_chunk(employees, (
+        (Employee.tags.through, 'employee_id'),
+        (Employee.department.through, 'employee_id'),
+        (EmployeeSummary, 'employee_id'),
+    ), chunk_size, using)
+
+
+def _delete_labels(model, field, user_id, chunk_size, using, ordering='pk'):
+    """Delete a chunk of the user's tags or departments"""
+    labels = model.objects.using(using).filter(
+        user_id=user_id
+    ).order_by(ordering)
+    through = getattr(Employee, field).through
+    return _delete_chunk(
+        labels, ((through, f'{model._meta.model_name}_id'),),
+        chunk_size, using
+    )
+
+
+def purge_user(user, chunk_size=1000, progress=None):
+    """Delete a user with all their staff data, chunk by chunk
+
+    Every chunk commits on its own, so an interrupted purge resumes where
+    it stopped when run again. progress(label, count) is called with the
+    running total of deleted rows after each chunk.
+    """
+    using = sharding.shard_for_user(user.pk)
+    steps = (
+        ('employees', lambda: _delete_employees(user.pk, chunk_size, using)),
+        ('tags', lambda: _delete_labels(
+            Tag, 'tags', user.pk, chunk_size, using
+        )),
+        # Deepest first, so no department outlives its parent's deletion
+        ('departments', lambda: _delete_labels(
+            Department, 'department', user.pk, chunk_size, using,
+            ordering=Length('path').desc()
+        )),
+        ('changes', lambda: _delete_chunk(
+            Change.objects.using(using).filter(user_id=user.pk)
+            .order_by('pk'), (), chunk_size, using
+        )),
+    )
+    for label, step in steps:
+        total = 0
+        while True:
+            deleted = step()
+            total += deleted
+            if progress is not None and deleted:
+                progress(label, total)
+            if deleted < chunk_size:
+                break
+
+    cache.delete(employee_count_key(user.pk))
+    if using != 'default':
+        get_user_model().objects.using(using).filter(pk=user.pk).delete()
+    user.delete()
@@ -0,0 +1,57 @@
+import datetime
+import decimal
+import uuid
+
+import msgpack
+from django.utils.encoding import force_text
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+from core.events import format_event
+
+
+def _default(obj):
+    """Encode the types DRF's JSON encoder handles as strings"""
+    if isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    return force_text(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Render responses as MessagePack"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    """Parse MessagePack request bodies"""
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except Exception as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Render responses to event stream requests as an error event"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_event('error', data)
@@ -0,0 +1,64 @@
+import itertools
+import threading
+
+from django.conf import settings
+
+
+_state = threading.local()
+_lock = threading.Lock()
+_round_robin = itertools.count()
+_in_flight = {}
+
+
+def choose_replica():
+    """Pick a replica alias using DATABASE_REPLICA_STRATEGY
+
+    'round_robin' cycles through the replicas, 'least_loaded' picks the one
+    with the fewest requests currently reading from it in this process.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas:
+        return None
+    with _lock:
+        if settings.DATABASE_REPLICA_STRATEGY == 'least_loaded':
+            return min(replicas, key=lambda alias: _in_flight.get(alias, 0))
+        return replicas[next(_round_robin) % len(replicas)]
+
+
+def pin_reads(alias):
+    """Route reads for the current thread to alias (None means primary)"""
+    release_reads()
+    _state.read_db = alias
+    if alias:
+        with _lock:
+            _in_flight[alias] = _in_flight.get(alias, 0) + 1
+
+
+def pinned_reads():
+    """Return the replica reads of the current thread go to, None if primary"""
+    return getattr(_state, 'read_db', None)
+
+
+def release_reads():
+    """Stop routing reads for the current thread to a replica"""
+    alias = getattr(_state, 'read_db', None)
+    _state.read_db = None
+    if alias:
+        with _lock:
+            _in_flight[alias] -= 1
+
+
+class ReplicaRouter:
+    """Send reads to the replica pinned for the request, writes to primary"""
+
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'read_db', None) or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
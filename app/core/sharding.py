@@ -0,0 +1,250 @@
+import bisect
+import functools
+import hashlib
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+
+from core.models import Change, Tag, Department, Employee, EmployeeSummary, \
+    ShardAssignment
+
+
+SHARDED_MODELS = {
+    'tag',
+    'department',
+    'employee',
+    'employee_tags',
+    'employee_department',
+    'employeesummary',
+    'change',
+}
+
+# First key of the PostgreSQL advisory locks fencing writes to a user's
+# shard against move_user, the user id is the second
+FENCE_LOCK_SPACE = 7411
+
+_state = threading.local()
+
+
+def _hash(key):
+    return int(hashlib.md5(str(key).encode()).hexdigest(), 16)
+
+
+class HashRing:
+    """Consistent hash ring mapping keys onto a set of nodes"""
+
+    def __init__(self, nodes, points=64):
+        self._ring = sorted(
+            (_hash(f'{node}:{point}'), node)
+            for node in nodes for point in range(points)
+        )
+        self._hashes = [hashed for hashed, node in self._ring]
+
+    def get(self, key):
+        """Return the node owning key"""
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+@functools.lru_cache(maxsize=8)
+def _ring(shards):
+    return HashRing(shards)
+
+
+def is_sharded():
+    """Return True if more than one shard is configured"""
+    return len(settings.DATABASE_SHARDS) > 1
+
+
+def shard_for_user(user_id):
+    """Return the database alias holding the staff data of user_id
+
+    An explicit ShardAssignment wins over the hash ring placement.
+    """
+    if not is_sharded():
+        return 'default'
+
+    cache = getattr(_state, 'shards', None)
+    if cache is not None and user_id in cache:
+        return cache[user_id]
+
+    shard = ShardAssignment.objects.using('default').filter(
+        user_id=user_id
+    ).values_list('shard', flat=True).first()
+    shard = shard or _ring(tuple(settings.DATABASE_SHARDS)).get(user_id)
+
+    if cache is not None:
+        cache[user_id] = shard
+    return shard
+
+
+def is_locked(user_id):
+    """Return True if the user's data is being moved between shards"""
+    return is_sharded() and ShardAssignment.objects.using('default').filter(
+        user_id=user_id, locked=True
+    ).exists()
+
+
+def pin_shard(user_id):
+    """Route unhinted staff model queries in this thread to user's shard"""
+    _state.shards = {}
+    _state.shard = shard_for_user(user_id)
+
+
+def release_shard():
+    """Forget the shard pinned for this thread, ending its write fence"""
+    _state.shards = None
+    _state.shard = None
+    fenced = getattr(_state, 'fenced', None)
+    _state.fenced = None
+    if fenced:
+        _advisory_lock('pg_advisory_unlock_shared', *fenced)
+
+
+def _advisory_lock(function, using, user_id):
+    """Call a PostgreSQL advisory lock function on the user's fence lock
+
+    Other databases have no advisory locks, their writes aren't fenced.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {function}(%s, %s)', [FENCE_LOCK_SPACE, user_id]
+        )
+
+
+def fence_writes(user_id):
+    """Keep move_user from copying the user's data until release_shard()
+
+    Take the fence before checking is_locked(): a move either waits for
+    this request's writes, or locked the user before the check.
+    """
+    if not is_sharded():
+        return
+    using = shard_for_user(user_id)
+    _advisory_lock('pg_advisory_lock_shared', using, user_id)
+    _state.fenced = (using, user_id)
+
+
+def drain_writes(user_id, using):
+    """Wait until writes fenced on using before the user was locked end"""
+    with transaction.atomic(using=using):
+        _advisory_lock('pg_advisory_xact_lock', using, user_id)
+
+
+def ensure_user(user, alias):
+    """Copy the user row to alias so foreign keys on that shard resolve"""
+    if alias == 'default':
+        return
+    fields = {
+        field.attname: getattr(user, field.attname)
+        for field in user._meta.concrete_fields if not field.primary_key
+    }
+    get_user_model().objects.using(alias).update_or_create(
+        pk=user.pk, defaults=fields
+    )
+
+
+def _user_querysets(user):
+    """Return querysets for the user's rows in dependency order"""
+    return (
+        Tag.objects.filter(user=user),
+        Department.objects.filter(user=user),
+        Employee.objects.filter(user=user),
+        EmployeeSummary.objects.filter(user=user),
+        Employee.tags.through.objects.filter(employee__user=user),
+        Employee.department.through.objects.filter(employee__user=user),
+        Change.objects.filter(user=user),
+    )
+
+
+def _delete_user_rows(user, using, batch_size):
+    """Delete the user's rows from using with plain DELETE statements
+
+    No signals are sent, the data lives on in the target shard: nothing
+    is announced as deleted, logged as a change or uncounted.
+    """
+    with transaction.atomic(using=using):
+        for queryset in reversed(_user_querysets(user)):
+            queryset = queryset.using(using).order_by('pk')
+            while True:
+                ids = list(
+                    queryset.values_list('pk', flat=True)[:batch_size]
+                )
+                if ids:
+                    queryset.model.objects.filter(
+                        pk__in=ids
+                    )._raw_delete(using)
+                if len(ids) < batch_size:
+                    break
+
+
+def move_user(user, target, batch_size=1000, log=None):
+    """Move the user's staff data to the target shard
+
+    Writes are refused while the assignment is locked, and the copy waits
+    for the writes let through just before; reads keep being served by
+    the source shard until the directory flips to the target. Primary keys
+    are preserved, so shards must use disjoint id sequences.
+    """
+    source = shard_for_user(user.pk)
+    assignments = ShardAssignment.objects.using('default')
+    assignments.update_or_create(
+        user=user, defaults={'shard': source, 'locked': True}
+    )
+
+    try:
+        drain_writes(user.pk, source)
+        with transaction.atomic(using=target):
+            ensure_user(user, target)
+            for queryset in _user_querysets(user):
+                model = queryset.model
+                rows = queryset.using(source).iterator(chunk_size=batch_size)
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) == batch_size:
+                        model.objects.using(target).bulk_create(batch)
+                        batch = []
+                model.objects.using(target).bulk_create(batch)
+                if log:
+                    log(f'Copied {model._meta.label}')
+    except Exception:
+        assignments.filter(user=user).update(locked=False)
+        raise
+
+    assignments.filter(user=user).update(shard=target, locked=False)
+
+    _delete_user_rows(user, source, batch_size)
+    if log:
+        log(f'Removed data from {source}')
+
+    return source
+
+
+class ShardRouter:
+    """Route staff models to the shard owning their user"""
+
+    def _shard(self, model, hints):
+        if not is_sharded() or model._meta.app_label != 'core' or \
+                model._meta.model_name not in SHARDED_MODELS:
+            return None
+
+        instance = hints.get('instance')
+        if isinstance(instance, get_user_model()):
+            return shard_for_user(instance.pk)
+        if getattr(instance, 'user_id', None) is not None:
+            return shard_for_user(instance.user_id)
+        return getattr(_state, 'shard', None)
+
+    def db_for_read(self, model, **hints):
+        shard = self._shard(model, hints)
+        # Reads from the default shard may still be served by a replica
+        return None if shard == 'default' else shard
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
@@ -0,0 +1,175 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.functions import Substr
+from django.db.models.signals import post_save, pre_delete, post_delete, \
+    m2m_changed
+from django.dispatch import receiver
+
+from core import changes, events, label_cache, sharding, slow_queries, \
+    summary
+from core.pagination import adjust_cached_count
+from core.models import Tag, Department, Employee, EmployeeSummary
+
+
+@receiver(connection_created)
+def log_slow_queries(sender, connection, **kwargs):
+    """Time the queries of every new database connection"""
+    slow_queries.install(connection)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def copy_user_to_shard(sender, instance, using, **kwargs):
+    """Keep a copy of each user on the shard holding their staff data"""
+    if using == 'default' and sharding.is_sharded():
+        sharding.ensure_user(instance, sharding.shard_for_user(instance.pk))
+
+
+@receiver(post_save, sender=Employee)
+def save_employee_summary(sender, instance, created, using, **kwargs):
+    """Create or retitle the employee's summary row"""
+    summaries = EmployeeSummary.objects.using(using)
+    if created:
+        summaries.create(
+            employee=instance, user_id=instance.user_id, title=instance.title
+        )
+    else:
+        summaries.filter(employee=instance).update(title=instance.title)
+
+
+@receiver(post_save, sender=Employee)
+def count_created_employee(sender, instance, created, **kwargs):
+    if created:
+        adjust_cached_count(employee_count_key(instance.user_id), 1)
+
+
+@receiver(post_delete, sender=Employee)
+def count_deleted_employee(sender, instance, **kwargs):
+    adjust_cached_count(employee_count_key(instance.user_id), -1)
+
+
+@receiver(m2m_changed, sender=Employee.tags.through)
+@receiver(m2m_changed, sender=Employee.department.through)
+def employee_labels_changed(sender, instance, action, reverse, model,
+                            pk_set, using, **kwargs):
+    """Refresh and log employees that gained or lost tags/departments"""
+    if reverse and action == 'pre_clear':
+        instance._cleared_employee_ids = list(
+            sender.objects.using(using).filter(
+                **{f'{instance._meta.model_name}_id': instance.pk}
+            ).values_list('employee_id', flat=True)
+        )
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        employee_ids = [instance.pk]
+    elif action == 'post_clear':
+        employee_ids = instance._cleared_employee_ids
+    else:
+        employee_ids = pk_set
+    summary.refresh_employees(employee_ids, using)
+    changes.record('employee', instance.user_id, employee_ids, using=using)
+    events.publish(
+        instance.user_id, 'employee', 'updated', employee_ids, using
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Employee)
+def log_saved(sender, instance, created, using, **kwargs):
+    changes.record(
+        sender._meta.model_name, instance.user_id, [instance.pk],
+        using=using
+    )
+    events.publish(
+        instance.user_id, sender._meta.model_name,
+        'created' if created else 'updated', [instance.pk], using
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=Employee)
+def log_deleted(sender, instance, using, **kwargs):
+    changes.record(
+        sender._meta.model_name, instance.user_id, [instance.pk],
+        deleted=True, using=using
+    )
+    events.publish(
+        instance.user_id, sender._meta.model_name, 'deleted',
+        [instance.pk], using
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Department)
+def drop_cached_labels(sender, instance, using, **kwargs):
+    """Drop the cached tags or departments of the label's user"""
+    label_cache.cache.changed(
+        sender._meta.model_name, instance.user_id, using
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Department)
+def label_renamed(sender, instance, created, using, **kwargs):
+    """Rewrite the name in every summary referencing the label"""
+    if not created:
+        summary.refresh_label(_field_name(sender), instance.pk, using)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Department)
+def remember_labelled_employees(sender, instance, using, **kwargs):
+    """Note which employees lose the label before the cascade runs"""
+    field = Employee._meta.get_field(_field_name(sender))
+    through = field.remote_field.through
+    instance._labelled_employee_ids = list(
+        through.objects.using(using).filter(
+            **{f'{sender._meta.model_name}_id': instance.pk}
+        ).values_list('employee_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Department)
+def label_deleted(sender, instance, using, **kwargs):
+    """Drop the deleted label from the employees that referenced it"""
+    employee_ids = getattr(instance, '_labelled_employee_ids', ())
+    summary.refresh_employees(employee_ids, using)
+    changes.record('employee', instance.user_id, employee_ids, using=using)
+    events.publish(
+        instance.user_id, 'employee', 'updated', employee_ids, using
+    )
+
+
+@receiver(post_delete, sender=Department)
+def reroot_children(sender, instance, using, **kwargs):
+    """Make the children of a deleted department roots of their subtrees"""
+    prefix = instance.subtree_path
+    departments = Department.objects.using(using).filter(
+        user_id=instance.user_id
+    )
+    child_ids = list(
+        departments.filter(path=prefix).values_list('pk', flat=True)
+    )
+    if not child_ids:
+        return
+    departments.filter(path__startswith=prefix).update(
+        path=Substr('path', len(prefix) + 1)
+    )
+    changes.record('department', instance.user_id, child_ids, using=using)
+    events.publish(
+        instance.user_id, 'department', 'updated', child_ids, using
+    )
+
+
+def employee_count_key(user_id):
+    return f'employee-count:{user_id}'
+
+
+def _field_name(label_model):
+    return 'tags' if label_model is Tag else 'department'
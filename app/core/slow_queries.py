@@ -0,0 +1,200 @@
+import hashlib
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, \
+    transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+# Modules whose code is named as the call site of a query
+CALL_SITE_MODULES = ('staff.', 'user.', 'core.')
+SKIPPED_MODULES = (
+    'core.slow_queries', 'core.profiling', 'core.middleware', 'core.batch'
+)
+
+STRING = re.compile(r"'(?:''|[^'])*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+VALUE_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+VALUE_ROWS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+SPACE = re.compile(r'\s+')
+
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'INSERT')
+
+
+def normalize(sql):
+    """Return sql with literals and placeholders replaced, lists collapsed
+
+    Queries differing only in their values, or in how many values an IN
+    list or VALUES clause holds, normalize the same.
+    """
+    sql = STRING.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = NUMBER.sub('?', sql)
+    sql = VALUE_LIST.sub('(...)', sql)
+    sql = VALUE_ROWS.sub('(...)', sql)
+    return SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.md5(normalized.encode()).hexdigest()
+
+
+def is_app_module(module):
+    return module.startswith(CALL_SITE_MODULES) and \
+        not module.startswith(SKIPPED_MODULES) and '.tests.' not in module
+
+
+def call_site():
+    """Return the innermost app view, serializer or function in the stack
+
+    Methods DRF runs on app classes, like EmployeeViewSet.list, count as
+    the app class's.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_argcount and code.co_varnames[0] == 'self':
+            owner = type(frame.f_locals.get('self'))
+            if is_app_module(owner.__module__):
+                return f'{owner.__module__}.{owner.__qualname__}.' \
+                    f'{code.co_name}'
+        module = frame.f_globals.get('__name__', '')
+        if is_app_module(module):
+            return f'{module}.{code.co_name}:{frame.f_lineno}'
+        frame = frame.f_back
+    return ''
+
+
+def explain(alias, sql, params):
+    """Return the estimated plan of a query, without running it"""
+    connection = connections[alias]
+    if connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE off)'
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN'
+    else:
+        prefix = 'EXPLAIN'
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        return '\n'.join(
+            ' '.join(str(column) for column in row)
+            for row in cursor.fetchall()
+        )
+
+
+def store(alias, sql, params, duration, site):
+    """Add a slow query to the statistics of its fingerprint
+
+    The plan is captured the first time a fingerprint is seen.
+    """
+    from core.models import SlowQuery
+
+    normalized = normalize(sql)
+    key = fingerprint(normalized)
+    stats = {
+        'calls': F('calls') + 1,
+        'total_ms': F('total_ms') + duration,
+        'max_ms': Greatest('max_ms', duration),
+        'last_seen': timezone.now(),
+        'call_site': site,
+    }
+    _state.recording = True
+    try:
+        if SlowQuery.objects.filter(fingerprint=key).update(**stats):
+            return
+        plan = ''
+        if sql.lstrip()[:6].upper() in EXPLAINABLE:
+            try:
+                plan = explain(alias, sql, params)
+            except Exception:
+                logger.exception('Could not explain slow query %s', key)
+        try:
+            with transaction.atomic():
+                SlowQuery.objects.create(
+                    fingerprint=key, sql=normalized, database=alias,
+                    call_site=site, calls=1, total_ms=duration,
+                    max_ms=duration, plan=plan
+                )
+        except IntegrityError:
+            # Created by another process meanwhile
+            SlowQuery.objects.filter(fingerprint=key).update(**stats)
+    finally:
+        _state.recording = False
+
+
+class Recorder:
+    """Store slow queries from a background thread
+
+    Queries are handed over through a bounded queue, dropped when it is
+    full, so a burst of slow queries never slows requests further.
+    """
+
+    def __init__(self, size=1000):
+        self.queue = queue.Queue(size)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def put(self, *query):
+        if not settings.SLOW_QUERY_ASYNC:
+            store(*query)
+            return
+        self.start()
+        try:
+            self.queue.put_nowait(query)
+        except queue.Full:
+            pass
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='slow-queries', daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        while True:
+            query = self.queue.get()
+            try:
+                store(*query)
+            except Exception:
+                logger.exception('Could not record slow query')
+            finally:
+                close_old_connections()
+
+
+recorder = Recorder()
+
+
+def wrapper(execute, sql, params, many, context):
+    """Execute wrapper timing queries, recording those over the threshold"""
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = (time.perf_counter() - start) * 1000
+    if duration >= settings.SLOW_QUERY_MS and not many and \
+            not getattr(_state, 'recording', False):
+        # Queries outside app code, like migrations, are not tracked
+        site = call_site()
+        if site:
+            recorder.put(
+                context['connection'].alias, sql, params, duration, site
+            )
+    return result
+
+
+def install(connection):
+    """Time every query of connection, if SLOW_QUERY_MS is set"""
+    if settings.SLOW_QUERY_MS and wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(wrapper)
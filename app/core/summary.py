@@ -0,0 +1,94 @@
+from django.db import connections
+
+from core.models import Employee, EmployeeSummary
+
+
+LABELS_SQL = {
+    'postgresql': (
+        "COALESCE((SELECT json_agg(json_build_array(l.id, l.name))::text "
+        "FROM {through} r JOIN {label} l ON l.id = r.{label_column} "
+        "WHERE r.{employee_column} = {summary}.employee_id), '[]')"
+    ),
+    'sqlite': (
+        "(SELECT json_group_array(json_array(l.id, l.name)) "
+        "FROM {through} r JOIN {label} l ON l.id = r.{label_column} "
+        "WHERE r.{employee_column} = {summary}.employee_id)"
+    ),
+}
+
+
+def _labels_sql(connection, field):
+    """Return SQL building the JSON [id, name] list for an M2M field"""
+    quote = connection.ops.quote_name
+    return LABELS_SQL[connection.vendor].format(
+        through=quote(field.remote_field.through._meta.db_table),
+        label=quote(field.related_model._meta.db_table),
+        label_column=quote(field.m2m_reverse_name()),
+        employee_column=quote(field.m2m_column_name()),
+        summary=quote(EmployeeSummary._meta.db_table),
+    )
+
+
+def refresh(where, params=(), using='default'):
+    """Recompute the summary rows matching where in a single UPDATE"""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    summary = quote(EmployeeSummary._meta.db_table)
+    employee = quote(Employee._meta.db_table)
+    sql = (
+        f"UPDATE {summary} SET "
+        f"title = (SELECT e.title FROM {employee} e "
+        f"WHERE e.id = {summary}.employee_id), "
+        f"tags = {_labels_sql(connection, Employee._meta.get_field('tags'))}, "
+        f"department = "
+        f"{_labels_sql(connection, Employee._meta.get_field('department'))} "
+        f"WHERE {where}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def refresh_employees(employee_ids, using='default'):
+    """Recompute the summaries of the given employees"""
+    employee_ids = list(employee_ids)
+    if employee_ids:
+        placeholders = ', '.join(['%s'] * len(employee_ids))
+        refresh(f'employee_id IN ({placeholders})', employee_ids, using)
+
+
+def refresh_label(field_name, label_id, using='default'):
+    """Recompute every summary referencing a tag or department"""
+    field = Employee._meta.get_field(field_name)
+    quote = connections[using].ops.quote_name
+    through = quote(field.remote_field.through._meta.db_table)
+    refresh(
+        f'employee_id IN (SELECT {quote(field.m2m_column_name())} '
+        f'FROM {through} WHERE {quote(field.m2m_reverse_name())} = %s)',
+        [label_id],
+        using
+    )
+
+
+def rebuild(user_id=None, using='default'):
+    """Create missing summary rows and recompute all of them"""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    summary = quote(EmployeeSummary._meta.db_table)
+    employee = quote(Employee._meta.db_table)
+    user_filter = ' AND e.user_id = %s' if user_id is not None else ''
+    params = [user_id] if user_id is not None else []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {summary} "
+            f"(employee_id, user_id, title, tags, department) "
+            f"SELECT e.id, e.user_id, e.title, '[]', '[]' FROM {employee} e "
+            f"LEFT JOIN {summary} s ON s.employee_id = e.id "
+            f"WHERE s.employee_id IS NULL{user_filter}",
+            params
+        )
+
+    if user_id is None:
+        refresh('1 = 1', using=using)
+    else:
+        refresh('user_id = %s', params, using)
@@ -1,7 +1,12 @@
-from django.test import TestCase, Client
+from unittest.mock import patch
+
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core.models import Department, Employee, EmployeeSummary, Tag
+from core.pagination import EstimatedCountPaginator
+
 
 class AdminSiteTests(TestCase):
     def setUp(self):
@@ -39,3 +44,159 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_deactivate_action(self):
+        """Test users are deactivated rather than deleted"""
+        url = reverse('admin:core_user_changelist')
+        self.client.post(url, {
+            'action': 'deactivate',
+            '_selected_action': [self.user.id],
+        })
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deleted_at)
+
+
+class DepartmentAdminTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@tangent.com',
+            password='password123'
+        )
+        self.client.force_login(self.admin_user)
+        self.root = Department.objects.create(
+            user=self.admin_user, name='Root'
+        )
+        self.child = Department.objects.create(
+            user=self.admin_user, name='Child', parent=self.root
+        )
+
+    def test_cycle_is_a_form_error(self):
+        """Test moving a department below itself is reported on the form"""
+        url = reverse('admin:core_department_change', args=[self.root.id])
+        res = self.client.post(url, {
+            'name': 'Root', 'user': self.admin_user.id,
+            'parent': self.child.id, 'version': self.root.version,
+        })
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'cannot be moved below itself')
+        self.root.refresh_from_db()
+        self.assertIsNone(self.root.parent)
+
+
+class StaffAdminTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@tangent.com',
+            password='password123'
+        )
+        self.client.force_login(self.admin_user)
+        self.user = get_user_model().objects.create_user(
+            email='user@tangent.com',
+            password='password123'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Intern')
+        self.employees = [
+            Employee.objects.create(
+                user=self.user, title=f'Clerk {i}', experience=1, salary=1
+            )
+            for i in range(3)
+        ]
+
+    def test_employee_changelist(self):
+        """Test employees are listed without a query per row"""
+        url = reverse('admin:core_employee_changelist')
+        self.client.get(url)
+
+        with self.assertNumQueries(4):
+            res = self.client.get(url)
+
+        self.assertContains(res, 'Clerk 2')
+        self.assertContains(res, self.user.email)
+
+    def test_employee_change_page(self):
+        """Test the change page doesn't render every tag and user"""
+        url = reverse(
+            'admin:core_employee_change', args=[self.employees[0].id]
+        )
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotContains(res, '<option value="%d"' % self.tag.id)
+
+    def test_add_and_remove_tag_actions(self):
+        """Test tagging the selection in bulk"""
+        url = reverse('admin:core_employee_changelist')
+        selected = [employee.id for employee in self.employees[:2]]
+        self.employees[0].tags.add(self.tag)
+
+        self.client.post(url, {
+            'action': 'add_tag', 'tag': self.tag.id,
+            '_selected_action': selected,
+        })
+
+        tagged = Employee.objects.filter(tags=self.tag)
+        self.assertEqual(set(tagged.values_list('id', flat=True)),
+                         set(selected))
+        summary = EmployeeSummary.objects.get(employee=self.employees[1])
+        self.assertIn('Intern', summary.tags)
+
+        self.client.post(url, {
+            'action': 'remove_tag', 'tag': self.tag.id,
+            '_selected_action': selected,
+        })
+
+        self.assertFalse(Employee.objects.filter(tags=self.tag).exists())
+
+    def test_tag_actions_reject_other_users_tags(self):
+        """Test only a tag of the selected employees' user is applied"""
+        url = reverse('admin:core_employee_changelist')
+        other = get_user_model().objects.create_user(
+            email='other@tangent.com',
+            password='password123'
+        )
+        foreign = Tag.objects.create(user=other, name='Foreign')
+        selected = [employee.id for employee in self.employees]
+
+        for tag_id in (foreign.id, 'x', '0'):
+            res = self.client.post(url, {
+                'action': 'add_tag', 'tag': tag_id,
+                '_selected_action': selected,
+            }, follow=True)
+
+            self.assertEqual(res.status_code, 200)
+        self.assertFalse(
+            Employee.tags.through.objects.filter(
+                employee_id__in=selected
+            ).exists()
+        )
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=2)
+    def test_paginator_uses_estimate_for_large_sets(self):
+        """Test the planner estimate replaces COUNT(*) above threshold"""
+        queryset = Employee.objects.order_by('id')
+        with patch('core.pagination.planner_estimate') as estimate:
+            estimate.return_value = 5000
+            self.assertEqual(EstimatedCountPaginator(queryset, 10).count,
+                             5000)
+
+            # Never fewer than the rows counted past the threshold
+            estimate.return_value = 1
+            self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 3)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1000)
+    def test_paginator_counts_small_sets_once(self):
+        """Test small sets are counted exactly without asking the planner"""
+        queryset = Employee.objects.order_by('id')
+        with patch('core.pagination.planner_estimate') as estimate, \
+                self.assertNumQueries(1):
+            paginator = EstimatedCountPaginator(queryset, 10)
+
+            self.assertEqual(paginator.count, 3)
+
+        estimate.assert_not_called()
+        self.assertFalse(paginator.approximate)
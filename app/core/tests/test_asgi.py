@@ -0,0 +1,158 @@
+import asyncio
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from asgiref.testing import ApplicationCommunicator
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from app import asgi
+from core import events
+from core.wsgi_adapter import PooledWsgiToAsgi
+
+
+def connect(application, path, headers=()):
+    """Return a communicator for a GET request"""
+    return ApplicationCommunicator(application, {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'GET',
+        'path': path,
+        'query_string': b'',
+        'headers': list(headers),
+    })
+
+
+async def communicate(application, path):
+    """Send one GET request through the ASGI application"""
+    communicator = connect(application, path)
+    await communicator.send_input({'type': 'http.request'})
+    start = await communicator.receive_output(5)
+    content = await communicator.receive_output(5)
+    return start, content
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+class AsgiApplicationTests(SimpleTestCase):
+
+    def test_serves_request(self):
+        """Test the ASGI entry point serves the Django application"""
+        start, content = run(communicate(asgi.application, '/healthz'))
+
+        self.assertEqual(start['status'], 200)
+        self.assertEqual(content['body'], b'ok')
+
+    def test_requests_run_concurrently(self):
+        """Test blocking requests don't wait for each other"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def wsgi_app(environ, start_response):
+            barrier.wait()
+            start_response('200 OK', [])
+            return [b'done']
+
+        application = PooledWsgiToAsgi(wsgi_app, asgi.executor)
+        results = run(asyncio.gather(
+            communicate(application, '/'),
+            communicate(application, '/'),
+        ))
+
+        self.assertEqual([start['status'] for start, _ in results], [200] * 2)
+
+    def test_request_body_and_headers(self):
+        """Test the WSGI application gets the body and headers sent"""
+        def wsgi_app(environ, start_response):
+            body = environ['wsgi.input'].read()
+            start_response('201 Created', [
+                ('Content-Type', environ['CONTENT_TYPE']),
+                ('Content-Length', '4'),
+            ])
+            return [body + b' and more']
+
+        async def post():
+            communicator = ApplicationCommunicator(
+                PooledWsgiToAsgi(wsgi_app, asgi.executor), {
+                    'type': 'http', 'http_version': '1.1',
+                    'method': 'POST', 'path': '/', 'query_string': b'',
+                    'headers': [(b'content-type', b'text/plain')],
+                }
+            )
+            await communicator.send_input({
+                'type': 'http.request', 'body': b'da', 'more_body': True
+            })
+            await communicator.send_input({
+                'type': 'http.request', 'body': b'ta'
+            })
+            start = await communicator.receive_output(5)
+            content = await communicator.receive_output(5)
+            return start, content
+
+        start, content = run(post())
+
+        self.assertEqual(start['status'], 201)
+        self.assertIn((b'content-type', b'text/plain'), start['headers'])
+        # Cut to the announced Content-Length
+        self.assertEqual(content['body'], b'data')
+
+    def test_benchmark_command(self):
+        """Test the benchmark compares one thread with the pool"""
+        out = StringIO()
+        call_command(
+            'benchmark_asgi', path='/healthz', requests=4, concurrency=2,
+            threads=2, latency=0, stdout=out
+        )
+
+        self.assertIn('sync worker', out.getvalue())
+        self.assertIn('asgi pool', out.getvalue())
+        self.assertIn('statuses [200]', out.getvalue())
+
+
+class User:
+    pk = 1
+
+
+@override_settings(
+    EVENTS_BACKPLANE='core.events.LocalBackplane',
+    EVENTS_HEARTBEAT_SECONDS=5,
+)
+class AsgiEventStreamTests(SimpleTestCase):
+
+    def test_rejects_missing_token(self):
+        """Test the event stream requires a token"""
+        start, content = run(
+            communicate(asgi.application, asgi.EVENTS_PATH)
+        )
+
+        self.assertEqual(start['status'], 401)
+
+    @patch('app.asgi.authenticate', return_value=User())
+    def test_streams_on_event_loop(self, authenticate):
+        """Test events are pushed without holding a pool thread"""
+        async def listen():
+            communicator = connect(asgi.application, asgi.EVENTS_PATH, [
+                (b'authorization', b'Token key'),
+            ])
+            await communicator.send_input({'type': 'http.request'})
+            start = await communicator.receive_output(5)
+            preamble = await communicator.receive_output(5)
+            threading.Thread(
+                target=events.broker.deliver, args=(1, {'kind': 'tag'})
+            ).start()
+            event = await communicator.receive_output(5)
+            await communicator.send_input({'type': 'http.disconnect'})
+            await communicator.wait(5)
+            return start, preamble, event
+
+        start, preamble, event = run(listen())
+
+        authenticate.assert_called_once_with(b'Token key')
+        self.assertEqual(start['status'], 200)
+        self.assertEqual(preamble['body'], events.PREAMBLE)
+        self.assertEqual(
+            event['body'], events.format_event('change', {'kind': 'tag'})
+        )
+        self.assertEqual(events.broker.subscriber_count(), 0)
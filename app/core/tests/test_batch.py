@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import AuthToken, Department, Tag
+
+
+BATCH_URL = reverse('batch')
+
+
+def get(path):
+    """Return a GET sub-request"""
+    return {'method': 'GET', 'path': path}
+
+
+class BatchApiTests(TestCase):
+    """Test running several API requests in one"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        token = AuthToken.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def batch(self, *requests, **params):
+        """Post the requests as a batch"""
+        return self.client.post(
+            BATCH_URL, {'requests': requests, **params}, format='json'
+        )
+
+    def test_page_load_batch(self):
+        """Test responses come back in the order requested"""
+        Tag.objects.create(user=self.user, name='Remote')
+
+        res = self.batch(
+            get('/api/user/me/'),
+            get('/api/staff/tags/'),
+            get('/api/staff/department/'),
+            get('/api/staff/employee/'),
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['status'] for item in res.data], [200] * 4)
+        self.assertEqual(res.data[0]['body']['email'], 'test@tangent.com')
+        self.assertEqual(res.data[1]['body'][0]['name'], 'Remote')
+        self.assertEqual(res.data[2]['body'], [])
+
+    def test_authenticates_once(self):
+        """Test the token is looked up for the batch only"""
+        with CaptureQueriesContext(connection) as queries:
+            self.batch(get('/api/user/me/'), get('/api/staff/tags/'))
+
+        lookups = [
+            query for query in queries if 'core_authtoken' in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+
+    def test_reads_see_earlier_writes(self):
+        """Test sub-requests run in order"""
+        res = self.batch(
+            {'method': 'POST', 'path': '/api/staff/tags/',
+             'body': {'name': 'Remote'}},
+            get('/api/staff/tags/'),
+        )
+
+        self.assertEqual(res.data[0]['status'], status.HTTP_201_CREATED)
+        self.assertEqual(res.data[1]['body'][0]['name'], 'Remote')
+
+    def test_sub_request_headers(self):
+        """Test item headers reach the sub-request"""
+        department = Department.objects.create(user=self.user, name='Sales')
+
+        res = self.batch({
+            'method': 'PATCH',
+            'path': f'/api/staff/department/{department.id}/',
+            'headers': {'If-Match': '"2"'}, 'body': {'name': 'Marketing'},
+        })
+
+        self.assertEqual(
+            res.data[0]['status'], status.HTTP_412_PRECONDITION_FAILED
+        )
+
+    def test_unknown_and_unbatchable_paths(self):
+        """Test missing, nested batch and streaming paths are refused"""
+        res = self.batch(
+            get('/api/missing/'),
+            {'method': 'POST', 'path': '/api/batch/', 'body': {}},
+            get('/api/staff/events/'),
+        )
+
+        self.assertEqual(
+            [item['status'] for item in res.data], [404, 400, 400]
+        )
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_batch_size_limited(self):
+        """Test batches above BATCH_MAX_REQUESTS are rejected"""
+        res = self.batch(*[get('/api/user/me/')] * 3)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_auth_required(self):
+        """Test batches need a valid token"""
+        self.client.credentials()
+
+        res = self.batch(get('/api/user/me/'))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ParallelBatchTests(TransactionTestCase):
+    """Test reads of a batch running on the pool"""
+
+    def test_parallel_reads_keep_order(self):
+        """Test parallel reads are returned in the order requested"""
+        user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        Tag.objects.create(user=user, name='Remote')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.post(BATCH_URL, {
+            'requests': [
+                get('/api/staff/tags/'),
+                get('/api/user/me/'),
+                get('/api/staff/employee/'),
+            ],
+            'parallel': True,
+        }, format='json')
+
+        self.assertEqual([item['status'] for item in res.data], [200] * 3)
+        self.assertEqual(res.data[0]['body'][0]['name'], 'Remote')
+        self.assertEqual(res.data[1]['body']['email'], 'test@tangent.com')
@@ -0,0 +1,121 @@
+import gzip
+from io import StringIO
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import SimpleTestCase, RequestFactory, TestCase
+
+from core import compression
+from core.middleware import CompressionMiddleware
+from core.models import Employee
+
+
+BODY = b'{"title": "Sample employee"}' * 100
+
+
+class NegotiationTests(SimpleTestCase):
+
+    def test_parse_accept_encoding(self):
+        """Test q-values are parsed"""
+        self.assertEqual(
+            compression.parse_accept_encoding('gzip;q=0.5, br, zstd;q=0'),
+            {'gzip': 0.5, 'br': 1.0, 'zstd': 0.0}
+        )
+
+    def test_gzip_only(self):
+        """Test gzip is picked when it is the only accepted codec"""
+        coding, _ = compression.negotiate('gzip, deflate')
+
+        self.assertEqual(coding, 'gzip')
+
+    def test_nothing_acceptable(self):
+        """Test no codec is picked for identity-only clients"""
+        self.assertEqual(compression.negotiate('identity'), (None, None))
+        self.assertEqual(compression.negotiate('gzip;q=0'), (None, None))
+
+    @skipIf(compression.brotli is None, 'brotli not installed')
+    def test_prefers_brotli(self):
+        """Test brotli wins over gzip at equal quality"""
+        coding, _ = compression.negotiate('gzip, br')
+
+        self.assertEqual(coding, 'br')
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get(self, response, encoding='gzip'):
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(
+            self.factory.get('/', HTTP_ACCEPT_ENCODING=encoding)
+        )
+
+    def test_compresses_large_response(self):
+        """Test large bodies are gzipped"""
+        response = HttpResponse(BODY)
+        response['ETag'] = '"abc"'
+
+        res = self.get(response)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(res['ETag'], 'W/"abc"')
+        self.assertEqual(gzip.decompress(res.content), BODY)
+        self.assertEqual(int(res['Content-Length']), len(res.content))
+
+    def test_small_response_untouched(self):
+        """Test bodies below the threshold are sent as is"""
+        res = self.get(HttpResponse(b'ok'))
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, b'ok')
+
+    def test_streaming_response(self):
+        """Test streamed chunks are compressed as they are produced"""
+        res = self.get(StreamingHttpResponse(iter([BODY, BODY])))
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        content = b''.join(res.streaming_content)
+        self.assertEqual(gzip.decompress(content), BODY * 2)
+
+    @skipIf(compression.zstandard is None, 'zstandard not installed')
+    def test_zstd(self):
+        """Test zstandard is used when asked for"""
+        res = self.get(HttpResponse(BODY), encoding='zstd')
+
+        decompressor = compression.zstandard.ZstdDecompressor()
+        self.assertEqual(res['Content-Encoding'], 'zstd')
+        self.assertEqual(
+            decompressor.decompressobj().decompress(res.content), BODY
+        )
+
+
+class CompressionBenchmarkTests(TestCase):
+
+    def test_reports_every_format_and_codec(self):
+        """Test the benchmark measures each format with each codec"""
+        user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        Employee.objects.create(
+            user=user, title='Clerk', experience=1, salary=1
+        )
+        out = StringIO()
+
+        call_command('benchmark_compression', repeat=1, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], '1 employees of test@tangent.com')
+        for coding, _ in compression.available_codecs():
+            self.assertTrue(any(
+                line.startswith('json') and coding in line for line in lines
+            ))
+            self.assertTrue(any(
+                line.startswith('msgpack') and coding in line
+                for line in lines
+            ))
@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase, override_settings
+
+from core import events
+
+
+@override_settings(
+    EVENTS_BACKPLANE='core.events.LocalBackplane',
+    EVENTS_BUFFER_SIZE=2,
+    EVENTS_HEARTBEAT_SECONDS=0.01,
+)
+class EventStreamTests(SimpleTestCase):
+
+    def setUp(self):
+        self.stream = events.stream(1)
+        self.assertEqual(next(self.stream), events.PREAMBLE)
+
+    def tearDown(self):
+        self.stream.close()
+
+    def test_delivers_user_events(self):
+        """Test events reach the user's subscribers only"""
+        event = {'kind': 'tag', 'action': 'created', 'ids': [1]}
+        events.broker.deliver(2, {'kind': 'tag'})
+        events.broker.deliver(1, event)
+
+        self.assertEqual(
+            next(self.stream), events.format_event('change', event)
+        )
+
+    def test_heartbeat_when_idle(self):
+        """Test idle streams get heartbeat comments"""
+        self.assertEqual(next(self.stream), b': heartbeat\n\n')
+
+    def test_overflow_asks_for_resync(self):
+        """Test a full buffer drops events and tells the client to resync"""
+        for pk in range(3):
+            events.broker.deliver(1, {'kind': 'tag', 'ids': [pk]})
+
+        self.assertEqual(next(self.stream), events.format_event('resync', {}))
+        self.assertEqual(next(self.stream), b': heartbeat\n\n')
+
+    def test_close_unsubscribes(self):
+        """Test closing the stream releases its subscription"""
+        self.assertEqual(events.broker.subscriber_count(), 1)
+
+        self.stream.close()
+
+        self.assertEqual(events.broker.subscriber_count(), 0)
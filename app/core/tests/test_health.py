@@ -0,0 +1,49 @@
+import tempfile
+from unittest.mock import Mock, patch
+
+from django.test import TestCase, override_settings
+
+
+class HealthCheckTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+
+    def test_healthz_skips_database(self):
+        """Test the liveness probe answers without any queries"""
+        with self.assertNumQueries(0):
+            res = self.client.get('/healthz')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, b'ok')
+
+    def test_readyz_ok(self):
+        """Test the readiness probe reports every check"""
+        with override_settings(MEDIA_ROOT=self.media_root):
+            res = self.client.get('/readyz/')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {
+            'database': True,
+            'migrations': True,
+            'media_storage': True,
+        })
+
+    def test_readyz_media_not_writable(self):
+        """Test the readiness probe fails when media is not writable"""
+        with override_settings(MEDIA_ROOT='/nonexistent/media'):
+            res = self.client.get('/readyz')
+
+        self.assertEqual(res.status_code, 503)
+        self.assertFalse(res.json()['media_storage'])
+
+    @override_settings(HEALTH_CHECK_CACHE_TTL=60)
+    def test_readyz_result_cached(self):
+        """Test the readiness checks only run once within the TTL"""
+        check = Mock(return_value=True)
+        with patch('core.middleware.READINESS_CHECKS', (('db', check),)):
+            self.client.get('/readyz')
+            res = self.client.get('/readyz')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(check.call_count, 1)
@@ -0,0 +1,193 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as shared_cache
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import events
+from core.label_cache import cache, version_key
+from core.models import Department, Employee, Tag
+
+
+TAGS_URL = reverse('staff:tag-list')
+
+
+def label_queries(queries):
+    """Return the queries reading the tag or department tables"""
+    return [
+        query for query in queries
+        if 'FROM "core_tag"' in query['sql'] or
+        'FROM "core_department"' in query['sql']
+    ]
+
+
+@override_settings(CACHE_SHARED=True)
+class LabelCacheTests(TransactionTestCase):
+    """Test serving tags and departments from process memory"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_served_from_cache(self):
+        """Test repeated tag lists read the database once"""
+        Tag.objects.create(user=self.user, name='Remote')
+        self.client.get(TAGS_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(label_queries(queries), [])
+        self.assertEqual(res.data[0]['name'], 'Remote')
+
+    def test_create_invalidates(self):
+        """Test a created tag shows up straight away"""
+        Tag.objects.create(user=self.user, name='Remote')
+        self.client.get(TAGS_URL)
+
+        self.client.post(TAGS_URL, {'name': 'Intern'})
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(
+            [tag['name'] for tag in res.data], ['Remote', 'Intern']
+        )
+
+    def test_event_from_other_worker_invalidates(self):
+        """Test a change announced through the backplane drops the entry"""
+        tag = Tag.objects.create(user=self.user, name='Remote')
+        self.client.get(TAGS_URL)
+        Tag.objects.filter(pk=tag.pk).update(name='Onsite')
+
+        events.broker.deliver(self.user.pk, {
+            'kind': 'tag', 'action': 'updated', 'ids': [tag.pk]
+        })
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data[0]['name'], 'Onsite')
+
+    @override_settings(LABEL_CACHE_SIZE=1)
+    def test_least_recently_used_evicted(self):
+        """Test the cache holds at most LABEL_CACHE_SIZE entries"""
+        cache.rows(Tag, self.user.pk)
+        cache.rows(Department, self.user.pk)
+
+        self.assertIsNone(cache.peek(Tag, self.user.pk))
+        self.assertIsNotNone(cache.peek(Department, self.user.pk))
+
+    def test_uncommitted_rows_not_cached(self):
+        """Test rows read inside a transaction aren't kept"""
+        with transaction.atomic():
+            Tag.objects.create(user=self.user, name='Rolled back')
+            cache.rows(Tag, self.user.pk)
+            transaction.set_rollback(True)
+
+        self.assertIsNone(cache.peek(Tag, self.user.pk))
+
+    def test_write_checks_labels_in_database(self):
+        """Test a label deleted by another worker is rejected, not cached"""
+        tag = Tag.objects.create(user=self.user, name='Remote')
+        cache.rows(Tag, self.user.pk)
+        # Deleted without an event reaching this worker
+        Tag.objects.filter(pk=tag.pk)._raw_delete('default')
+
+        res = self.client.post(reverse('staff:employee-list'), {
+            'title': 'Sample employee', 'experience': 10, 'salary': 5.00,
+            'tags': [tag.pk], 'department': ['Research'],
+        }, format='json')
+
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('tags', res.data)
+
+    def test_shared_version_from_other_worker(self):
+        """Test a change versioned by another worker reloads the entry"""
+        Tag.objects.create(user=self.user, name='Remote')
+        self.client.get(TAGS_URL)
+        # Created by a worker whose events never reach this one
+        Tag.objects.bulk_create([Tag(user=self.user, name='Intern')])
+        self.assertEqual(len(self.client.get(TAGS_URL).data), 1)
+
+        shared_cache.set(version_key('tag', self.user.pk), 'other', None)
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(
+            [tag['name'] for tag in res.data], ['Remote', 'Intern']
+        )
+
+    @override_settings(CACHE_SHARED=False)
+    def test_nothing_kept_without_shared_channel(self):
+        """Test labels aren't kept when no worker could invalidate them"""
+        Tag.objects.create(user=self.user, name='Remote')
+        self.client.get(TAGS_URL)
+
+        Tag.objects.bulk_create([Tag(user=self.user, name='Intern')])
+        res = self.client.get(TAGS_URL)
+
+        self.assertIsNone(cache.peek(Tag, self.user.pk))
+        self.assertEqual(len(res.data), 2)
+
+    def test_unknown_ids_reload(self):
+        """Test labels missing from the cached rows are reloaded"""
+        employee = Employee.objects.create(
+            user=self.user, title='Sample employee', experience=10,
+            salary=5.00
+        )
+        cache.rows(Tag, self.user.pk)
+        Tag.objects.bulk_create([Tag(user=self.user, name='Remote')])
+        tag = Tag.objects.get(user=self.user, name='Remote')
+        Employee.tags.through.objects.create(employee=employee, tag=tag)
+
+        res = self.client.get(
+            reverse('staff:employee-detail', args=[employee.id])
+        )
+
+        self.assertEqual(res.data['tags'][0]['name'], 'Remote')
+
+    def test_employee_detail_from_cache(self):
+        """Test the detail view only reads label ids from the database"""
+        employee = Employee.objects.create(
+            user=self.user, title='Sample employee', experience=10,
+            salary=5.00
+        )
+        employee.tags.add(Tag.objects.create(user=self.user, name='Remote'))
+        url = reverse('staff:employee-detail', args=[employee.id])
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url)
+
+        self.assertEqual(label_queries(queries), [])
+        self.assertEqual(res.data['tags'][0]['name'], 'Remote')
+
+    def test_index_served_from_cache(self):
+        """Test repeated prefix searches read the database once"""
+        Tag.objects.create(user=self.user, name='Remote')
+        cache.index(Tag, self.user.pk)
+
+        with self.assertNumQueries(0):
+            matches = cache.index(Tag, self.user.pk).search('rem', 10)
+
+        self.assertEqual(matches[0]['name'], 'Remote')
+
+    def test_employee_event_drops_usage(self):
+        """Test employee changes drop the usage counts, not the labels"""
+        tag = Tag.objects.create(user=self.user, name='Remote')
+        cache.index(Tag, self.user.pk)
+        employee = Employee.objects.create(
+            user=self.user, title='Sample employee', experience=10,
+            salary=5.00
+        )
+        employee.tags.add(tag)
+
+        self.assertIsNotNone(cache.peek(Tag, self.user.pk))
+        self.assertEqual(
+            cache.index(Tag, self.user.pk).search('', 10)[0]['usage'], 1
+        )
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core import labels
+from core.models import Tag
+
+
+class ResolveLabelsTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Intern')
+
+    def test_resolves_ids_and_names(self):
+        """Test existing labels are found and missing names created"""
+        pks = labels.resolve(
+            Tag, self.user.pk, [self.tag.pk], ['Intern', 'Remote', 'Lead']
+        )
+
+        tags = Tag.objects.filter(user=self.user)
+        self.assertCountEqual(pks, tags.values_list('pk', flat=True))
+        self.assertEqual(tags.count(), 3)
+
+    def test_existing_names_not_inserted(self):
+        """Test only the lookup runs when every name exists"""
+        with self.assertNumQueries(1):
+            pks = labels.resolve(Tag, self.user.pk, [], ['Intern'])
+
+        self.assertEqual(pks, [self.tag.pk])
+
+    def test_concurrently_created_name_reused(self):
+        """Test a name inserted after the lookup isn't duplicated"""
+        other = Tag.objects.create(user=self.user, name='Remote')
+
+        created = labels._insert(Tag, self.user.pk, ['Remote', 'Lead'],
+                                 'default')
+
+        self.assertEqual(created['Remote'], other.pk)
+        self.assertEqual(Tag.objects.filter(name='Remote').count(), 1)
+
+    def test_unknown_id_rejected(self):
+        """Test ids of other users' labels are rejected"""
+        other_user = get_user_model().objects.create_user(
+            'other@tangent.com',
+            'testpass'
+        )
+        other = Tag.objects.create(user=other_user, name='Intern')
+
+        with self.assertRaises(Tag.DoesNotExist):
+            labels.resolve(Tag, self.user.pk, [other.pk], [])
@@ -0,0 +1,117 @@
+import shutil
+import signal
+import tempfile
+import tracemalloc
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import memory
+from core.middleware import MemoryMiddleware
+
+
+MEMORY_URL = reverse('memory')
+
+
+def allocating_view(request):
+    """Respond with a megabyte body"""
+    return HttpResponse(b'x' * 1024 * 1024)
+
+
+class MemoryMiddlewareTests(TestCase):
+    """Test allocation tracking and worker recycling"""
+
+    def setUp(self):
+        self.report_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.report_dir)
+        tracker = patch('core.memory.tracker', memory.Tracker())
+        self.tracker = tracker.start()
+        self.addCleanup(tracker.stop)
+        self.factory = RequestFactory()
+
+    def test_unused_when_disabled(self):
+        """Test the middleware drops out when nothing is configured"""
+        with self.assertRaises(MiddlewareNotUsed):
+            MemoryMiddleware(allocating_view)
+
+    @override_settings(MEMORY_PROFILING=True)
+    def test_routes_tracked(self):
+        """Test allocations are counted per route"""
+        middleware = MemoryMiddleware(allocating_view)
+        self.addCleanup(tracemalloc.stop)
+
+        middleware(self.factory.get('/api/staff/tags/'))
+        middleware(self.factory.get('/api/staff/tags/'))
+
+        stats = self.tracker.routes['GET /api/staff/tags/']
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['peak_max'], 1024 * 1024)
+
+    @override_settings(MEMORY_PROFILING=True)
+    def test_memreport(self):
+        """Test the command shows what the workers dumped"""
+        middleware = MemoryMiddleware(allocating_view)
+        self.addCleanup(tracemalloc.stop)
+        middleware(self.factory.get('/api/staff/tags/'))
+        out = StringIO()
+
+        with self.settings(MEMORY_REPORT_DIR=self.report_dir):
+            self.tracker.dump()
+            call_command('memreport', stdout=out)
+
+        self.assertIn('GET /api/staff/tags/', out.getvalue())
+        self.assertIn('RSS', out.getvalue())
+
+    @override_settings(MEMORY_MAX_RSS_MB=1,
+                       MEMORY_REPORT_DIR=tempfile.gettempdir())
+    def test_recycle_over_rss(self):
+        """Test the worker stops itself after the response went out"""
+        middleware = MemoryMiddleware(allocating_view)
+
+        with patch('core.memory.os.kill') as kill:
+            middleware(self.factory.get('/'))
+            kill.assert_not_called()
+            request_finished.send(sender=None)
+            request_finished.send(sender=None)
+
+        kill.assert_called_once_with(memory.os.getpid(), signal.SIGTERM)
+
+
+class MemoryReportApiTests(TestCase):
+    """Test the staff memory endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_staff_only(self):
+        """Test only staff users get the report"""
+        user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.client.force_authenticate(user)
+
+        self.assertEqual(self.client.get(MEMORY_URL).status_code, 403)
+
+    def test_report(self):
+        """Test the report holds RSS and gc statistics"""
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                'admin@tangent.com',
+                'testpass'
+            )
+        )
+
+        res = self.client.get(MEMORY_URL)
+
+        self.assertGreater(res.data['rss'], 0)
+        self.assertIn('counts', res.data['gc'])
@@ -0,0 +1,170 @@
+from unittest.mock import MagicMock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from core import partitioning
+from core.models import Employee, EmployeeSummary, Tag
+
+
+class FakeCursor:
+    """Cursor answering the catalog queries of _partition_table"""
+
+    def __init__(self, referencing=()):
+        self.executed = []
+        self.results = [
+            [
+                ('core_employee_tags_pkey', 'p', 'PRIMARY KEY (id)', None),
+                ('core_employee_tags_uniq', 'u',
+                 'UNIQUE (employee_id, tag_id)', None),
+                ('core_employee_tags_employee_fk', 'f',
+                 'FOREIGN KEY (employee_id) REFERENCES core_employee(id)',
+                 'p'),
+                ('core_employee_tags_tag_fk', 'f',
+                 'FOREIGN KEY (tag_id) REFERENCES core_tag(id)', 'r'),
+            ],
+            [('CREATE INDEX core_employee_tags_tag_id '
+              'ON public.core_employee_tags USING btree (tag_id)',)],
+            [('public.core_employee_tags_id_seq',)],
+            list(referencing),
+        ]
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+    def fetchone(self):
+        return self.results.pop(0)[0]
+
+
+class PartitionTableTests(SimpleTestCase):
+
+    def test_rebuilds_table_with_partitions(self):
+        """Test the table is copied into partitions with its constraints"""
+        cursor = FakeCursor()
+
+        partitioning._partition_table(
+            cursor, lambda name: f'"{name}"', 'core_employee_tags',
+            'employee_id', 2
+        )
+
+        ddl = cursor.executed[4:]
+        self.assertEqual(ddl[:3], [
+            'ALTER TABLE "core_employee_tags" '
+            'RENAME TO "core_employee_tags_unpartitioned"',
+            'CREATE TABLE "core_employee_tags" '
+            '(LIKE "core_employee_tags_unpartitioned" '
+            'INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            'PARTITION BY HASH ("employee_id")',
+            'CREATE TABLE "core_employee_tags_p0" '
+            'PARTITION OF "core_employee_tags" '
+            'FOR VALUES WITH (MODULUS 2, REMAINDER 0)',
+        ])
+        self.assertIn(
+            'ALTER TABLE "core_employee_tags" ADD CONSTRAINT '
+            '"core_employee_tags_pkey" PRIMARY KEY (id, "employee_id")',
+            ddl
+        )
+        self.assertIn(
+            'ALTER TABLE "core_employee_tags" ADD CONSTRAINT '
+            '"core_employee_tags_tag_fk" '
+            'FOREIGN KEY (tag_id) REFERENCES core_tag(id)',
+            ddl
+        )
+        self.assertFalse([sql for sql in ddl if 'employee_fk' in sql])
+        self.assertIn(
+            'CREATE INDEX core_employee_tags_tag_id '
+            'ON public.core_employee_tags USING btree (tag_id)',
+            ddl
+        )
+
+        self.assertFalse([sql for sql in ddl if 'TRIGGER' in sql])
+
+    def test_referencing_rows_deleted_by_trigger(self):
+        """Test rows whose foreign keys are dropped are deleted by trigger"""
+        cursor = FakeCursor(referencing=[
+            ('core_employee_tags', 'employee_id'),
+            ('core_employeesummary', 'employee_id'),
+        ])
+
+        partitioning._partition_table(
+            cursor, lambda name: f'"{name}"', 'core_employee', 'user_id', 2
+        )
+
+        self.assertEqual(cursor.executed[-3:-1], [
+            'CREATE FUNCTION "core_employee_cascade"() RETURNS trigger '
+            'LANGUAGE plpgsql AS $$ BEGIN '
+            'DELETE FROM "core_employee_tags" '
+            'WHERE "employee_id" = OLD.id; '
+            'DELETE FROM "core_employeesummary" '
+            'WHERE "employee_id" = OLD.id; '
+            'RETURN OLD; END $$',
+            'CREATE TRIGGER "core_employee_cascade" AFTER DELETE ON '
+            '"core_employee" FOR EACH ROW '
+            'EXECUTE FUNCTION "core_employee_cascade"()',
+        ])
+
+
+class PartitionCommandTests(TestCase):
+
+    def test_other_databases_untouched(self):
+        """Test partitioning is skipped outside PostgreSQL"""
+        if connection.vendor == 'postgresql':
+            self.skipTest('Runs against other databases')
+        unused = MagicMock(vendor=connection.vendor)
+
+        self.assertEqual(partitioning.partition(unused, 8), [])
+        unused.cursor.assert_not_called()
+
+    def test_partitions_required(self):
+        """Test the command refuses to run without a partition count"""
+        with self.assertRaises(CommandError):
+            call_command('partition_staff_tables', partitions=0)
+
+
+class PartitionedTablesTests(TestCase):
+    """Run against a test database migrated with STAFF_PARTITIONS"""
+
+    def setUp(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Partitioning needs PostgreSQL')
+        with connection.cursor() as cursor:
+            if not partitioning.is_partitioned(
+                    cursor, Employee._meta.db_table):
+                self.skipTest('Staff tables are not partitioned')
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+
+    def test_partitioned_tables_listed(self):
+        """Test flush sees the partitioned tables and not their partitions"""
+        tables = connection.introspection.table_names()
+
+        self.assertIn(Employee._meta.db_table, tables)
+        self.assertNotIn(f'{Employee._meta.db_table}_p0', tables)
+
+    def test_raw_delete_cascades(self):
+        """Test deleting employee rows deletes the rows referencing them"""
+        employee = Employee.objects.create(
+            user=self.user, title='Sample employee', experience=10,
+            salary=5.00
+        )
+        employee.tags.add(Tag.objects.create(user=self.user, name='Remote'))
+        self.assertTrue(
+            EmployeeSummary.objects.filter(employee_id=employee.pk)
+        )
+
+        Employee.objects.filter(pk=employee.pk)._raw_delete('default')
+
+        self.assertFalse(
+            Employee.tags.through.objects.filter(employee_id=employee.pk)
+        )
+        self.assertFalse(
+            EmployeeSummary.objects.filter(employee_id=employee.pk)
+        )
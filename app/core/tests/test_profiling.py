@@ -0,0 +1,130 @@
+import os
+import shutil
+import sys
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import profiling
+from core.models import AuthToken
+
+
+ME_URL = reverse('user:me')
+
+
+class ProfilingTests(TestCase):
+    """Test on-demand and sampled request profiling"""
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        settings = override_settings(
+            PROFILE_DIR=self.profile_dir, PROFILE_INTERVAL=0.0005
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.staff = get_user_model().objects.create_superuser(
+            'admin@tangent.com',
+            'testpass'
+        )
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        """Send a token of user with every request"""
+        token = AuthToken.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_not_profiled_by_default(self):
+        """Test unflagged requests leave no profile"""
+        self.authenticate(self.staff)
+
+        res = self.client.get(ME_URL)
+
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(profiling.profile_ids(), [])
+
+    def test_staff_flag_records_profile(self):
+        """Test staff can profile a request with the header"""
+        self.authenticate(self.staff)
+
+        res = self.client.get(ME_URL, HTTP_X_PROFILE='1')
+
+        profile = profiling.load(res['X-Profile-Id'])
+        self.assertEqual(profile['reason'], 'requested')
+        self.assertEqual(profile['path'], ME_URL)
+        self.assertEqual(profile['user'], 'admin@tangent.com')
+        self.assertTrue(any(
+            'core_authtoken' in query['sql'] for query in profile['queries']
+        ))
+
+    def test_flag_ignored_for_other_users(self):
+        """Test the flag does nothing for users who aren't staff"""
+        self.authenticate(get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        ))
+
+        res = self.client.get(ME_URL, {'profile': '1'})
+
+        self.assertNotIn('X-Profile-Id', res)
+
+    @override_settings(PROFILE_SAMPLE_RATE=1)
+    def test_sampled_requests(self):
+        """Test requests are profiled at PROFILE_SAMPLE_RATE"""
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(
+            profiling.load(res['X-Profile-Id'])['reason'], 'sampled'
+        )
+
+    @override_settings(PROFILE_SAMPLE_RATE=1, PROFILE_KEEP=2)
+    def test_profiles_bounded(self):
+        """Test only the newest PROFILE_KEEP profiles are kept"""
+        ids = [self.client.get(ME_URL)['X-Profile-Id'] for _ in range(3)]
+
+        self.assertEqual(profiling.profile_ids(), ids[:0:-1])
+        self.assertEqual(len(os.listdir(self.profile_dir)), 2)
+
+    def test_admin_pages(self):
+        """Test profiles are listed and drawn in the admin"""
+        self.authenticate(self.staff)
+        profile_id = self.client.get(
+            ME_URL, HTTP_X_PROFILE='1'
+        )['X-Profile-Id']
+        self.client.credentials()
+        self.client.force_login(self.staff)
+
+        listing = self.client.get(reverse('profile-list'))
+        detail = self.client.get(reverse('profile-detail', args=[profile_id]))
+
+        self.assertContains(listing, ME_URL)
+        self.assertContains(detail, 'SQL timeline')
+        self.assertEqual(
+            self.client.get(
+                reverse('profile-detail', args=['..settings'])
+            ).status_code,
+            404
+        )
+
+    def test_flame_graph_layout(self):
+        """Test stacks are merged into boxes sized by their samples"""
+        boxes = profiling.flame_graph({'a;b': 3, 'a;c': 1})
+
+        self.assertEqual(boxes, [
+            (0, 0, 1.0, 'a', 4),
+            (1, 0, 0.75, 'b', 3),
+            (1, 0.75, 0.25, 'c', 1),
+        ])
+
+    def test_fold(self):
+        """Test a frame is folded outermost function first"""
+        stack = profiling.fold(sys._getframe())
+
+        self.assertTrue(stack.endswith(
+            'core.tests.test_profiling.test_fold'
+        ))
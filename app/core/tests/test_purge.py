@@ -0,0 +1,84 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import purge
+from core.models import Change, Department, Employee, EmployeeSummary, Tag
+
+
+class PurgeTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.other = get_user_model().objects.create_user(
+            'other@tangent.com',
+            'testpass'
+        )
+        root = Department.objects.create(user=self.user, name='Root')
+        child = Department.objects.create(
+            user=self.user, name='Child', parent=root
+        )
+        tag = Tag.objects.create(user=self.user, name='Intern')
+        for index in range(5):
+            employee = Employee.objects.create(
+                user=self.user, title='Employee', experience=1, salary=1,
+                image=f'uploads/employee/{index}.jpg' if index == 0 else None
+            )
+            employee.tags.add(tag)
+            employee.department.add(root, child)
+        self.kept = Employee.objects.create(
+            user=self.other, title='Kept', experience=1, salary=1
+        )
+        purge.deactivate(self.user)
+
+    def assertPurged(self):
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        for model in (Employee, EmployeeSummary, Tag, Department, Change):
+            self.assertFalse(model.objects.filter(user=self.user).exists())
+        self.assertFalse(Employee.tags.through.objects.exists())
+        self.assertTrue(Employee.objects.filter(pk=self.kept.pk).exists())
+
+    @patch('django.core.files.storage.FileSystemStorage.delete')
+    def test_purge_in_chunks(self, delete):
+        """Test everything is deleted chunk by chunk with progress"""
+        progress = []
+
+        purge.purge_user(
+            self.user, chunk_size=2,
+            progress=lambda label, count: progress.append((label, count))
+        )
+
+        self.assertPurged()
+        delete.assert_called_once_with('uploads/employee/0.jpg')
+        self.assertEqual(
+            [count for label, count in progress if label == 'employees'],
+            [2, 4, 5]
+        )
+
+    @patch('django.core.files.storage.FileSystemStorage.delete')
+    def test_interrupted_purge_resumes(self, delete):
+        """Test a purge stopped midway finishes when run again"""
+        def stop(label, count):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            purge.purge_user(self.user, chunk_size=2, progress=stop)
+        self.assertEqual(Employee.objects.filter(user=self.user).count(), 3)
+
+        out = StringIO()
+        call_command('purge_users', chunk_size=2, stdout=out)
+
+        self.assertPurged()
+        self.assertIn('test@tangent.com: purged', out.getvalue())
+
+    def test_active_users_not_purged(self):
+        """Test only deactivated users are picked up"""
+        self.assertEqual(list(purge.pending_users()), [self.user])
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
+
+from core import routers
+from core.authentication import ExpiringTokenAuthentication
+from core.checks import check_shared_cache
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import AuthToken, Tag
+
+
+REPLICAS = ['replica_0', 'replica_1']
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTests(TestCase):
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.seen = []
+        cache.clear()
+
+    def tearDown(self):
+        routers.release_reads()
+
+    def view(self, request):
+        """Record which database reads were routed to"""
+        self.seen.append(self.router.db_for_read(Tag))
+        return HttpResponse()
+
+    def test_round_robin(self):
+        """Test replicas are chosen in turn"""
+        chosen = {routers.choose_replica() for _ in range(4)}
+
+        self.assertEqual(chosen, set(REPLICAS))
+
+    @override_settings(DATABASE_REPLICA_STRATEGY='least_loaded')
+    def test_least_loaded(self):
+        """Test the replica with fewest in-flight requests is chosen"""
+        routers.pin_reads('replica_0')
+
+        self.assertEqual(routers.choose_replica(), 'replica_1')
+
+    def test_writes_go_to_primary(self):
+        """Test writes and unpinned reads use the default database"""
+        self.assertEqual(self.router.db_for_write(Tag), 'default')
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_0', 'core'))
+
+    def test_safe_request_reads_replica(self):
+        """Test GET requests read from a replica"""
+        middleware = ReplicaRoutingMiddleware(self.view)
+        middleware(self.factory.get('/', HTTP_AUTHORIZATION='Token abc'))
+
+        self.assertIn(self.seen[0], REPLICAS)
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    def test_read_your_writes(self):
+        """Test reads stick to primary after the client writes"""
+        middleware = ReplicaRoutingMiddleware(self.view)
+        middleware(self.factory.post('/', HTTP_AUTHORIZATION='Token abc'))
+        middleware(self.factory.get('/', HTTP_AUTHORIZATION='Token abc'))
+        middleware(self.factory.get('/', HTTP_AUTHORIZATION='Token xyz'))
+
+        self.assertEqual(self.seen[0], 'default')
+        self.assertEqual(self.seen[1], 'default')
+        self.assertIn(self.seen[2], REPLICAS)
+
+    def test_tokens_read_from_primary(self):
+        """Test tokens are looked up on the primary while reads are pinned"""
+        user = get_user_model().objects.create_user(
+            email='test@tangent.com', password='testpass'
+        )
+        token = AuthToken.objects.create(user=user)
+        # replica_0 is not a configured database, reading it would fail
+        routers.pin_reads('replica_0')
+
+        authenticated, _ = ExpiringTokenAuthentication() \
+            .authenticate_credentials(token.key)
+
+        self.assertEqual(authenticated, user)
+
+    def test_local_cache_warning(self):
+        """Test replicas with a per-process cache are warned about"""
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ['core.W001']
+        )
+        with self.settings(CACHE_SHARED=True):
+            self.assertEqual(check_shared_cache(None), [])
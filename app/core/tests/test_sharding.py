@@ -0,0 +1,181 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import sharding
+from core.models import Change, Tag, Employee, ShardAssignment
+
+
+SHARDS = ['default', 'shard_0', 'shard_1']
+
+
+class HashRingTests(TestCase):
+
+    def test_keys_spread_over_nodes(self):
+        """Test every node owns part of the key space"""
+        ring = sharding.HashRing(SHARDS)
+        owners = {ring.get(key) for key in range(1000)}
+
+        self.assertEqual(owners, set(SHARDS))
+
+    def test_adding_node_moves_few_keys(self):
+        """Test adding a node only remaps the keys it takes over"""
+        before = sharding.HashRing(SHARDS)
+        after = sharding.HashRing(SHARDS + ['shard_2'])
+        moved = [
+            key for key in range(1000) if before.get(key) != after.get(key)
+        ]
+
+        self.assertTrue(all(after.get(key) == 'shard_2' for key in moved))
+        self.assertLess(len(moved), 500)
+
+
+class ShardDirectoryTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+
+    @override_settings(DATABASE_SHARDS=['default'])
+    def test_unsharded_uses_default(self):
+        """Test everything lives on default without extra shards"""
+        with self.assertNumQueries(0):
+            shard = sharding.shard_for_user(self.user.pk)
+
+        self.assertEqual(shard, 'default')
+
+    @override_settings(DATABASE_SHARDS=SHARDS)
+    def test_directory_overrides_ring(self):
+        """Test an explicit assignment wins over the ring"""
+        ring_shard = sharding.shard_for_user(self.user.pk)
+        override = next(shard for shard in SHARDS if shard != ring_shard)
+        ShardAssignment.objects.create(user=self.user, shard=override)
+
+        self.assertEqual(sharding.shard_for_user(self.user.pk), override)
+
+    @override_settings(DATABASE_SHARDS=SHARDS)
+    def test_router_uses_instance_hint(self):
+        """Test writes are routed by the instance's user"""
+        ShardAssignment.objects.create(user=self.user, shard='shard_1')
+        tag = Tag(user=self.user, name='Intern')
+        router = sharding.ShardRouter()
+
+        self.assertEqual(router.db_for_write(Tag, instance=tag), 'shard_1')
+        self.assertIsNone(router.db_for_write(get_user_model()))
+
+
+@override_settings(DATABASE_SHARDS=['default', 'shard_0'])
+class MoveUserShardTests(TestCase):
+    multi_db = True
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.source = sharding.shard_for_user(self.user.pk)
+        self.target = next(
+            shard for shard in settings.DATABASE_SHARDS
+            if shard != self.source
+        )
+
+    def test_api_uses_user_shard(self):
+        """Test the staff API reads and writes the user's shard"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.post(reverse('staff:tag-list'), {'name': 'Intern'})
+        res = client.get(reverse('staff:tag-list'))
+
+        self.assertEqual(res.data[0]['name'], 'Intern')
+        self.assertTrue(
+            Tag.objects.using(self.source).filter(user=self.user).exists()
+        )
+        self.assertFalse(
+            Tag.objects.using(self.target).filter(user=self.user).exists()
+        )
+
+    def test_move_user(self):
+        """Test staff data is copied to the target and purged at source"""
+        tag = Tag.objects.using(self.source).create(
+            user=self.user, name='Intern'
+        )
+        employee = Employee.objects.using(self.source).create(
+            user=self.user, title='Clerk', experience=1, salary=1.00
+        )
+        employee.tags.add(tag)
+
+        call_command(
+            'move_user_shard', self.user.email, self.target, stdout=StringIO()
+        )
+
+        self.assertEqual(sharding.shard_for_user(self.user.pk), self.target)
+        moved = Employee.objects.using(self.target).get(pk=employee.pk)
+        self.assertEqual(list(moved.tags.all()), [tag])
+        self.assertFalse(
+            Employee.objects.using(self.source).filter(user=self.user).exists()
+        )
+        self.assertFalse(
+            Tag.objects.using(self.source).filter(user=self.user).exists()
+        )
+
+    def test_move_sends_no_deletions(self):
+        """Test the source cleanup announces and logs nothing"""
+        Tag.objects.using(self.source).create(user=self.user, name='Intern')
+        Employee.objects.using(self.source).create(
+            user=self.user, title='Clerk', experience=1, salary=1.00
+        )
+        changes = Change.objects.filter(user=self.user)
+        logged = changes.using(self.source).count()
+        self.assertEqual(logged, 2)
+
+        with patch('core.events.publish') as publish:
+            sharding.move_user(self.user, self.target)
+
+        publish.assert_not_called()
+        self.assertFalse(changes.using(self.source).exists())
+        self.assertEqual(changes.using(self.target).count(), logged)
+        self.assertFalse(changes.using(self.target).filter(deleted=True))
+
+    def test_move_drains_writes_after_locking(self):
+        """Test the copy waits for fenced writes once the user is locked"""
+        locked = []
+
+        def lock(function, using, user_id):
+            locked.append((function, using, sharding.is_locked(user_id)))
+
+        with patch('core.sharding._advisory_lock', side_effect=lock):
+            sharding.move_user(self.user, self.target)
+
+        self.assertEqual(
+            locked, [('pg_advisory_xact_lock', self.source, True)]
+        )
+
+    def test_writes_fenced_before_lock_check(self):
+        """Test a write takes the fence before checking the move lock"""
+        calls = []
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def lock(function, using, user_id):
+            calls.append(function)
+
+        def is_locked(user_id):
+            calls.append('check')
+            return False
+
+        with patch('core.sharding._advisory_lock', side_effect=lock), \
+                patch('core.sharding.is_locked', side_effect=is_locked):
+            client.post(reverse('staff:tag-list'), {'name': 'Intern'})
+
+        self.assertEqual(calls, [
+            'pg_advisory_lock_shared', 'check', 'pg_advisory_unlock_shared'
+        ])
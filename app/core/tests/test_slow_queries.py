@@ -0,0 +1,91 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import slow_queries
+from core.models import SlowQuery
+
+
+EMPLOYEE_URL = reverse('staff:employee-list')
+METRICS_URL = reverse('metrics')
+
+
+@override_settings(SLOW_QUERY_MS=0.000001, SLOW_QUERY_ASYNC=False)
+class SlowQueryLogTests(TestCase):
+    """Test recording and reporting slow queries"""
+
+    def setUp(self):
+        slow_queries.install(connection)
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_normalize(self):
+        """Test values and list lengths don't change the fingerprint"""
+        self.assertEqual(
+            slow_queries.normalize(
+                "SELECT * FROM t WHERE id IN (%s, %s) AND name = 'a' LIMIT 21"
+            ),
+            slow_queries.normalize(
+                "SELECT  *  FROM t WHERE id IN (%s) AND name = 'b''c' LIMIT 5"
+            ),
+        )
+
+    def test_queries_aggregated_by_fingerprint(self):
+        """Test repeated requests add up on one row per query shape"""
+        self.client.get(EMPLOYEE_URL, {'department_subtree': '1'})
+        self.client.get(EMPLOYEE_URL, {'department_subtree': '2'})
+
+        query = SlowQuery.objects.get(sql__startswith=(
+            'SELECT "core_department"."id"'
+        ))
+        self.assertEqual(query.calls, 2)
+        self.assertEqual(query.database, 'default')
+        self.assertEqual(
+            query.call_site,
+            'staff.views.EmployeeViewSet.filter_department_subtree'
+        )
+        self.assertIn('core_department', query.plan)
+
+    def test_disabled_below_threshold(self):
+        """Test queries under SLOW_QUERY_MS are not recorded"""
+        SlowQuery.objects.all().delete()
+
+        with override_settings(SLOW_QUERY_MS=60000):
+            self.client.get(EMPLOYEE_URL)
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_command_lists_top_queries(self):
+        """Test the command prints fingerprints with their plans"""
+        self.client.get(EMPLOYEE_URL)
+        out = StringIO()
+
+        call_command('slow_queries', top=3, plans=True, stdout=out)
+
+        self.assertIn('calls', out.getvalue())
+        self.assertIn('    | ', out.getvalue())
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics(self):
+        """Test the slowest fingerprints are exported for scraping"""
+        self.client.get(EMPLOYEE_URL)
+        self.client.force_authenticate(None)
+
+        denied = self.client.get(METRICS_URL)
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer secret'
+        )
+
+        self.assertEqual(denied.status_code, 401)
+        self.assertContains(res, 'slow_query_calls_total{fingerprint="')
+        self.assertContains(res, '# TYPE slow_query_max_seconds gauge')
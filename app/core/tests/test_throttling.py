@@ -0,0 +1,162 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.middleware import ConcurrencyLimitMiddleware
+from core.throttling import CacheBucketStore, LocalBucketStore, \
+    get_store
+
+
+TOKEN_URL = reverse('user:token')
+EMPLOYEE_URL = reverse('staff:employee-list')
+BATCH_URL = reverse('batch')
+
+
+def rates(**overrides):
+    """Return REST_FRAMEWORK settings with the given throttle rates"""
+    throttle_rates = {
+        'user': '100/min', 'anon': '100/min', 'token': '100/min',
+        'upload': '100/min', 'bulk': '100/min',
+    }
+    throttle_rates.update(overrides)
+    return {
+        'DEFAULT_THROTTLE_CLASSES': (
+            'core.throttling.TokenBucketThrottle',
+            'core.throttling.ScopedTokenBucketThrottle',
+        ),
+        'DEFAULT_THROTTLE_RATES': throttle_rates,
+    }
+
+
+class LocalBucketStoreTests(TestCase):
+
+    def test_bucket_refills(self):
+        """Test a drained bucket refills at the configured rate"""
+        store = LocalBucketStore()
+
+        self.assertEqual(store.consume('key', 2, 1.0, now=0), 0)
+        self.assertEqual(store.consume('key', 2, 1.0, now=0), 0)
+        self.assertEqual(store.consume('key', 2, 1.0, now=0), 1.0)
+        self.assertEqual(store.consume('key', 2, 1.0, now=1), 0)
+
+    def test_least_recent_key_evicted(self):
+        """Test the store stays bounded"""
+        store = LocalBucketStore(max_keys=2)
+        for key in ('a', 'b', 'c'):
+            store.consume(key, 1, 1.0, now=0)
+
+        self.assertEqual(store.consume('a', 1, 1.0, now=0), 0)
+        self.assertEqual(store.consume('c', 1, 1.0, now=0), 1.0)
+
+
+class CacheBucketStoreTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_shared(self):
+        """Test stores on the same cache share their buckets"""
+        CacheBucketStore().consume('key', 1, 1.0, now=0)
+
+        self.assertEqual(CacheBucketStore().consume('key', 1, 1.0, now=0), 1)
+
+    def test_clear_keeps_other_keys(self):
+        """Test clearing refills the buckets only"""
+        store = CacheBucketStore()
+        store.consume('key', 1, 1.0, now=0)
+        cache.set('other', 'kept')
+
+        store.clear()
+
+        self.assertEqual(store.consume('key', 1, 1.0, now=0), 0)
+        self.assertEqual(cache.get('other'), 'kept')
+
+
+class ThrottleApiTests(TestCase):
+
+    def setUp(self):
+        get_store('core.throttling.LocalBucketStore').clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+
+    def tearDown(self):
+        get_store('core.throttling.LocalBucketStore').clear()
+
+    @override_settings(REST_FRAMEWORK=rates(token='2/min'))
+    def test_token_creation_throttled(self):
+        """Test token creation has its own small budget"""
+        payload = {'email': 'test@tangent.com', 'password': 'testpass'}
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '30')
+
+    @override_settings(REST_FRAMEWORK=rates(user='2/min'))
+    def test_user_throttled(self):
+        """Test authenticated requests share the per user budget"""
+        self.client.force_authenticate(self.user)
+        self.client.get(EMPLOYEE_URL)
+        self.client.get(EMPLOYEE_URL)
+
+        res = self.client.get(EMPLOYEE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK=rates(upload='1/min'))
+    def test_upload_scope_separate(self):
+        """Test image uploads are limited without limiting the list"""
+        self.client.force_authenticate(self.user)
+        url = reverse('staff:employee-upload-image', args=[1])
+        self.client.post(url, {}, format='multipart')
+
+        res = self.client.post(url, {}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = self.client.get(EMPLOYEE_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(REST_FRAMEWORK=rates(bulk='1/min'))
+    def test_batch_bulk_scope(self):
+        """Test batches are limited by the bulk budget"""
+        self.client.force_authenticate(self.user)
+        payload = {'requests': [{'method': 'GET', 'path': EMPLOYEE_URL}]}
+        res = self.client.post(BATCH_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.post(BATCH_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = self.client.get(EMPLOYEE_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class ConcurrencyLimitTests(TestCase):
+
+    @override_settings(MAX_IN_FLIGHT_REQUESTS=1)
+    def test_sheds_load_when_full(self):
+        """Test requests over the in-flight limit are rejected"""
+        responses = []
+
+        def view(request):
+            if not responses:
+                responses.append(middleware(RequestFactory().get('/')))
+            return HttpResponse()
+
+        middleware = ConcurrencyLimitMiddleware(view)
+        res = middleware(RequestFactory().get('/'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(responses[0].status_code, 503)
+        self.assertEqual(responses[0]['Retry-After'], '1')
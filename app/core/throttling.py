@@ -0,0 +1,134 @@
+import collections
+import functools
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LocalBucketStore:
+    """Token buckets kept in process memory, least recently used evicted"""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, now):
+        """Take a token from the bucket, return seconds to wait if empty"""
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (capacity, now))
+            tokens, wait = _take(tokens, stamp, capacity, rate, now)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """Token buckets kept in a Django cache shared between workers
+
+    Reads and writes are not atomic, so concurrent requests on the same key
+    may occasionally both get through. Buckets are stored under a
+    generation kept in the cache, clear() moves to the next one and leaves
+    the rest of the cache alone.
+    """
+    GENERATION_KEY = 'throttle-buckets:generation'
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or settings.THROTTLE_CACHE]
+
+    def consume(self, key, capacity, rate, now):
+        """Take a token from the bucket, return seconds to wait if empty"""
+        key = f'throttle-buckets:{self.generation()}:{key}'
+        tokens, stamp = self.cache.get(key, (capacity, now))
+        tokens, wait = _take(tokens, stamp, capacity, rate, now)
+        self.cache.set(key, (tokens, now), int(capacity / rate) + 1)
+        return wait
+
+    def generation(self):
+        return self.cache.get_or_set(self.GENERATION_KEY, 0, None)
+
+    def clear(self):
+        """Forget every bucket, buckets of older generations expire"""
+        try:
+            self.cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            self.cache.set(self.GENERATION_KEY, 1, None)
+
+
+def _take(tokens, stamp, capacity, rate, now):
+    """Refill the bucket since stamp and take one token if available"""
+    tokens = min(capacity, tokens + (now - stamp) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+@functools.lru_cache(maxsize=None)
+def get_store(path):
+    """Return the bucket store instance for the dotted path"""
+    return import_string(path)()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Token bucket per user, or per client IP for anonymous requests
+
+    The rate 'N/period' gives a bucket of N tokens refilled evenly over the
+    period, so clients can burst up to N requests and then continue at the
+    average rate.
+    """
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def __init__(self):
+        self._wait = 0
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_scope(self, request, view):
+        """Return the rate scope for the request, None to skip throttling"""
+        if request.user and request.user.is_authenticated:
+            return 'user'
+        return 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(request, view)
+        self.rate = self.get_rate() if self.scope else None
+        if self.rate is None:
+            return True
+
+        capacity, duration = self.parse_rate(self.rate)
+        store = get_store(settings.THROTTLE_STORE)
+        self._wait = store.consume(
+            self.get_cache_key(request, view),
+            capacity,
+            capacity / duration,
+            self.timer()
+        )
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """Separate budget for views or actions setting `throttle_scope`"""
+
+    def get_scope(self, request, view):
+        return getattr(view, 'throttle_scope', None)
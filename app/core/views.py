@@ -0,0 +1,159 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+
+from rest_framework import serializers
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import batch, memory, profiling
+from core.authentication import ExpiringTokenAuthentication
+from core.models import SlowQuery
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """Serializer for one request of a batch"""
+    method = serializers.ChoiceField(
+        choices=('GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE')
+    )
+    path = serializers.RegexField(r'^/api/')
+    headers = serializers.DictField(
+        child=serializers.CharField(), required=False
+    )
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for a batch of API requests"""
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, requests):
+        if len(requests) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f'At most {settings.BATCH_MAX_REQUESTS} requests per batch.'
+            )
+        return requests
+
+
+class BatchView(APIView):
+    """Run several API requests in one, authenticating only once
+
+    Responds with the status, headers and body of every request, in the
+    order they were given. Batches draw on the 'bulk' throttle budget, the
+    requests in them on their own views' budgets as well.
+    """
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'bulk'
+    batchable = False
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(batch.run(
+            request,
+            serializer.validated_data['requests'],
+            parallel=serializer.validated_data['parallel']
+        ))
+
+
+class MemoryReportView(APIView):
+    """Report the memory use of the worker serving the request
+
+    Each call diffs a tracemalloc snapshot against the previous one.
+    """
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(memory.tracker.report())
+
+
+@staff_member_required
+def profile_list(request):
+    """List the stored request profiles, newest first"""
+    profiles = []
+    for profile_id in profiling.profile_ids():
+        profile = profiling.load(profile_id)
+        if profile is not None:
+            profile.update(
+                id=profile_id,
+                started=datetime.fromtimestamp(
+                    profile['started'], timezone.utc
+                ),
+                query_count=len(profile['queries']),
+            )
+            profiles.append(profile)
+    return render(request, 'admin/core/profile_list.html', {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': profiles,
+    })
+
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    """Show a stored profile as a flame graph and SQL timeline"""
+    profile = profiling.load(profile_id)
+    if profile is None:
+        raise Http404('Profile not found')
+
+    boxes = [
+        {'top': depth * 18, 'left': left * 100, 'width': width * 100,
+         'name': name, 'count': count}
+        for depth, left, width, name, count
+        in profiling.flame_graph(profile['samples'])
+    ]
+    duration = profile['duration_ms'] or 1
+    queries = [
+        dict(query, left=query['start_ms'] / duration * 100,
+             width=max(query['duration_ms'] / duration * 100, 0.2))
+        for query in profile['queries']
+    ]
+    return render(request, 'admin/core/profile_detail.html', {
+        **admin.site.each_context(request),
+        'title': f'{profile["method"]} {profile["path"]}',
+        'profile': profile,
+        'boxes': boxes,
+        'height': max([box['top'] for box in boxes], default=0) + 18,
+        'queries': queries,
+    })
+
+
+def metrics(request):
+    """Export the slowest query fingerprints in Prometheus text format"""
+    token = settings.METRICS_TOKEN
+    if token and request.META.get('HTTP_AUTHORIZATION') != f'Bearer {token}':
+        return HttpResponse(status=401)
+
+    queries = SlowQuery.objects.order_by('-total_ms')[
+        :settings.METRICS_TOP_QUERIES
+    ]
+    metrics = (
+        ('slow_query_calls_total', 'counter',
+         'Queries over SLOW_QUERY_MS', lambda query: query.calls),
+        ('slow_query_seconds_total', 'counter',
+         'Time spent in the slow queries',
+         lambda query: query.total_ms / 1000),
+        ('slow_query_max_seconds', 'gauge',
+         'Slowest run of the query', lambda query: query.max_ms / 1000),
+    )
+    lines = []
+    for name, kind, description, value in metrics:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for query in queries:
+            lines.append(
+                f'{name}{{fingerprint="{query.fingerprint}",'
+                f'call_site="{query.call_site}"}} {value(query)}'
+            )
+    return HttpResponse(
+        '\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4'
+    )
@@ -0,0 +1,144 @@
+import asyncio
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+
+class PooledWsgiToAsgi:
+    """ASGI application running a WSGI application on a thread pool
+
+    Adapted from asgiref's WsgiToAsgi, which runs every request on one
+    thread. The request body is received on the event loop, spooled to disk
+    past 64 KiB, then the WSGI application runs on executor and its
+    response is sent back through the loop chunk by chunk.
+    """
+
+    def __init__(self, wsgi_application, executor=None):
+        self.wsgi_application = wsgi_application
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError('WSGI adapter received a non-HTTP scope')
+
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                if message['type'] != 'http.request':
+                    raise ValueError(
+                        'WSGI adapter received a non-HTTP-request message'
+                    )
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+
+            loop = asyncio.get_event_loop()
+            response = WsgiResponse(loop, send)
+            await loop.run_in_executor(
+                self.executor, response.run, self.wsgi_application,
+                build_environ(scope, body)
+            )
+
+
+class WsgiResponse:
+    """Send the response of one WSGI call from a pool thread"""
+
+    def __init__(self, loop, send):
+        self.loop = loop
+        self.send = send
+        self.start = None
+        self.started = False
+        self.content_length = None
+
+    def send_sync(self, message):
+        asyncio.run_coroutine_threadsafe(
+            self.send(message), self.loop
+        ).result()
+
+    def start_response(self, status, headers, exc_info=None):
+        """WSGI start_response callable"""
+        if exc_info is not None and self.started:
+            raise exc_info[1].with_traceback(exc_info[2])
+        if self.start is not None and exc_info is None:
+            raise ValueError('start_response called twice without exc_info')
+
+        self.content_length = None
+        for name, value in headers:
+            if name.lower() == 'content-length':
+                self.content_length = int(value)
+        self.start = {
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [
+                (name.lower().encode('ascii'), value.encode('latin1'))
+                for name, value in headers
+            ],
+        }
+
+    def run(self, application, environ):
+        """Call application and send its response, on a pool thread"""
+        sent = 0
+        result = application(environ, self.start_response)
+        try:
+            for chunk in result:
+                if not self.started:
+                    self.started = True
+                    self.send_sync(self.start)
+                # Never send more than the Content-Length announced
+                if self.content_length is not None:
+                    chunk = chunk[:self.content_length - sent]
+                self.send_sync({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+                sent += len(chunk)
+                if sent == self.content_length:
+                    break
+        finally:
+            close = getattr(result, 'close', None)
+            if close is not None:
+                close()
+
+        if not self.started:
+            self.started = True
+            self.send_sync(self.start)
+        self.send_sync({'type': 'http.response.body'})
+
+
+def build_environ(scope, body):
+    """Return the WSGI environ of an ASGI HTTP scope and request body"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin1'),
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': BytesIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = f'HTTP_{name.upper().replace("-", "_")}'
+        value = value.decode('latin1')
+        # Repeated headers are joined, as WSGI servers do
+        if key in environ:
+            value = f'{environ[key]},{value}'
+        environ[key] = value
+    return environ
@@ -1,8 +1,31 @@
+import json
+
+from django.db import router, transaction
+
 from rest_framework import serializers
-from core.models import Tag, Department, Employee
+from rest_framework.utils import html
+from core import label_cache, labels, summary
+from core.models import Tag, Department, Employee, EmployeeSummary
+
+
+class DynamicFieldsMixin:
+    """Prune fields with `fields` and nest relations listed in `expand`"""
+    expandable = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
 
+        for name in expand or ():
+            if name in self.expandable and name in self.fields:
+                self.fields[name] = self.expandable[name](
+                    many=True, read_only=True
+                )
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
-class TagSerializer(serializers.ModelSerializer):
+
+class TagSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for tag object"""
 
     class Meta:
@@ -11,26 +34,100 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_Fields = ('id',)
 
 
-class DepartmentSerializer(serializers.ModelSerializer):
+class DepartmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for an dept object"""
 
     class Meta:
         model = Department
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'parent')
         read_only_fields = ('id',)
 
+    def validate_parent(self, parent):
+        """Only allow the user's departments outside this one's subtree
 
-class EmployeeSerializer(serializers.ModelSerializer):
-    """Serialize an Employee"""
-    department = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Department.objects.all()
-    )
+        The tree may not get deeper than Department.PATH_MAX_LENGTH allows.
+        """
+        if parent is None:
+            return parent
+        if parent.user_id != self.context['request'].user.pk:
+            raise serializers.ValidationError(
+                f'Invalid pk "{parent.pk}" - object does not exist.'
+            )
+        department = self.instance or Department(user_id=parent.user_id)
+        error = department.parent_error(parent)
+        if error is not None:
+            raise serializers.ValidationError(error)
+        return parent
+
+
+class LabelField(serializers.Field):
+    """One tag or department: an id, a name, {"id": ...} or {"name": ...}
+
+    Returns an ('id', pk) or ('name', name) pair.
+    """
+    default_error_messages = {
+        'invalid': 'Expected an id, a name, {{"id": ...}} or '
+                   '{{"name": ...}}.',
+    }
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.name_field = serializers.CharField(max_length=255)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict) and len(data) == 1:
+            (key, value), = data.items()
+            if key == 'id' and isinstance(value, str) and value.isdigit():
+                value = int(value)
+            if key == 'id' and isinstance(value, int) and \
+                    not isinstance(value, bool):
+                return 'id', value
+            if key == 'name' and isinstance(value, str):
+                return 'name', self.name_field.run_validation(value)
+        elif isinstance(data, int) and not isinstance(data, bool):
+            return 'id', data
+        elif isinstance(data, str):
+            return 'name', self.name_field.run_validation(data)
+        self.fail('invalid')
+
+
+class LabelsField(serializers.ListField):
+    """Tags/departments by id, or by name to find or create
+
+    Numbers are ids and strings are names, so a label named "2024" can be
+    referenced by name. Form data can't tell the two apart, there digit
+    strings are read as ids.
+    """
+    child = LabelField()
+
+    def get_value(self, dictionary):
+        value = super().get_value(dictionary)
+        if html.is_html_input(dictionary) and isinstance(value, list):
+            value = [
+                int(item) if isinstance(item, str) and item.isdigit()
+                else item
+                for item in value
+            ]
+        return value
+
+    def to_representation(self, value):
+        return [label.pk for label in value.all()]
 
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
-    )
+    def to_internal_value(self, data):
+        ids, names = [], []
+        for kind, value in super().to_internal_value(data):
+            (ids if kind == 'id' else names).append(value)
+        return {'ids': ids, 'names': names}
+
+
+class EmployeeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Serialize an Employee"""
+    expandable = {
+        'department': DepartmentSerializer,
+        'tags': TagSerializer,
+    }
+    department = LabelsField()
+    tags = LabelsField()
 
     class Meta:
         model = Employee
@@ -41,11 +138,73 @@ class EmployeeSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('id',)
 
+    def create(self, validated_data):
+        using = router.db_for_write(Employee)
+        with transaction.atomic(using=using):
+            self.resolve_labels(validated_data, validated_data['user'], using)
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        using = instance._state.db
+        with transaction.atomic(using=using):
+            self.resolve_labels(validated_data, instance.user, using)
+            relations = {
+                field_name: validated_data.pop(field_name)
+                for field_name in ('tags', 'department')
+                if field_name in validated_data
+            }
+            instance = super().update(instance, validated_data)
+            changed = [
+                labels.set_labels(instance, field_name, pks)
+                for field_name, pks in relations.items()
+            ]
+            if any(changed):
+                summary.refresh_employees([instance.pk], using)
+        return instance
+
+    def resolve_labels(self, validated_data, user, using):
+        """Replace label ids and names with pks, creating missing labels"""
+        for field_name, model in (('tags', Tag), ('department', Department)):
+            if field_name not in validated_data:
+                continue
+            try:
+                validated_data[field_name] = labels.resolve(
+                    model, user.pk, using=using, **validated_data[field_name]
+                )
+            except model.DoesNotExist as exc:
+                raise serializers.ValidationError({field_name: [str(exc)]})
+
+
+class CachedLabelsField(serializers.Field):
+    """Nested tags or departments of an employee, from the label cache
+
+    Only the ids are read from the relation, unless it was prefetched.
+    """
+
+    def __init__(self, serializer_class, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.serializer_class = serializer_class
+
+    def to_representation(self, manager):
+        employee = manager.instance
+        if manager.prefetch_cache_name in getattr(
+                employee, '_prefetched_objects_cache', {}):
+            found = manager.all()
+        else:
+            ids = manager.through.objects.filter(**{
+                f'{manager.source_field_name}_id': employee.pk
+            }).values_list(f'{manager.target_field_name}_id', flat=True)
+            found = label_cache.cache.instances(
+                manager.model, employee.user_id, ids
+            )
+        return self.serializer_class(found, many=True).data
+
 
 class EmployeeDetailSerializer(EmployeeSerializer):
     """ Serialize employee details"""
-    department = DepartmentSerializer(many=True, read_only=True)
-    tags = TagSerializer(many=True, read_only=True)
+    department = CachedLabelsField(DepartmentSerializer)
+    tags = CachedLabelsField(TagSerializer)
 
 
 class EmployeeImageSerializer(serializers.ModelSerializer):
@@ -55,3 +214,22 @@ class EmployeeImageSerializer(serializers.ModelSerializer):
         model = Employee
         fields = ('id', 'image')
         read_only_fields = ('id',)
+
+
+class LabelListField(serializers.Field):
+    """Read a JSON list of [id, name] pairs as a list of id/name objects"""
+
+    def to_representation(self, value):
+        return [{'id': pk, 'name': name} for pk, name in json.loads(value)]
+
+
+class EmployeeSummarySerializer(serializers.ModelSerializer):
+    """Serialize an employee from its summary row"""
+    id = serializers.IntegerField(source='employee_id', read_only=True)
+    department = LabelListField(read_only=True)
+    tags = LabelListField(read_only=True)
+
+    class Meta:
+        model = EmployeeSummary
+        fields = ('id', 'title', 'department', 'tags')
+        read_only_fields = ('title',)
@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Department, Employee, Tag
+
+
+TAGS_AUTOCOMPLETE_URL = reverse('staff:tag-autocomplete')
+DEPARTMENTS_AUTOCOMPLETE_URL = reverse('staff:department-autocomplete')
+
+
+def sample_employee(user, **params):
+    defaults = {'title': 'Sample employee', 'experience': 10, 'salary': 5.00}
+    defaults.update(params)
+    return Employee.objects.create(user=user, **defaults)
+
+
+class AutocompleteApiTests(TestCase):
+    """Test the tag and department autocomplete endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_login_required(self):
+        """Test that login is required to autocomplete"""
+        res = APIClient().get(TAGS_AUTOCOMPLETE_URL, {'q': 're'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prefix_ranked_by_usage(self):
+        """Test matches start with q, case insensitively, most used first"""
+        remote = Tag.objects.create(user=self.user, name='Remote')
+        relocating = Tag.objects.create(user=self.user, name='relocating')
+        Tag.objects.create(user=self.user, name='Intern')
+        for _ in range(2):
+            sample_employee(self.user).tags.add(relocating)
+        sample_employee(self.user).tags.add(remote)
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 'RE'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': relocating.id, 'name': 'relocating', 'usage': 2},
+            {'id': remote.id, 'name': 'Remote', 'usage': 1},
+        ])
+
+    def test_ties_in_name_order(self):
+        """Test equally used labels come alphabetically"""
+        Department.objects.create(user=self.user, name='Sales')
+        Department.objects.create(user=self.user, name='Research')
+        Department.objects.create(user=self.user, name='Recruiting')
+
+        res = self.client.get(DEPARTMENTS_AUTOCOMPLETE_URL, {'q': 'r'})
+
+        self.assertEqual(
+            [department['name'] for department in res.data],
+            ['Recruiting', 'Research']
+        )
+
+    @override_settings(AUTOCOMPLETE_MAX_LIMIT=2)
+    def test_limit(self):
+        """Test ?limit= caps the matches, up to AUTOCOMPLETE_MAX_LIMIT"""
+        for name in ('Alpha', 'Beta', 'Gamma'):
+            Tag.objects.create(user=self.user, name=name)
+
+        one = self.client.get(TAGS_AUTOCOMPLETE_URL, {'limit': '1'})
+        many = self.client.get(TAGS_AUTOCOMPLETE_URL, {'limit': '100'})
+        invalid = self.client.get(TAGS_AUTOCOMPLETE_URL, {'limit': 'x'})
+
+        self.assertEqual(len(one.data), 1)
+        self.assertEqual(len(many.data), 2)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_limited_to_user(self):
+        """Test only the authenticated user's labels are matched"""
+        other = get_user_model().objects.create_user(
+            'other@tangent.com',
+            'password'
+        )
+        Tag.objects.create(user=other, name='Remote')
+        tag = Tag.objects.create(user=self.user, name='Relocating')
+
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 're'})
+
+        self.assertEqual([match['id'] for match in res.data], [tag.id])
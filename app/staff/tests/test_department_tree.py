@@ -0,0 +1,188 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Department, Employee
+
+
+DEPARTMENT_URL = reverse('staff:department-list')
+EMPLOYEE_URL = reverse('staff:employee-list')
+
+
+def detail_url(department_id):
+    """Return department detail URL"""
+    return reverse('staff:department-detail', args=[department_id])
+
+
+def headcount_url(department_id):
+    """Return department headcount URL"""
+    return reverse('staff:department-headcount', args=[department_id])
+
+
+def sample_employee(user, *departments):
+    """Create and return an Employee in the departments"""
+    employee = Employee.objects.create(
+        user=user, title='Sample employee', experience=10, salary=5.00
+    )
+    employee.department.add(*departments)
+    return employee
+
+
+class DepartmentTreeTests(TestCase):
+    """Test nested departments"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def chain(self, depth, name='Level'):
+        """Return departments nested depth deep, root first"""
+        departments = []
+        for level in range(depth):
+            departments.append(Department.objects.create(
+                user=self.user,
+                name=f'{name} {level}',
+                parent=departments[-1] if departments else None
+            ))
+        return departments
+
+    def test_create_child(self):
+        """Test creating a department under a parent"""
+        root, = self.chain(1)
+
+        res = self.client.post(
+            DEPARTMENT_URL, {'name': 'Payroll', 'parent': root.id}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        child = Department.objects.get(id=res.data['id'])
+        self.assertEqual(child.parent, root)
+        self.assertEqual(child.path, f'{root.id}/')
+
+    def test_move_updates_subtree(self):
+        """Test moving a department re-paths everything below it"""
+        root, middle, leaf = self.chain(3)
+        other, = self.chain(1, name='Other')
+
+        res = self.client.patch(detail_url(middle.id), {'parent': other.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        leaf.refresh_from_db()
+        self.assertEqual(leaf.path, f'{other.id}/{middle.id}/')
+        self.assertIn(leaf, other.subtree())
+        self.assertNotIn(leaf, root.subtree())
+
+    def test_move_below_itself_rejected(self):
+        """Test a department can't be moved into its own subtree"""
+        root, middle, leaf = self.chain(3)
+
+        res = self.client.patch(detail_url(root.id), {'parent': leaf.id})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deep_trees(self):
+        """Test trees are not capped at a short path column"""
+        departments = self.chain(100)
+
+        departments[-1].refresh_from_db()
+        self.assertEqual(departments[-1].path.count('/'), 99)
+
+    def test_too_deep_rejected(self):
+        """Test moves nesting the tree past PATH_MAX_LENGTH are rejected"""
+        root, middle, leaf = self.chain(3)
+        first, second = self.chain(2, name='Other')
+        limit = len(second.subtree_path) + \
+            len(leaf.path) - len(middle.path) - 1
+
+        with patch.object(Department, 'PATH_MAX_LENGTH', limit):
+            res = self.client.patch(
+                detail_url(middle.id), {'parent': second.id}
+            )
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+            res = self.client.patch(
+                detail_url(leaf.id), {'parent': second.id}
+            )
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_other_users_parent_rejected(self):
+        """Test departments can't be nested under another user's"""
+        other_user = get_user_model().objects.create_user(
+            'other@tangent.com',
+            'testpass'
+        )
+        parent = Department.objects.create(user=other_user, name='Theirs')
+
+        res = self.client.post(
+            DEPARTMENT_URL, {'name': 'Mine', 'parent': parent.id}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_reroots_children(self):
+        """Test children of a deleted department become roots"""
+        root, middle, leaf = self.chain(3)
+
+        root.delete()
+
+        middle.refresh_from_db()
+        leaf.refresh_from_db()
+        self.assertIsNone(middle.parent)
+        self.assertEqual(middle.path, '')
+        self.assertEqual(leaf.path, f'{middle.id}/')
+
+    def test_filter_employees_by_subtree(self):
+        """Test employees anywhere below a department are listed once"""
+        root, middle, leaf = self.chain(3)
+        other, = self.chain(1, name='Other')
+        inside = sample_employee(self.user, middle, leaf)
+        sample_employee(self.user, other)
+
+        res = self.client.get(EMPLOYEE_URL, {'department_subtree': root.id})
+
+        self.assertEqual([e['id'] for e in res.data], [inside.id])
+
+    def test_subtree_queries_independent_of_depth(self):
+        """Test subtree filtering doesn't recurse through the tree"""
+        shallow = self.chain(2, name='Shallow')
+        deep = self.chain(8, name='Deep')
+        sample_employee(self.user, shallow[-1])
+        sample_employee(self.user, deep[-1])
+
+        with CaptureQueriesContext(connection) as shallow_queries:
+            self.client.get(
+                EMPLOYEE_URL, {'department_subtree': shallow[0].id}
+            )
+        with CaptureQueriesContext(connection) as deep_queries:
+            res = self.client.get(
+                EMPLOYEE_URL, {'department_subtree': deep[0].id}
+            )
+
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(shallow_queries), len(deep_queries))
+
+    def test_headcount(self):
+        """Test the headcount covers the whole subtree"""
+        root, middle, leaf = self.chain(3)
+        sample_employee(self.user, root)
+        sample_employee(self.user, middle, leaf)
+        sample_employee(self.user)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(headcount_url(root.id))
+
+        self.assertEqual(res.data, {'id': root.id, 'headcount': 2})
+        self.assertEqual(
+            self.client.get(headcount_url(leaf.id)).data['headcount'], 1
+        )
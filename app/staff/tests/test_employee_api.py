@@ -3,13 +3,15 @@ import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Employee, Tag, Department
+from core.models import Employee, EmployeeSummary, Tag, Department
 
 from staff.serializers import EmployeeSerializer, EmployeeDetailSerializer
 
@@ -167,6 +169,84 @@ class PrivateEmployeeApiTests(TestCase):
         self.assertIn(dept1, department)
         self.assertIn(dept2, department)
 
+    def test_create_employee_with_label_names(self):
+        """Test labels given by name are found or created"""
+        tag = sample_tag(user=self.user, name='fixer')
+        dept = sample_department(user=self.user)
+        payload = {
+            'title': 'Named labels',
+            'tags': ['fixer', 'singer'],
+            'department': [dept.id, 'Research'],
+            'experience': 3,
+            'salary': 10.00
+        }
+        res = self.client.post(EMPLOYEE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        employee = Employee.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(employee.tags.values_list('name', flat=True)),
+            ['fixer', 'singer']
+        )
+        self.assertIn(tag, employee.tags.all())
+        self.assertEqual(
+            sorted(employee.department.values_list('name', flat=True)),
+            ['Accounts', 'Research']
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_numeric_label_names(self):
+        """Test strings are names even when all digits, numbers are ids"""
+        sample_tag(user=self.user, name='2024')
+        other = sample_tag(user=self.user, name='fixer')
+        payload = {
+            'title': 'Numeric names',
+            'tags': ['2024', str(other.id), {'id': other.id},
+                     {'name': '2025'}],
+            'department': ['2024'],
+            'experience': 3,
+            'salary': 10.00
+        }
+        res = self.client.post(EMPLOYEE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        employee = Employee.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(employee.tags.values_list('name', flat=True)),
+            sorted(['2024', '2025', 'fixer', str(other.id)])
+        )
+        self.assertEqual(
+            list(employee.department.values_list('name', flat=True)),
+            ['2024']
+        )
+
+    def test_invalid_label(self):
+        """Test labels must be ids, names or objects holding one"""
+        for label in ({'id': 'x'}, {'title': 'x'}, True, 1.5):
+            res = self.client.post(EMPLOYEE_URL, {
+                'title': 'Invalid', 'tags': [label],
+                'experience': 3, 'salary': 10.00
+            }, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_employee_with_other_users_tag(self):
+        """Test labels of other users can't be attached"""
+        user2 = get_user_model().objects.create_user(
+            'other@tangent.com',
+            'pass'
+        )
+        payload = {
+            'title': 'Borrowed tag',
+            'tags': [sample_tag(user=user2).id],
+            'experience': 3,
+            'salary': 10.00
+        }
+        res = self.client.post(EMPLOYEE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Employee.objects.exists())
+
     def test_partial_update_employee(self):
         """Test updating an employee with patch"""
         employee = sample_employee(user=self.user)
@@ -183,6 +263,56 @@ class PrivateEmployeeApiTests(TestCase):
         self.assertEqual(len(tags), 1)
         self.assertIn(new_tag, tags)
 
+    def tagged_employee(self, count):
+        """Return an employee with count tags and count other tags"""
+        employee = sample_employee(user=self.user)
+        tags = [
+            sample_tag(user=self.user, name=f'tag {employee.id} {i}')
+            for i in range(count * 2)
+        ]
+        employee.tags.add(*tags[:count])
+        return employee, tags
+
+    def update_tags(self, employee, tags):
+        """PATCH the employee's tags, returning the queries run"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(
+                detail_url(employee.id),
+                {'tags': [tag.id for tag in tags]},
+                format='json'
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_update_unchanged_tags_skips_writes(self):
+        """Test resubmitting the same tags doesn't touch the through table"""
+        employee, tags = self.tagged_employee(3)
+
+        queries = self.update_tags(employee, tags[:3])
+
+        self.assertFalse([
+            sql for sql in queries
+            if sql.startswith(('INSERT', 'DELETE')) and
+            'core_employee_tags' in sql
+        ])
+
+    def test_update_tags_constant_queries(self):
+        """Test changing tags costs the same however many change"""
+        small, small_tags = self.tagged_employee(2)
+        large, large_tags = self.tagged_employee(10)
+
+        small_queries = self.update_tags(small, small_tags[1:3])
+        large_queries = self.update_tags(large, large_tags[5:15])
+
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(
+            sorted(large.tags.values_list('id', flat=True)),
+            [tag.id for tag in large_tags[5:15]]
+        )
+        summary = EmployeeSummary.objects.get(employee=small)
+        self.assertNotIn(small_tags[0].name, summary.tags)
+        self.assertIn(small_tags[2].name, summary.tags)
+
     def test_full_update_employee(self):
         """Test updating an employee with put"""
         employee = sample_employee(user=self.user)
@@ -0,0 +1,102 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Employee
+
+
+EMPLOYEE_URL = reverse('staff:employee-list')
+
+
+def sample_employee(user, **params):
+    """Create and return a sample Employee"""
+    defaults = {
+        'title': 'Sample employee',
+        'experience': 10,
+        'salary': 5.00,
+    }
+    defaults.update(params)
+
+    return Employee.objects.create(user=user, **defaults)
+
+
+class EmployeePaginationTests(TestCase):
+    """Test the estimated count pagination of employees"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        for _ in range(3):
+            sample_employee(user=self.user)
+
+    def test_unpaginated_without_page(self):
+        """Test the list stays a plain list unless a page is requested"""
+        res = self.client.get(EMPLOYEE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 3)
+
+    def test_small_set_counted_exactly(self):
+        """Test small result sets report an exact count"""
+        res = self.client.get(EMPLOYEE_URL, {'page': 1, 'page_size': 2})
+
+        self.assertEqual(res.data['count'], 3)
+        self.assertFalse(res.data['count_is_approximate'])
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=2, CACHE_SHARED=True)
+    def test_large_set_uses_cached_count(self):
+        """Test the maintained per-user count replaces COUNT(*)"""
+        self.client.get(EMPLOYEE_URL, {'page': 1})
+        sample_employee(user=self.user)
+        Employee.objects.filter(user=self.user).first().delete()
+        sample_employee(user=self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(EMPLOYEE_URL, {'page': 1})
+
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries.captured_queries)
+        )
+        self.assertEqual(res.data['count'], 4)
+        self.assertTrue(res.data['count_is_approximate'])
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=2)
+    def test_count_not_cached_per_process(self):
+        """Test counts aren't cached without a cache shared by workers"""
+        self.client.get(EMPLOYEE_URL, {'page': 1})
+        # As created by another worker, whose adjustment this one misses
+        Employee.objects.bulk_create([
+            Employee(user=self.user, title='Clerk', experience=1, salary=1)
+        ])
+
+        with patch('core.pagination.planner_estimate', return_value=None):
+            res = self.client.get(EMPLOYEE_URL, {'page': 1})
+
+        self.assertEqual(res.data['count'], 4)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=2)
+    def test_planner_estimate_for_large_sets(self):
+        """Test the planner estimate is used without a cached count"""
+        with patch('core.pagination.planner_estimate') as estimate, \
+                patch('staff.views.EmployeeViewSet.get_cached_count') as gc:
+            estimate.return_value = 5000
+            gc.return_value = None
+            res = self.client.get(EMPLOYEE_URL, {'page': 1})
+
+        self.assertEqual(res.data['count'], 5000)
+        self.assertTrue(res.data['count_is_approximate'])
@@ -0,0 +1,105 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Employee, EmployeeSummary, Tag, Department
+
+
+SUMMARY_URL = reverse('staff:employee-summary')
+
+
+def sample_employee(user, **params):
+    """Create and return a sample Employee"""
+    defaults = {
+        'title': 'Sample employee',
+        'experience': 10,
+        'salary': 5.00,
+    }
+    defaults.update(params)
+
+    return Employee.objects.create(user=user, **defaults)
+
+
+class EmployeeSummaryTests(TestCase):
+    """Test the denormalized employee summary"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.employee = sample_employee(user=self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Intern')
+        self.department = Department.objects.create(
+            user=self.user, name='Accounts'
+        )
+        self.employee.tags.add(self.tag)
+        self.employee.department.add(self.department)
+
+    def test_summary_list(self):
+        """Test listing employees from the summary table"""
+        user2 = get_user_model().objects.create_user(
+            'other@tangent.com',
+            'pass'
+        )
+        sample_employee(user=user2)
+
+        res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{
+            'id': self.employee.id,
+            'title': self.employee.title,
+            'department': [{'id': self.department.id, 'name': 'Accounts'}],
+            'tags': [{'id': self.tag.id, 'name': 'Intern'}],
+        }])
+
+    def test_summary_single_query(self):
+        """Test the summary is served without joins or prefetches"""
+        sample_employee(user=self.user).tags.add(self.tag)
+
+        with self.assertNumQueries(1):
+            self.client.get(SUMMARY_URL)
+
+    def test_tag_rename_updates_summary(self):
+        """Test renaming a tag rewrites dependent summaries in one query"""
+        self.tag.name = 'Graduate'
+        # save, sync change log replace (delete + insert), summary refresh
+        with self.assertNumQueries(4):
+            self.tag.save()
+
+        summary = EmployeeSummary.objects.get(employee=self.employee)
+        self.assertIn('Graduate', summary.tags)
+
+    def test_employee_changes_update_summary(self):
+        """Test title, removal and deletion of labels are reflected"""
+        self.employee.title = 'Manager'
+        self.employee.save()
+        self.employee.tags.remove(self.tag)
+        self.department.delete()
+
+        res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.data[0]['title'], 'Manager')
+        self.assertEqual(res.data[0]['tags'], [])
+        self.assertEqual(res.data[0]['department'], [])
+
+    def test_rebuild_repairs_drift(self):
+        """Test the rebuild command recreates and recomputes summaries"""
+        EmployeeSummary.objects.all().delete()
+        Employee.objects.filter(pk=self.employee.pk).update(title='Drifted')
+
+        call_command('rebuild_employee_summary', stdout=StringIO())
+
+        summary = EmployeeSummary.objects.get(employee=self.employee)
+        self.assertEqual(summary.title, 'Drifted')
+        self.assertIn('Intern', summary.tags)
+        self.assertIn('Accounts', summary.department)
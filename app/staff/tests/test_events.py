@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import events
+from core.models import Tag
+
+
+EVENTS_URL = reverse('staff:events')
+
+
+@override_settings(
+    EVENTS_BACKPLANE='core.events.LocalBackplane',
+    EVENTS_HEARTBEAT_SECONDS=0.01,
+)
+class EventsApiTests(TransactionTestCase):
+    """Test the staff event stream"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_requires_authentication(self):
+        """Test that login is required for the event stream"""
+        res = APIClient().get(EVENTS_URL, HTTP_ACCEPT='text/event-stream')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertTrue(res.content.startswith(b'event: error\n'))
+
+    def test_streams_changes(self):
+        """Test saves and deletes are pushed once committed"""
+        res = self.client.get(EVENTS_URL, HTTP_ACCEPT='text/event-stream')
+        stream = iter(res.streaming_content)
+        self.assertEqual(res['Content-Type'], 'text/event-stream')
+        self.assertEqual(next(stream), events.PREAMBLE)
+
+        tag = Tag.objects.create(user=self.user, name='Intern')
+        tag_id = tag.id
+        tag.delete()
+
+        self.assertEqual(next(stream), b''.join([
+            events.format_event('change', {
+                'kind': 'tag', 'action': 'created', 'ids': [tag_id]
+            }),
+            events.format_event('change', {
+                'kind': 'tag', 'action': 'deleted', 'ids': [tag_id]
+            }),
+        ]))
+        res.close()
+        self.assertEqual(events.broker.subscriber_count(), 0)
@@ -0,0 +1,51 @@
+import msgpack
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Employee, Tag
+
+
+EMPLOYEE_URL = reverse('staff:employee-list')
+TAGS_URL = reverse('staff:tag-list')
+
+
+class MessagePackApiTests(TestCase):
+    """Test the MessagePack renderer and parser"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_render_employee_list(self):
+        """Test employees can be listed as MessagePack"""
+        Employee.objects.create(
+            user=self.user, title='Clerk', experience=1, salary=5.00
+        )
+
+        res = self.client.get(EMPLOYEE_URL, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        data = msgpack.unpackb(res.content, raw=False)
+        self.assertEqual(data[0]['title'], 'Clerk')
+        self.assertEqual(data[0]['salary'], '5.00')
+
+    def test_parse_tag_create(self):
+        """Test MessagePack request bodies are accepted"""
+        res = self.client.post(
+            TAGS_URL,
+            msgpack.packb({'name': 'Intern'}),
+            content_type='application/msgpack'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Tag.objects.filter(name='Intern').exists())
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Employee, Tag, Department
+
+
+EMPLOYEE_URL = reverse('staff:employee-list')
+TAGS_URL = reverse('staff:tag-list')
+
+
+def sample_employee(user, **params):
+    """Create and return a sample Employee"""
+    defaults = {
+        'title': 'Sample employee',
+        'experience': 10,
+        'salary': 5.00,
+    }
+    defaults.update(params)
+
+    return Employee.objects.create(user=user, **defaults)
+
+
+class SparseFieldsTests(TestCase):
+    """Test ?fields= and ?expand= on the staff API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Intern')
+        self.department = Department.objects.create(
+            user=self.user, name='Accounts'
+        )
+
+    def add_employees(self, count):
+        for _ in range(count):
+            employee = sample_employee(user=self.user)
+            employee.tags.add(self.tag)
+            employee.department.add(self.department)
+
+    def test_fields_prune_output_and_columns(self):
+        """Test only the requested fields are selected and returned"""
+        self.add_employees(2)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(EMPLOYEE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data[0]), {'id', 'title'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('salary', queries.captured_queries[0]['sql'])
+
+    def test_expand_inlines_relations(self):
+        """Test expanded relations are nested objects"""
+        self.add_employees(1)
+
+        res = self.client.get(EMPLOYEE_URL, {'expand': 'tags,department'})
+
+        self.assertEqual(res.data[0]['tags'], [
+            {'id': self.tag.id, 'name': self.tag.name}
+        ])
+        self.assertEqual(res.data[0]['department'], [
+            {'id': self.department.id, 'name': self.department.name,
+             'parent': None}
+        ])
+
+    def test_expand_uses_constant_queries(self):
+        """Test relations are prefetched rather than loaded per employee"""
+        self.add_employees(1)
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(EMPLOYEE_URL, {'expand': 'tags'})
+
+        self.add_employees(4)
+        with CaptureQueriesContext(connection) as five:
+            self.client.get(EMPLOYEE_URL, {'expand': 'tags'})
+
+        self.assertEqual(len(one), len(five))
+
+    def test_fields_on_tags(self):
+        """Test tag lists can be pruned too"""
+        res = self.client.get(TAGS_URL, {'fields': 'name'})
+
+        self.assertEqual(res.data, [{'name': self.tag.name}])
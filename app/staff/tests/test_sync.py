@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Employee, Tag, Department
+
+
+SYNC_URL = reverse('staff:sync')
+
+
+def sample_employee(user, **params):
+    """Create and return a sample Employee"""
+    defaults = {
+        'title': 'Sample employee',
+        'experience': 10,
+        'salary': 5.00,
+    }
+    defaults.update(params)
+
+    return Employee.objects.create(user=user, **defaults)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTests(TestCase):
+    """Test the incremental sync endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Intern')
+        self.employee = sample_employee(user=self.user)
+
+    def test_requires_authentication(self):
+        """Test that login is required for syncing"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_full_sync_without_token(self):
+        """Test everything is returned along with a token"""
+        other = get_user_model().objects.create_user(
+            'other@tangent.com',
+            'testpass'
+        )
+        Tag.objects.create(user=other, name='Other')
+
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['id'] for tag in res.data['tags']],
+                         [self.tag.id])
+        self.assertEqual(len(res.data['employee']), 1)
+        self.assertEqual(res.data['deleted'], {})
+        self.assertTrue(res.data['token'])
+
+    def test_incremental_sync(self):
+        """Test only changes and deletions since the token are returned"""
+        token = self.client.get(SYNC_URL).data['token']
+        department = Department.objects.create(user=self.user, name='IT')
+        self.employee.tags.add(self.tag)
+        tag_id = self.tag.id
+        self.tag.delete()
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.data['tags'], [])
+        self.assertEqual([d['id'] for d in res.data['department']],
+                         [department.id])
+        self.assertEqual(res.data['employee'][0]['tags'], [])
+        self.assertEqual(res.data['deleted']['tags'], [tag_id])
+        self.assertNotEqual(res.data['token'], token)
+
+    def test_nothing_changed(self):
+        """Test syncing again with the latest token returns nothing"""
+        token = self.client.get(SYNC_URL).data['token']
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.data['employee'], [])
+        self.assertEqual(res.data['token'], token)
+
+    @override_settings(SYNC_SETTLE_SECONDS=60)
+    def test_token_waits_for_unsettled_changes(self):
+        """Test recent changes are sent but not skipped by the token"""
+        token = self.client.get(SYNC_URL).data['token']
+        self.employee.title = 'Manager'
+        self.employee.save()
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.data['employee'][0]['title'], 'Manager')
+        self.assertEqual(res.data['token'], token)
+
+    def test_token_from_other_shard_resyncs(self):
+        """Test a token minted before a shard move forces a full sync"""
+        res = self.client.get(SYNC_URL, {'since': 'elsewhere-999'})
+
+        self.assertEqual(len(res.data['tags']), 1)
+        self.assertEqual(res.data['deleted'], {})
+
+    def test_invalid_token(self):
+        """Test a malformed token is rejected"""
+        res = self.client.get(SYNC_URL, {'since': 'default-abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
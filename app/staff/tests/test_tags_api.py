@@ -80,3 +80,12 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.post(TAGS_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_tag_duplicate_name(self):
+        """Test a user can't have two tags with the same name"""
+        Tag.objects.create(user=self.user, name='Simple')
+
+        res = self.client.post(TAGS_URL, {'name': 'Simple'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
@@ -0,0 +1,138 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Department, Employee, VersionConflict
+
+
+def employee_url(employee_id):
+    """Return employee detail URL"""
+    return reverse('staff:employee-detail', args=[employee_id])
+
+
+def department_url(department_id):
+    """Return department detail URL"""
+    return reverse('staff:department-detail', args=[department_id])
+
+
+class VersionedUpdateTests(TestCase):
+    """Test optimistic concurrency on employee and department updates"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.employee = Employee.objects.create(
+            user=self.user, title='Sample employee', experience=10,
+            salary=5.00
+        )
+
+    def test_retrieve_sends_etag(self):
+        """Test the employee version is served as its ETag"""
+        res = self.client.get(employee_url(self.employee.id))
+
+        self.assertEqual(res['ETag'], '"1"')
+
+    def test_update_if_match(self):
+        """Test an update at the current version bumps the ETag"""
+        res = self.client.patch(
+            employee_url(self.employee.id), {'title': 'Renamed'},
+            HTTP_IF_MATCH='"1"'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], '"2"')
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.version, 2)
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_update_if_match_compressed_etag(self):
+        """Test the weak ETag of a compressed response is accepted"""
+        # A repetitive title so the body shrinks when compressed
+        Employee.objects.filter(id=self.employee.id) \
+            .update(title='Sample employee ' * 10)
+        res = self.client.get(
+            employee_url(self.employee.id), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res['ETag'], 'W/"1"')
+
+        res = self.client.patch(
+            employee_url(self.employee.id), {'title': 'Renamed'},
+            HTTP_IF_MATCH=res['ETag']
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.title, 'Renamed')
+
+    def test_stale_if_match_rejected(self):
+        """Test an update against an old version fails with 412"""
+        self.client.patch(employee_url(self.employee.id), {'title': 'First'})
+
+        res = self.client.patch(
+            employee_url(self.employee.id), {'title': 'Second'},
+            HTTP_IF_MATCH='"1"'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.title, 'First')
+
+    def test_update_is_one_conditional_query(self):
+        """Test the write is a single UPDATE filtered on the version"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(
+                employee_url(self.employee.id), {'title': 'Renamed'},
+                HTTP_IF_MATCH='"1"'
+            )
+
+        updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE "core_employee"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"version" = 1', updates[0])
+        self.assertFalse(any(
+            'FOR UPDATE' in query['sql'] for query in queries
+        ))
+
+    def test_concurrent_save_conflicts(self):
+        """Test saving a copy read before another write raises"""
+        stale = Employee.objects.get(pk=self.employee.pk)
+        self.employee.title = 'First'
+        self.employee.save()
+
+        stale.title = 'Second'
+        with self.assertRaises(VersionConflict), transaction.atomic():
+            stale.save()
+
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.title, 'First')
+
+    def test_department_if_match(self):
+        """Test departments honour If-Match too"""
+        department = Department.objects.create(user=self.user, name='Sales')
+
+        stale = self.client.patch(
+            department_url(department.id), {'name': 'Marketing'},
+            HTTP_IF_MATCH='"2"'
+        )
+        res = self.client.patch(
+            department_url(department.id), {'name': 'Marketing'},
+            HTTP_IF_MATCH='"1"'
+        )
+
+        self.assertEqual(
+            stale.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], '"2"')
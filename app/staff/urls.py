@@ -12,5 +12,7 @@ router.register('employee', views.EmployeeViewSet)
 app_name = 'staff'
 
 urlpatterns = [
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path('events/', views.EventsView.as_view(), name='events'),
     path('', include(router.urls))
 ]
@@ -1,24 +1,220 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import action
 from rest_framework.response import Response
 # from rest_framework import viewsets, mixins, status
 from rest_framework import status
 
 from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-from core.models import Tag, Department, Employee
+from core import changes, events, label_cache, sharding
+from core.authentication import ExpiringTokenAuthentication
+from core.pagination import EstimatedCountPagination, cached_count
+from core.renderers import MessagePackRenderer, MessagePackParser, \
+    EventStreamRenderer
+from core.signals import employee_count_key
+from core.models import Tag, Department, Employee, EmployeeSummary, \
+    VersionConflict
 
 from staff import serializers
 
 
-class TagViewSet(viewsets.GenericViewSet,
+RENDERER_CLASSES = api_settings.DEFAULT_RENDERER_CLASSES + \
+    [MessagePackRenderer]
+PARSER_CLASSES = api_settings.DEFAULT_PARSER_CLASSES + [MessagePackParser]
+
+
+class ShardMoving(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Data is being moved, retry shortly.'
+    default_code = 'shard_moving'
+    wait = 5
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The object has changed, fetch it and retry.'
+    default_code = 'precondition_failed'
+
+
+class EditConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The object was changed by another request, retry.'
+    default_code = 'edit_conflict'
+
+
+class ShardedViewMixin:
+    """Route queries to the shard holding the authenticated user's data"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        sharding.pin_shard(request.user.pk)
+        if request.method not in SAFE_METHODS:
+            sharding.fence_writes(request.user.pk)
+            if sharding.is_locked(request.user.pk):
+                raise ShardMoving()
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Errors raised past finalize_response must not keep the fence
+            sharding.release_shard()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        sharding.release_shard()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class SparseFieldsMixin:
+    """Support ?fields=a,b and ?expand=rel on list and retrieve
+
+    Only the requested columns are loaded and many-to-many relations that
+    are rendered are fetched with one prefetch query each.
+    """
+    SPARSE_ACTIONS = ('list', 'retrieve')
+
+    def query_list(self, name):
+        """Return the comma separated values of a query parameter"""
+        value = self.request.query_params.get(name, '')
+        return [item for item in value.split(',') if item]
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in self.SPARSE_ACTIONS:
+            kwargs.setdefault('fields', self.query_list('fields'))
+            kwargs.setdefault('expand', self.query_list('expand'))
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in self.SPARSE_ACTIONS:
+            return queryset
+
+        opts = queryset.model._meta
+        fields = self.query_list('fields')
+        related = [
+            field.name for field in opts.many_to_many
+            if not fields or field.name in fields
+        ]
+        # A single object gains nothing from prefetching, and the detail
+        # serializers take the labels from the label cache
+        if related and self.action == 'list':
+            queryset = queryset.prefetch_related(*related)
+        if fields:
+            concrete = {field.name for field in opts.concrete_fields}
+            # user is kept so shard routing never loads a deferred field,
+            # version so the ETag doesn't either
+            only = {opts.pk.name, 'user'} | (concrete & set(fields))
+            if 'version' in concrete:
+                only.add('version')
+            queryset = queryset.only(*only)
+
+        return queryset
+
+
+class VersionedViewMixin:
+    """Serve object versions as ETags and honour If-Match on updates
+
+    The If-Match check and the write are one conditional UPDATE, see
+    VersionedModel, so concurrent writers never wait on row locks.
+    """
+    ETAG_ACTIONS = ('retrieve', 'update', 'partial_update')
+
+    def if_match(self):
+        """Return the versions listed in If-Match, None if absent or *
+
+        CompressionMiddleware weakens the ETags it sends, so a W/ prefix is
+        ignored: the version names the same object however it was encoded.
+        """
+        header = self.request.META.get('HTTP_IF_MATCH', '').strip()
+        if not header or header == '*':
+            return None
+        tags = (tag.strip() for tag in header.split(','))
+        return {
+            (tag[2:] if tag.startswith('W/') else tag).strip('"')
+            for tag in tags
+        }
+
+    def get_object(self):
+        instance = super().get_object()
+        versions = self.if_match()
+        if self.action in ('update', 'partial_update') and \
+                versions is not None and str(instance.version) not in versions:
+            raise PreconditionFailed()
+        self.versioned_object = instance
+        return instance
+
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except VersionConflict:
+            if self.if_match() is not None:
+                raise PreconditionFailed()
+            raise EditConflict()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        instance = getattr(self, 'versioned_object', None)
+        if instance is not None and self.action in self.ETAG_ACTIONS and \
+                status.is_success(response.status_code):
+            response['ETag'] = f'"{instance.version}"'
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class CachedLabelListMixin:
+    """List and search the user's tags or departments from the label cache"""
+
+    def list(self, request, *args, **kwargs):
+        labels = label_cache.cache.instances(
+            self.queryset.model, request.user.pk
+        )
+        return Response(self.get_serializer(labels, many=True).data)
+
+    @action(methods=['GET'], detail=False)
+    def autocomplete(self, request):
+        """Return the most used labels whose name starts with ?q="""
+        limit = request.query_params.get('limit', '')
+        if limit and not limit.isdigit():
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        limit = min(
+            int(limit or settings.AUTOCOMPLETE_LIMIT),
+            settings.AUTOCOMPLETE_MAX_LIMIT
+        )
+        index = label_cache.cache.index(self.queryset.model, request.user.pk)
+        return Response(index.search(request.query_params.get('q', ''), limit))
+
+
+def save_label(serializer, user):
+    """Save a new tag or department, rejecting names already in use"""
+    model = serializer.Meta.model
+    try:
+        with transaction.atomic(using=router.db_for_write(model)):
+            serializer.save(user=user)
+    except IntegrityError:
+        raise ValidationError({'name': [
+            f'A {model._meta.verbose_name} with this name already exists.'
+        ]})
+
+
+class TagViewSet(ShardedViewMixin,
+                 CachedLabelListMixin,
+                 SparseFieldsMixin,
+                 viewsets.GenericViewSet,
                  mixins.ListModelMixin,
                  mixins.CreateModelMixin):
 
     """Manage tags in the database"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
 
@@ -28,15 +224,22 @@ class TagViewSet(viewsets.GenericViewSet,
 
     def perform_create(self, serializer):
         """Create a new ingredient"""
-        serializer.save(user=self.request.user)
+        save_label(serializer, self.request.user)
 
 
-class DepartmentViewSet(viewsets.GenericViewSet,
+class DepartmentViewSet(ShardedViewMixin,
+                        VersionedViewMixin,
+                        CachedLabelListMixin,
+                        SparseFieldsMixin,
+                        viewsets.GenericViewSet,
                         mixins.ListModelMixin,
-                        mixins.CreateModelMixin):
+                        mixins.CreateModelMixin,
+                        mixins.UpdateModelMixin):
     """Manage ingredients in the database"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
     queryset = Department.objects.all()
     serializer_class = serializers.DepartmentSerializer
 
@@ -46,19 +249,70 @@ class DepartmentViewSet(viewsets.GenericViewSet,
 
     def perform_create(self, serializer):
         """Create a new ingredient"""
-        serializer.save(user=self.request.user)
+        save_label(serializer, self.request.user)
 
+    def perform_update(self, serializer):
+        """Rename or move a department along with its subtree"""
+        save_label(serializer, self.request.user)
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+    @action(methods=['GET'], detail=True)
+    def headcount(self, request, pk=None):
+        """Count the employees in the department and all below it"""
+        department = self.get_object()
+        return Response({
+            'id': department.pk,
+            'headcount': department.headcount(),
+        })
+
+
+class EmployeeViewSet(ShardedViewMixin,
+                      VersionedViewMixin,
+                      SparseFieldsMixin,
+                      viewsets.ModelViewSet):
     """Manage Employee in the database"""
     serializer_class = serializers.EmployeeSerializer
     queryset = Employee.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+    throttle_scope = None
+    pagination_class = EstimatedCountPagination
 
     def get_queryset(self):
         """Retrieve the Employee for the authenticated user"""
-        return self.queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(user=self.request.user)
+        subtree = self.request.query_params.get('department_subtree')
+        if subtree:
+            queryset = self.filter_department_subtree(queryset, subtree)
+        if self.action in ('update', 'partial_update'):
+            # Snapshot the relations the serializer diffs against
+            queryset = queryset.prefetch_related('tags', 'department')
+        return queryset.order_by('-id')
+
+    def filter_department_subtree(self, queryset, department_id):
+        """Keep employees in the department or any department below it"""
+        if not department_id.isdigit():
+            raise ValidationError({
+                'department_subtree': 'A valid integer is required.'
+            })
+        department = Department.objects.filter(
+            user=self.request.user, pk=department_id
+        ).first()
+        if department is None:
+            return queryset.none()
+        return queryset.filter(pk__in=Employee.department.through.objects
+                               .filter(department__in=department.subtree())
+                               .values('employee_id'))
+
+    def get_cached_count(self):
+        """Return the user's maintained employee count for the full list"""
+        if 'department_subtree' in self.request.query_params:
+            return None
+        return cached_count(
+            employee_count_key(self.request.user.pk),
+            self.get_queryset()
+        )
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -66,6 +320,8 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             return serializers.EmployeeDetailSerializer
         elif self.action == 'upload_image':
             return serializers.EmployeeImageSerializer
+        elif self.action == 'summary':
+            return serializers.EmployeeSummarySerializer
 
         return self.serializer_class
 
@@ -73,7 +329,23 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         """ Create a new employee"""
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    @action(methods=['GET'], detail=False)
+    def summary(self, request):
+        """List employees from the summary table without joins"""
+        queryset = EmployeeSummary.objects.filter(
+            user=self.request.user
+        ).order_by('-employee_id')
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(methods=['POST'], detail=True, url_path='upload-image',
+            throttle_scope='upload')
     def upload_image(self, request, pk=None):
         """Upload an image to an employee"""
         employee = self.get_object()
@@ -93,3 +365,82 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class SyncView(ShardedViewMixin, APIView):
+    """Return the tags, departments and employees changed since a token
+
+    Without ?since= everything is returned. Either way the response holds
+    a token to pass as ?since= next time and the ids deleted meanwhile.
+    """
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = RENDERER_CLASSES
+    resources = (
+        ('tag', 'tags', serializers.TagSerializer),
+        ('department', 'department', serializers.DepartmentSerializer),
+        ('employee', 'employee', serializers.EmployeeSerializer),
+    )
+
+    def get(self, request):
+        user = request.user
+        shard = sharding.shard_for_user(user.pk)
+        since = self.parse_token(request.query_params.get('since'), shard)
+
+        if since is None:
+            logged, token = None, changes.latest_token(user.pk)
+        else:
+            logged, token = changes.changes_since(user.pk, since)
+
+        data = OrderedDict(token=f'{shard}-{token}')
+        deleted = OrderedDict()
+        for kind, key, serializer_class in self.resources:
+            queryset = serializer_class.Meta.model.objects.filter(user=user)
+            if logged is not None:
+                queryset = queryset.filter(pk__in=[
+                    change.object_id for change in logged
+                    if change.kind == kind and not change.deleted
+                ])
+                deleted[key] = [
+                    change.object_id for change in logged
+                    if change.kind == kind and change.deleted
+                ]
+            if kind == 'employee':
+                queryset = queryset.prefetch_related('tags', 'department')
+            data[key] = serializer_class(queryset, many=True).data
+        data['deleted'] = deleted
+
+        return Response(data)
+
+    def parse_token(self, token, shard):
+        """Return the change id in token, None if a full sync is needed"""
+        if not token:
+            return None
+        token_shard, _, change_id = token.rpartition('-')
+        if not change_id.isdigit():
+            raise ValidationError({'since': 'Invalid sync token.'})
+        # Tokens from another shard predate a move, start over
+        if token_shard != shard:
+            return None
+        return int(change_id)
+
+
+class EventsView(APIView):
+    """Stream create, update and delete events for the user's staff data
+
+    Each event names the kind, action and ids, clients fetch the objects
+    themselves. A resync event means events were dropped and the client
+    should catch up through the sync endpoint.
+    """
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (EventStreamRenderer, JSONRenderer)
+    batchable = False
+
+    def get(self, request):
+        response = StreamingHttpResponse(
+            events.stream(request.user.pk), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -35,6 +35,9 @@ class AuthTokenSerializer(serializers.Serializer):
         style={'input_type': 'password'},
         trim_whitespace=False
     )
+    device = serializers.CharField(
+        max_length=255, required=False, allow_blank=True
+    )
 
     def validate(self, attrs):
         """Validate and authenticate the user"""
@@ -52,3 +55,8 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class RevokeTokenSerializer(serializers.Serializer):
+    """Serializer for revoking auth tokens"""
+    all = serializers.BooleanField(default=False)
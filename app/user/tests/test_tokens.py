@@ -0,0 +1,127 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import AuthToken
+
+
+TOKEN_URL = reverse('user:token')
+REVOKE_URL = reverse('user:revoke')
+ME_URL = reverse('user:me')
+
+
+class AuthTokenTests(TestCase):
+    """Test expiring, per device auth tokens"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@tangent.com',
+            'testpass'
+        )
+        self.client = APIClient()
+
+    def login(self, device=''):
+        """Return a new token for the user"""
+        res = self.client.post(TOKEN_URL, {
+            'email': 'test@tangent.com',
+            'password': 'testpass',
+            'device': device,
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data['token']
+
+    def get_me(self, key):
+        """Request the profile with key"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        return self.client.get(ME_URL)
+
+    def test_token_per_device(self):
+        """Test each login issues its own token with an expiry"""
+        phone = self.login('phone')
+        laptop = self.login('laptop')
+
+        self.assertNotEqual(phone, laptop)
+        token = AuthToken.objects.get(key=phone)
+        self.assertEqual(token.device, 'phone')
+        self.assertGreater(token.expires, timezone.now())
+        self.assertEqual(self.get_me(laptop).status_code, status.HTTP_200_OK)
+
+    def test_expired_token_rejected(self):
+        """Test a token stops working once expired"""
+        key = self.login()
+        AuthToken.objects.filter(key=key).update(
+            expires=timezone.now() - timedelta(seconds=1)
+        )
+
+        res = self.get_me(key)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_authentication_single_query(self):
+        """Test a fresh token is checked with one query, no write"""
+        key = self.login()
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+
+    @override_settings(AUTH_TOKEN_REFRESH_INTERVAL=timedelta(hours=1))
+    def test_sliding_refresh(self):
+        """Test a token in use gets its expiry pushed back"""
+        key = self.login()
+        old = timezone.now() + timedelta(hours=2)
+        AuthToken.objects.filter(key=key).update(expires=old)
+
+        with self.assertNumQueries(2):
+            self.get_me(key)
+
+        self.assertGreater(AuthToken.objects.get(key=key).expires, old)
+
+    def test_revoke_current_token(self):
+        """Test revoking only logs out the requesting device"""
+        phone = self.login('phone')
+        laptop = self.login('laptop')
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {phone}')
+        res = self.client.post(REVOKE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            self.get_me(phone).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        self.assertEqual(self.get_me(laptop).status_code, status.HTTP_200_OK)
+
+    def test_revoke_all_tokens(self):
+        """Test revoking all logs out every device"""
+        phone = self.login('phone')
+        self.login('laptop')
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {phone}')
+        res = self.client.post(REVOKE_URL, {'all': True})
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(AuthToken.objects.filter(user=self.user).exists())
+
+    def test_purge_expired_tokens(self):
+        """Test the cleanup command deletes only expired tokens"""
+        live = AuthToken.objects.create(user=self.user)
+        for _ in range(3):
+            AuthToken.objects.create(
+                user=self.user, expires=timezone.now() - timedelta(days=1)
+            )
+
+        out = StringIO()
+        call_command('purge_expired_tokens', batch_size=2, stdout=out)
+
+        self.assertEqual(
+            list(AuthToken.objects.values_list('key', flat=True)), [live.key]
+        )
+        self.assertIn('3 expired tokens deleted', out.getvalue())
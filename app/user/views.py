@@ -1,8 +1,15 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-from user.serializers import UserSerializer, AuthTokenSerializer
+from core import purge
+from core.authentication import ExpiringTokenAuthentication
+from core.models import AuthToken
+from core.throttling import ScopedTokenBucketThrottle
+from user.serializers import UserSerializer, AuthTokenSerializer, \
+    RevokeTokenSerializer
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -14,13 +21,48 @@ class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for the user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (ScopedTokenBucketThrottle,)
+    throttle_scope = 'token'
 
+    def post(self, request, *args, **kwargs):
+        """Issue a new token, one per device"""
+        serializer = self.serializer_class(
+            data=request.data, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        token = AuthToken.objects.create(
+            user=serializer.validated_data['user'],
+            device=serializer.validated_data.get('device', '')
+        )
+        return Response({'token': token.key, 'expires': token.expires})
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+
+class RevokeTokenView(APIView):
+    """Revoke the token of the request, or every token of the user"""
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        serializer = RevokeTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        tokens = AuthToken.objects.filter(user=request.user)
+        if not serializer.validated_data['all']:
+            tokens = tokens.filter(key=request.auth.key)
+        tokens.delete()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         return self.request.user
+
+    def perform_destroy(self, instance):
+        """Deactivate the user, their data is purged in the background"""
+        purge.deactivate(instance)